@@ -0,0 +1,386 @@
+"""Bookmark Checker Module - Find dead and permanently redirected bookmarks.
+
+对所有书签发送 HEAD 请求（失败或不被支持时改用 GET 确认），找出失效链接、
+可以原地改写的永久重定向，并统计每个站点的响应延迟：
+- 并发：ThreadPoolExecutor 最多 MAX_WORKERS 个请求同时进行，同一站点最多 PER_HOST_LIMIT 个；
+  调度器按站点轮流派发任务，工作线程不会阻塞在某个站点的并发限制上
+- 连接复用：同一站点的 keep-alive 连接放回 ConnectionPool，后续请求直接使用
+- 缓存：结果连同检查时间保存在 LINK_CHECK_FILE，CACHE_TTL 秒内再次检查时跳过
+  （网络错误只缓存 ERROR_TTL 秒）
+
+check() 在调用线程中阻塞直到完成，progress 回调也在该线程中调用；
+GUI 需要在后台线程中运行（例如 QThread）。
+"""
+
+import http.client
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any
+from urllib.parse import urljoin, urlsplit
+
+from bookmark_manager import BookmarkManager
+from url_canon import host_key
+
+# Type aliases
+CheckResult = dict[str, Any]
+ProgressCallback = Callable[[int, int], Any]  # (已完成, 总数)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINK_CHECK_FILE = os.path.join(_PROJECT_ROOT, "link_check.json")
+
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 2
+CHECK_TIMEOUT = 10.0
+MAX_REDIRECTS = 5
+MAX_BODY = 64 * 1024  # GET 确认时最多读取的字节数，更长的响应直接关闭连接
+CACHE_TTL = 7 * 24 * 3600.0
+ERROR_TTL = 3600.0
+USER_AGENT = "NanoBrowser"
+
+# 检查结果的状态
+OK = "ok"
+REDIRECT = "redirect"  # 永久重定向（301/308）到仍然有效的新地址
+DEAD = "dead"  # 服务器返回 4xx/5xx
+ERROR = "error"  # 连接失败、超时、证书错误等
+
+_REDIRECT_CODES = frozenset({301, 302, 303, 307, 308})
+_PERMANENT_CODES = frozenset({301, 308})
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host:port), reused by later requests."""
+
+    def __init__(self, timeout: float = CHECK_TIMEOUT, max_idle: int = PER_HOST_LIMIT) -> None:
+        self._timeout = timeout
+        self._max_idle = max_idle
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused)."""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        conn_class = (
+            http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        )
+        return conn_class(netloc, timeout=self._timeout), False
+
+    def release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self._max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def _request(pool: ConnectionPool, method: str, url: str) -> tuple[int, str | None, float]:
+    """Send one request; return (status, Location header, seconds until the response)."""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    headers = {"User-Agent": USER_AGENT, "Accept": "*/*"}
+    while True:
+        conn, reused = pool.acquire(parts.scheme, parts.netloc)
+        start = time.monotonic()
+        try:
+            conn.request(method, path, headers=headers)
+            resp = conn.getresponse()
+            latency = time.monotonic() - start
+            if method == "GET":
+                resp.read(MAX_BODY)
+            else:
+                resp.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            conn.close()
+            # 空闲连接可能已被服务器关闭，换一个新连接重试一次
+            if reused:
+                continue
+            raise
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        if resp.isclosed() and not resp.will_close:
+            pool.release(parts.scheme, parts.netloc, conn)
+        else:
+            conn.close()
+        return resp.status, resp.getheader("Location"), latency
+
+
+def check_url(url: str, pool: ConnectionPool) -> CheckResult:
+    """
+    Probe url (HEAD, then GET when HEAD fails) and follow redirects.
+
+    只有整条重定向链都是永久重定向并且最终地址有效时，才给出可改写的 "location"。
+    """
+    result: CheckResult = {"url": url, "status": None, "latency": None}
+    current = url
+    permanent = True
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            if urlsplit(current).scheme not in ("http", "https"):
+                result.update(state=ERROR, error=f"Unsupported URL: {current}")
+                return result
+            status, location, latency = _request(pool, "HEAD", current)
+            if status >= 400:
+                # 不少服务器不支持或错误处理 HEAD，用 GET 确认
+                status, location, latency = _request(pool, "GET", current)
+            if result["latency"] is None:
+                result["latency"] = latency
+            result["status"] = status
+            if status in _REDIRECT_CODES and location:
+                permanent = permanent and status in _PERMANENT_CODES
+                current = urljoin(current, location)
+                continue
+            break
+        else:
+            result.update(state=ERROR, error="Too many redirects")
+            return result
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        result.update(state=ERROR, error=str(e) or type(e).__name__)
+        return result
+
+    if result["status"] >= 400:
+        result["state"] = DEAD
+    elif current != url and permanent:
+        result.update(state=REDIRECT, location=current)
+    else:
+        result["state"] = OK
+    return result
+
+
+class LinkCheckCache:
+    """Check results keyed by URL, persisted to a JSON file; stale after a TTL."""
+
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl: float = CACHE_TTL,
+        error_ttl: float = ERROR_TTL,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self._ttl = ttl
+        self._error_ttl = error_ttl
+        self._clock = clock
+        self._entries: dict[str, CheckResult] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._entries = data
+            except (OSError, json.JSONDecodeError) as e:
+                print("Link check cache error:", e)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> CheckResult | None:
+        """Return the cached result for url if it is still fresh."""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        ttl = self._error_ttl if entry.get("state") == ERROR else self._ttl
+        if entry.get("checked", 0) + ttl <= self._clock():
+            return None
+        return entry
+
+    def put(self, result: CheckResult) -> None:
+        result["checked"] = self._clock()
+        self._entries[result["url"]] = result
+
+    def save(self, keep: set[str] | None = None) -> bool:
+        """Write the cache atomically, dropping URLs that are not in keep."""
+        if keep is not None:
+            self._entries = {u: r for u, r in self._entries.items() if u in keep}
+        if not self.path:
+            return True
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print("Link check cache save error:", e)
+            return False
+        return True
+
+
+class BookmarkChecker:
+    """
+    Check bookmarks with a bounded worker pool and per-host concurrency limits.
+
+    一个实例可以多次调用 check()；cancel() 可从其他线程调用，已派发的请求完成后返回。
+    """
+
+    def __init__(
+        self,
+        cache: LinkCheckCache | None = None,
+        workers: int = MAX_WORKERS,
+        per_host: int = PER_HOST_LIMIT,
+        timeout: float = CHECK_TIMEOUT,
+    ) -> None:
+        self.cache = cache if cache is not None else LinkCheckCache(LINK_CHECK_FILE)
+        self._workers = workers
+        self._per_host = per_host
+        self._timeout = timeout
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(
+        self,
+        bookmarks: list[dict[str, Any]] | None = None,
+        progress: ProgressCallback | None = None,
+        force: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Check bookmarks (default: all of them) and return a report.
+
+        报告包含 "dead" / "errors" / "redirects"（书签与结果的配对）、"hosts"（每个站点的
+        检查数与平均/最大延迟）以及 "checked"（本次实际发出请求的 URL 数）。
+        force 为 True 时忽略缓存重新检查所有 URL。
+        """
+        self._cancelled.clear()
+        if bookmarks is None:
+            bookmarks = BookmarkManager.get_all_bookmarks_flat()
+        # 只检查 http/https 书签（跳过 javascript:、file: 等）
+        urls = list(
+            dict.fromkeys(
+                b["url"]
+                for b in bookmarks
+                if urlsplit(b.get("url", "")).scheme in ("http", "https")
+            )
+        )
+        results: dict[str, CheckResult] = {}
+        queues: OrderedDict[str, deque[str]] = OrderedDict()
+        for url in urls:
+            cached = None if force else self.cache.get(url)
+            if cached is not None:
+                results[url] = cached
+            else:
+                queues.setdefault(host_key(url), deque()).append(url)
+
+        total = len(urls)
+        if progress:
+            progress(len(results), total)
+        probed = self._run(queues, results, progress, total)
+        self.cache.save(keep=set(urls))
+        report = self.report(bookmarks, results)
+        report["checked"] = probed
+        report["cancelled"] = self._cancelled.is_set()
+        return report
+
+    def _run(
+        self,
+        queues: "OrderedDict[str, deque[str]]",
+        results: dict[str, CheckResult],
+        progress: ProgressCallback | None,
+        total: int,
+    ) -> int:
+        """按站点轮流派发请求，每个站点同时最多 per_host 个，返回完成的请求数"""
+        pool = ConnectionPool(self._timeout, self._per_host)
+        running: dict[Any, str] = {}
+        active: dict[str, int] = {}
+        probed = 0
+        try:
+            with ThreadPoolExecutor(self._workers) as executor:
+                while queues or running:
+                    if not self._cancelled.is_set():
+                        for host in list(queues):
+                            queue = queues[host]
+                            while (
+                                queue
+                                and active.get(host, 0) < self._per_host
+                                and len(running) < self._workers
+                            ):
+                                future = executor.submit(check_url, queue.popleft(), pool)
+                                running[future] = host
+                                active[host] = active.get(host, 0) + 1
+                            if queue:
+                                queues.move_to_end(host)
+                            else:
+                                del queues[host]
+                    else:
+                        queues.clear()
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        active[running.pop(future)] -= 1
+                        result = future.result()
+                        results[result["url"]] = result
+                        self.cache.put(result)
+                        probed += 1
+                    if progress:
+                        progress(len(results), total)
+        finally:
+            pool.close()
+        return probed
+
+    @staticmethod
+    def report(bookmarks: list[dict[str, Any]], results: dict[str, CheckResult]) -> dict[str, Any]:
+        """Pair check results with bookmarks and collect per-host latency."""
+        report: dict[str, Any] = {"dead": [], "errors": [], "redirects": [], "hosts": {}}
+        for bookmark in bookmarks:
+            result = results.get(bookmark.get("url"))
+            if result is None:
+                continue
+            if result["state"] == DEAD:
+                report["dead"].append((bookmark, result))
+            elif result["state"] == ERROR:
+                report["errors"].append((bookmark, result))
+            elif result["state"] == REDIRECT:
+                report["redirects"].append((bookmark, result))
+
+        hosts = report["hosts"]
+        for result in results.values():
+            stats = hosts.setdefault(
+                host_key(result["url"]),
+                {"count": 0, "failed": 0, "latency": None, "max_latency": None, "_timed": []},
+            )
+            stats["count"] += 1
+            if result["state"] in (DEAD, ERROR):
+                stats["failed"] += 1
+            if result.get("latency") is not None:
+                stats["_timed"].append(result["latency"])
+        for stats in hosts.values():
+            timed = stats.pop("_timed")
+            if timed:
+                stats["latency"] = sum(timed) / len(timed)
+                stats["max_latency"] = max(timed)
+        return report
+
+
+def apply_redirects(redirects: list[tuple[dict[str, Any], CheckResult]]) -> int:
+    """
+    Rewrite permanently redirected bookmarks to their new URLs in place.
+
+    新地址已经是另一个书签时跳过；返回改写的书签数。
+    """
+    tree = BookmarkManager.get_tree()
+    count = 0
+    with tree.batch():
+        for bookmark, result in redirects:
+            if tree.get(bookmark["id"]) is not None and tree.update(
+                bookmark["id"], url=result["location"]
+            ):
+                count += 1
+    return count
@@ -1,13 +1,591 @@
+import bisect
+import codecs
+import collections
+import heapq
 import html as html_module
+import itertools
 import json
 import os
 import re
+import sqlite3
+import threading
 import time
+from contextlib import contextmanager
+from html.parser import HTMLParser
+
+import browser_import
+from url_canon import canonicalize
 
 # 使用项目根目录（src 的上级目录）作为数据文件存储路径
 _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BOOKMARKS_FILE = os.path.join(_PROJECT_ROOT, "bookmarks.json")
 
+ROOT_ID = 0  # 根目录（书签栏顶层）的节点 id
+SAVE_DELAY = 1.0  # 修改后延迟写盘的秒数，期间的多次修改合并为一次写入
+IMPORT_CHUNK_SIZE = 64 * 1024  # 流式导入 HTML 时每次读取的字节数
+SEARCH_LIMIT = 50
+CHANGE_LOG_SIZE = 1024  # changes_since() 能回溯的书签 URL 变化条数，超出后需要整体同步
+
+_TOKEN_RE = re.compile(r"\w+")
+_IGNORED_TOKENS = frozenset({"http", "https", "www"})
+
+
+def normalize_tags(tags):
+    """把标签列表或逗号分隔的字符串规范为去重、小写的标签列表"""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    result = []
+    for tag in tags or ():
+        tag = str(tag).strip().lower()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
+def bookmark_tokens(node):
+    """书签的搜索词：标题、URL、标签与关键字中的单词（小写，不含 http/https/www）"""
+    text = " ".join(
+        [
+            node.get("title", ""),
+            node.get("url", ""),
+            " ".join(node.get("tags", ())),
+            node.get("keyword", ""),
+        ]
+    ).lower()
+    return {token for token in _TOKEN_RE.findall(text) if token not in _IGNORED_TOKENS}
+
+
+class BookmarkTree:
+    """
+    常驻内存的书签树，每个节点都有随 bookmarks.json 保存的稳定 id。
+
+    索引：
+    - _nodes: id -> 节点。书签 {"id", "type", "url", "title", "added", "parent"}，
+      可选 "tags"（小写标签列表）与 "keyword"（地址栏快捷词）；
+      文件夹 {"id", "type", "name", "parent"}；节点中的其他字段原样保留
+    - _children: 文件夹 id -> {子节点 id: None}，用保持插入顺序的 dict 记录子节点顺序，
+      追加和删除都是 O(1)；根目录为 ROOT_ID
+    - _by_url: 规范化 URL -> 书签 id
+    - _versions: 文件夹 id -> 修改计数，直接子节点增删、移动或改名时加一，
+      供书签菜单判断缓存的子菜单是否过期
+    - _by_tag: 标签 -> {书签 id}；_by_token: 单词 -> {书签 id}；_by_keyword: 关键字 -> 书签 id。
+      单词另有一份排序列表 (_sorted_tokens)，search() 用二分查找定位前缀范围；
+      批量修改时不维护排序列表，下次搜索时重新排序
+
+    get() / children() 返回的节点只读，修改必须通过本类的方法。
+    每次修改后调用 on_change(tree)（BookmarkManager 借此延迟保存并通知监听者），
+    batch() 中的多次修改只触发一次。
+    书签的增删和 URL、标题的修改另记入有界的变化日志 (_change_log)，
+    监听者可以用 changes_since() 只更新变化的书签，而不必每次遍历整棵树。
+    """
+
+    _epochs = itertools.count(1)  # 每次整体加载递增，使旧的文件夹版本号全部失效
+
+    def __init__(self, items=None, on_change=None):
+        self.on_change = on_change
+        self.lock = threading.RLock()
+        self.migrated = False  # 加载的数据缺少 id 或是旧格式，需要写回文件
+        self._batch_depth = 0
+        self._batch_changed = False
+        self._change_log = collections.deque(maxlen=CHANGE_LOG_SIZE)  # (序号, URL)
+        self._change_seq = 0
+        self._reload_seq = 0
+        self.load_list(items or [], notify=False)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    # ---- 查询 ----
+
+    def get(self, node_id):
+        """返回节点，不存在时返回 None"""
+        return self._nodes.get(node_id)
+
+    @property
+    def change_seq(self):
+        """变化日志的当前序号，与 flat_bookmarks() 在同一把锁下读取即可作为同步起点"""
+        return self._change_seq
+
+    def changes_since(self, seq):
+        """
+        返回 (当前序号, 序号 seq 之后增删或修改过的书签 URL 列表)。
+        其间整棵树被重新加载或日志已被截断时列表为 None，调用方需要整体同步。
+        """
+        with self.lock:
+            log = self._change_log
+            if seq < self._reload_seq or (log and log[0][0] > seq + 1):
+                return self._change_seq, None
+            urls = [url for number, url in log if number > seq]
+            return self._change_seq, list(dict.fromkeys(urls))
+
+    def version(self, folder_id=ROOT_ID):
+        """文件夹直接子节点的版本号，子节点列表或其名称、标题变化后改变"""
+        return self._epoch, self._versions.get(folder_id, 0)
+
+    def is_folder(self, node_id):
+        return node_id in self._children
+
+    def children(self, folder_id=ROOT_ID):
+        """文件夹的直接子节点（按顺序）"""
+        with self.lock:
+            nodes = self._nodes
+            return [nodes[i] for i in self._children.get(folder_id, ())]
+
+    def child_ids(self, folder_id=ROOT_ID):
+        return list(self._children.get(folder_id, ()))
+
+    def child_count(self, folder_id=ROOT_ID):
+        return len(self._children.get(folder_id, ()))
+
+    def find_url(self, url):
+        """按规范化 URL 查找书签，O(1)"""
+        node_id = self._by_url.get(canonicalize(url))
+        return None if node_id is None else self._nodes[node_id]
+
+    def find_keyword(self, keyword):
+        """按地址栏关键字查找书签，O(1)"""
+        node_id = self._by_keyword.get(keyword.strip().lower())
+        return None if node_id is None else self._nodes[node_id]
+
+    def tagged(self, tag):
+        """带有指定标签的书签节点"""
+        return [self._nodes[i] for i in sorted(self._by_tag.get(tag.strip().lower(), ()))]
+
+    def tags(self):
+        """所有标签及其书签数量，按数量从多到少"""
+        return sorted(((t, len(ids)) for t, ids in self._by_tag.items()), key=lambda t: -t[1])
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """
+        按标签和单词搜索书签，返回书签节点，最相关的在前。
+
+        "#tag" 或 "tag:tag" 只匹配该标签；其他词匹配标题、URL、标签或关键字中
+        以它开头的单词。多个词之间为 AND 关系。整词命中多的排在前面，其次是较新添加的。
+        """
+        with self.lock:
+            id_sets = []
+            words = []
+            for term in query.lower().split():
+                if term.startswith("#") or term.startswith("tag:"):
+                    tag = term[1:] if term.startswith("#") else term[4:]
+                    if tag:
+                        id_sets.append(self._by_tag.get(tag, set()))
+                    continue
+                for word in _TOKEN_RE.findall(term):
+                    id_sets.append(self._prefix_ids(word))
+                    words.append(word)
+            if not id_sets:
+                return []
+            # 从最小的集合开始求交集
+            id_sets.sort(key=len)
+            result = set(id_sets[0])
+            for ids in id_sets[1:]:
+                if not result:
+                    break
+                result &= ids
+            by_token = self._by_token
+            best = heapq.nlargest(
+                limit,
+                result,
+                key=lambda i: (sum(i in by_token.get(w, ()) for w in words), i),
+            )
+            return [self._nodes[i] for i in best]
+
+    def find_folder(self, name, within=ROOT_ID):
+        """按名称查找 within 下的第一个文件夹（深度优先）。名称不唯一，仅用于兼容旧接口"""
+        for child_id in self._children.get(within, ()):
+            if child_id in self._children:
+                if self._nodes[child_id]["name"] == name:
+                    return self._nodes[child_id]
+                found = self.find_folder(name, child_id)
+                if found is not None:
+                    return found
+        return None
+
+    def folders(self, folder_id=ROOT_ID, prefix=""):
+        """所有文件夹的 (id, 路径) 列表，路径形如 "Work / Docs" """
+        result = []
+        for child_id in self._children.get(folder_id, ()):
+            if child_id in self._children:
+                path = prefix + self._nodes[child_id]["name"]
+                result.append((child_id, path))
+                result.extend(self.folders(child_id, path + " / "))
+        return result
+
+    def flat_bookmarks(self, folder_id=ROOT_ID):
+        """folder_id 下所有书签节点的扁平列表（深度优先）"""
+        with self.lock:
+            result = []
+            for node in self.children(folder_id):
+                if node["type"] == "folder":
+                    result.extend(self.flat_bookmarks(node["id"]))
+                else:
+                    result.append(node)
+            return result
+
+    def to_list(self, folder_id=ROOT_ID):
+        """导出为 bookmarks.json 的嵌套列表格式（节点的副本）"""
+        with self.lock:
+            result = []
+            for node in self.children(folder_id):
+                item = {k: v for k, v in node.items() if k != "parent"}
+                if node["type"] == "folder":
+                    item["children"] = self.to_list(node["id"])
+                result.append(item)
+            return result
+
+    # ---- 修改 ----
+
+    @contextmanager
+    def batch(self):
+        """将多次修改合并为一次 on_change 通知"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                fire = self._batch_depth == 0 and self._batch_changed
+                if fire:
+                    self._batch_changed = False
+        if fire and self.on_change is not None:
+            self.on_change(self)
+
+    def load_list(self, items, notify=True):
+        """用嵌套列表（bookmarks.json 格式）替换整棵树，保留其中有效且不重复的 id"""
+        with self.lock:
+            self._nodes = {}
+            self._children = {ROOT_ID: {}}
+            self._by_url = {}
+            self._by_tag = {}
+            self._by_token = {}
+            self._by_keyword = {}
+            self._sorted_tokens = None
+            self._versions = {}
+            self._epoch = next(BookmarkTree._epochs)
+            self._next_id = self._max_id(items) + 1
+            self._load_items(items, ROOT_ID)
+            self._change_seq += 1
+            self._reload_seq = self._change_seq
+            self._change_log.clear()
+        if notify:
+            self._changed()
+
+    def add_bookmark(
+        self, url, title, parent_id=ROOT_ID, index=None, added=None, tags=None, keyword=None
+    ):
+        """添加书签，返回新节点 id；URL 或关键字已存在、父文件夹不存在时返回 None"""
+        keyword = (keyword or "").strip().lower()
+        with self.lock:
+            if not self.is_folder(parent_id) or self.find_url(url) is not None:
+                return None
+            if keyword and keyword in self._by_keyword:
+                return None
+            node = {
+                "type": "bookmark",
+                "url": url,
+                "title": title,
+                "added": added or time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            tags = normalize_tags(tags)
+            if tags:
+                node["tags"] = tags
+            if keyword:
+                node["keyword"] = keyword
+            node_id = self._attach(node, parent_id, index)
+            self._log_change(url)
+        self._changed()
+        return node_id
+
+    def add_folder(self, name, parent_id=ROOT_ID, index=None):
+        """添加文件夹，返回新节点 id；父文件夹不存在时返回 None"""
+        with self.lock:
+            if not self.is_folder(parent_id):
+                return None
+            node_id = self._attach({"type": "folder", "name": name}, parent_id, index)
+        self._changed()
+        return node_id
+
+    def update(self, node_id, **fields):
+        """
+        修改节点字段（如 title、url、tags、keyword、name）。
+        新 URL 或关键字已被其他书签使用时不做修改并返回 False；空的 tags / keyword 表示删除。
+        """
+        with self.lock:
+            node = self._nodes.get(node_id)
+            if node is None:
+                return False
+            for key in ("id", "type", "parent"):
+                fields.pop(key, None)
+            if node["type"] == "bookmark":
+                if "tags" in fields:
+                    fields["tags"] = normalize_tags(fields["tags"])
+                if "keyword" in fields:
+                    fields["keyword"] = (fields["keyword"] or "").strip().lower()
+                    owner = self._by_keyword.get(fields["keyword"])
+                    if owner is not None and owner != node_id:
+                        return False
+                if "url" in fields:
+                    new_key = canonicalize(fields["url"])
+                    owner = self._by_url.get(new_key)
+                    if owner is not None and owner != node_id:
+                        return False
+                    old_key = canonicalize(node.get("url", ""))
+                    if self._by_url.get(old_key) == node_id:
+                        del self._by_url[old_key]
+                    self._by_url[new_key] = node_id
+                    self._log_change(node.get("url", ""))
+                self._unindex_terms(node)
+                node.update(fields)
+                for key in ("tags", "keyword"):
+                    if key in node and not node[key]:
+                        del node[key]
+                self._index_terms(node)
+                if "url" in fields or "title" in fields:
+                    self._log_change(node.get("url", ""))
+            else:
+                node.update(fields)
+            self._touch(node["parent"])
+        self._changed()
+        return True
+
+    def move(self, node_id, parent_id=ROOT_ID, index=None):
+        """
+        将节点移动到 parent_id 的第 index 个位置（None 表示末尾）。
+        index 按移出节点后的兄弟列表计算；不能把文件夹移到自身或其子文件夹中。
+        """
+        with self.lock:
+            node = self._nodes.get(node_id)
+            if node is None or not self.is_folder(parent_id):
+                return False
+            ancestor = parent_id
+            while ancestor != ROOT_ID:
+                if ancestor == node_id:
+                    return False
+                ancestor = self._nodes[ancestor]["parent"]
+            del self._children[node["parent"]][node_id]
+            self._touch(node["parent"])
+            node["parent"] = parent_id
+            self._insert(node_id, parent_id, index)
+        self._changed()
+        return True
+
+    def move_many(self, node_ids, parent_id=ROOT_ID, index=None):
+        """
+        将多个节点按给定顺序移动到 parent_id 中第 index 个子节点之前（None 表示末尾），
+        index 按移动前的子节点列表计算。目标文件夹的顺序只重建一次，适合拖拽大量节点。
+        跳过不存在的节点、目标文件夹自身及其上级文件夹，以及随上级文件夹一起移动的节点。
+        返回实际移动的节点 id 列表。
+        """
+        with self.lock:
+            if not self.is_folder(parent_id):
+                return []
+            blocked = set()
+            ancestor = parent_id
+            while ancestor != ROOT_ID:
+                blocked.add(ancestor)
+                ancestor = self._nodes[ancestor]["parent"]
+            selected = {i for i in node_ids if i in self._nodes and i not in blocked}
+            moving = []
+            for node_id in dict.fromkeys(node_ids):
+                if node_id not in selected:
+                    continue
+                ancestor = self._nodes[node_id]["parent"]
+                while ancestor != ROOT_ID and ancestor not in selected:
+                    ancestor = self._nodes[ancestor]["parent"]
+                if ancestor == ROOT_ID:
+                    moving.append(node_id)
+            if not moving:
+                return []
+
+            # 插入点：原第 index 个子节点之后第一个不参与移动的节点
+            moving_set = set(moving)
+            order = list(self._children[parent_id])
+            anchor = None
+            for node_id in order[index:] if index is not None else ():
+                if node_id not in moving_set:
+                    anchor = node_id
+                    break
+            for node_id in moving:
+                node = self._nodes[node_id]
+                del self._children[node["parent"]][node_id]
+                self._touch(node["parent"])
+                node["parent"] = parent_id
+            order = list(self._children[parent_id])
+            position = order.index(anchor) if anchor is not None else len(order)
+            order[position:position] = moving
+            self._children[parent_id] = dict.fromkeys(order)
+            self._touch(parent_id)
+        self._changed()
+        return moving
+
+    def remove(self, node_id):
+        """删除节点，文件夹连同其全部内容一起删除"""
+        with self.lock:
+            node = self._nodes.get(node_id)
+            if node is None:
+                return False
+            del self._children[node["parent"]][node_id]
+            self._touch(node["parent"])
+            self._drop(node_id)
+        self._changed()
+        return True
+
+    # ---- 内部辅助方法 ----
+
+    def _changed(self):
+        if self._batch_depth:
+            self._batch_changed = True
+        elif self.on_change is not None:
+            self.on_change(self)
+
+    def _log_change(self, url):
+        self._change_seq += 1
+        self._change_log.append((self._change_seq, url))
+
+    def _new_id(self):
+        node_id = self._next_id
+        self._next_id += 1
+        return node_id
+
+    def _attach(self, node, parent_id, index=None, node_id=None):
+        """登记节点并插入到父文件夹中，返回节点 id"""
+        if node_id is None:
+            node_id = self._new_id()
+        node["id"] = node_id
+        node["parent"] = parent_id
+        self._nodes[node_id] = node
+        if node["type"] == "folder":
+            self._children[node_id] = {}
+        else:
+            self._by_url.setdefault(canonicalize(node.get("url", "")), node_id)
+            self._index_terms(node)
+        self._insert(node_id, parent_id, index)
+        return node_id
+
+    def _index_terms(self, node):
+        """把书签加入标签、单词和关键字索引"""
+        node_id = node["id"]
+        for tag in node.get("tags", ()):
+            self._by_tag.setdefault(tag, set()).add(node_id)
+        for token in bookmark_tokens(node):
+            ids = self._by_token.get(token)
+            if ids is None:
+                ids = self._by_token[token] = set()
+                if self._sorted_tokens is not None:
+                    if self._batch_depth:
+                        self._sorted_tokens = None
+                    else:
+                        bisect.insort(self._sorted_tokens, token)
+            ids.add(node_id)
+        if node.get("keyword"):
+            self._by_keyword.setdefault(node["keyword"], node_id)
+
+    def _unindex_terms(self, node):
+        node_id = node["id"]
+        for tag in node.get("tags", ()):
+            ids = self._by_tag.get(tag)
+            if ids is not None:
+                ids.discard(node_id)
+                if not ids:
+                    del self._by_tag[tag]
+        for token in bookmark_tokens(node):
+            ids = self._by_token.get(token)
+            if ids is None:
+                continue
+            ids.discard(node_id)
+            if not ids:
+                del self._by_token[token]
+                if self._sorted_tokens is not None:
+                    position = bisect.bisect_left(self._sorted_tokens, token)
+                    del self._sorted_tokens[position]
+        if node.get("keyword") and self._by_keyword.get(node["keyword"]) == node_id:
+            del self._by_keyword[node["keyword"]]
+
+    def _prefix_ids(self, word):
+        """以 word 开头的所有单词对应的书签 id"""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._by_token)
+        tokens = self._sorted_tokens
+        start = bisect.bisect_left(tokens, word)
+        end = bisect.bisect_left(tokens, word + "\U0010ffff", start)
+        if end - start == 1:
+            return self._by_token[tokens[start]]
+        result = set()
+        for token in tokens[start:end]:
+            result |= self._by_token[token]
+        return result
+
+    def _touch(self, folder_id):
+        self._versions[folder_id] = self._versions.get(folder_id, 0) + 1
+
+    def _insert(self, node_id, parent_id, index):
+        self._touch(parent_id)
+        siblings = self._children[parent_id]
+        if index is None or index >= len(siblings):
+            siblings[node_id] = None
+        else:
+            # 插入到中间位置需要重建顺序 dict
+            order = list(siblings)
+            order.insert(max(index, 0), node_id)
+            self._children[parent_id] = dict.fromkeys(order)
+
+    def _drop(self, node_id):
+        node = self._nodes.pop(node_id)
+        if node["type"] == "folder":
+            for child_id in self._children.pop(node_id):
+                self._drop(child_id)
+        else:
+            key = canonicalize(node.get("url", ""))
+            if self._by_url.get(key) == node_id:
+                del self._by_url[key]
+            self._unindex_terms(node)
+            self._log_change(node.get("url", ""))
+
+    @staticmethod
+    def _max_id(items):
+        result = ROOT_ID
+        for item in items:
+            node_id = item.get("id")
+            if isinstance(node_id, int) and node_id > result:
+                result = node_id
+            if item.get("type") == "folder":
+                result = max(result, BookmarkTree._max_id(item.get("children", [])))
+        return result
+
+    def _load_items(self, items, parent_id):
+        for item in items:
+            node = {k: v for k, v in item.items() if k != "children"}
+            if "type" not in node:
+                # 旧格式 [{"url": ..., "title": ...}]
+                node = {
+                    "type": "bookmark",
+                    "url": item.get("url", ""),
+                    "title": item.get("title", ""),
+                    "added": item.get("added", ""),
+                }
+                self.migrated = True
+            node_id = item.get("id")
+            if not isinstance(node_id, int) or node_id <= ROOT_ID or node_id in self._nodes:
+                node_id = None
+                self.migrated = True
+            if node["type"] == "folder":
+                node.setdefault("name", "")
+                folder_id = self._attach(node, parent_id, node_id=node_id)
+                self._load_items(item.get("children", []), folder_id)
+            else:
+                node.setdefault("url", "")
+                node.setdefault("title", "")
+                node.setdefault("added", "")
+                if "tags" in node:
+                    node["tags"] = normalize_tags(node["tags"])
+                if "keyword" in node:
+                    node["keyword"] = str(node["keyword"] or "").strip().lower()
+                for key in ("tags", "keyword"):
+                    if key in node and not node[key]:
+                        del node[key]
+                self._attach(node, parent_id, node_id=node_id)
+
 
 class BookmarkManager:
     """
@@ -15,192 +593,188 @@ class BookmarkManager:
 
     数据结构 (bookmarks.json):
     [
-        {"type": "bookmark", "url": "...", "title": "...", "added": "..."},
-        {"type": "folder", "name": "Work", "children": [
-            {"type": "bookmark", "url": "...", "title": "...", "added": "..."},
+        {"id": 1, "type": "bookmark", "url": "...", "title": "...", "added": "..."},
+        {"id": 2, "type": "folder", "name": "Work", "children": [
+            {"id": 3, "type": "bookmark", "url": "...", "title": "...", "added": "..."},
             ...
         ]},
         ...
     ]
 
-    为向后兼容，旧格式 [{"url": "...", "title": "..."}] 在加载时自动迁移。
+    书签首次使用时加载为常驻内存的 BookmarkTree，之后的查询和修改都不再读文件；
+    修改后 SAVE_DELAY 秒内的变更合并为一次写入（原子替换），退出前调用 flush()。
+    对话框和菜单通过 get_tree() 按节点 id 操作；按名称/URL 的静态方法保留以兼容旧调用。
+
+    书签可带可选的 "tags"（标签列表）和 "keyword"（地址栏关键字，全局唯一）字段，
+    search_bookmarks() 通过书签树的倒排索引即时查询。
+
+    为向后兼容，旧格式 [{"url": "...", "title": "..."}] 与没有 id 的条目在加载时自动迁移。
     """
 
+    # 书签变化后的通知对象，以 BookmarkTree 调用（如地址栏建议索引）
+    _listeners = []
+
+    _tree = None
+    _tree_path = None  # _tree 对应的文件；BOOKMARKS_FILE 改变后重新加载
+    _dirty = False
+    _save_timer = None
+    _save_lock = threading.Lock()
+
+    @staticmethod
+    def add_listener(callback):
+        """注册 callback(tree)，每次书签修改后在修改所在的线程中调用"""
+        BookmarkManager._listeners.append(callback)
+
+    @staticmethod
+    def remove_listener(callback):
+        if callback in BookmarkManager._listeners:
+            BookmarkManager._listeners.remove(callback)
+
+    @staticmethod
+    def get_tree():
+        """返回常驻内存的书签树，首次调用时从 BOOKMARKS_FILE 加载"""
+        tree = BookmarkManager._tree
+        if tree is None or BookmarkManager._tree_path != BOOKMARKS_FILE:
+            BookmarkManager.flush()
+            tree = BookmarkTree(BookmarkManager._read_file(), BookmarkManager._tree_changed)
+            BookmarkManager._tree = tree
+            BookmarkManager._tree_path = BOOKMARKS_FILE
+            if tree.migrated:
+                BookmarkManager._schedule_save()
+        return tree
+
     @staticmethod
     def load_bookmarks():
-        """加载书签数据，返回列表"""
+        """返回书签数据（嵌套列表副本）"""
+        return BookmarkManager.get_tree().to_list()
+
+    @staticmethod
+    def save_bookmarks(bookmarks):
+        """用嵌套列表替换全部书签（列表中的 id 保持不变），延迟写盘"""
+        BookmarkManager.get_tree().load_list(bookmarks)
+        return True
+
+    @staticmethod
+    def flush():
+        """立即写入尚未保存的修改，返回是否成功"""
+        with BookmarkManager._save_lock:
+            timer, BookmarkManager._save_timer = BookmarkManager._save_timer, None
+            if timer is not None:
+                timer.cancel()
+            tree = BookmarkManager._tree
+            if not BookmarkManager._dirty or tree is None:
+                return True
+            BookmarkManager._dirty = False
+            path = BookmarkManager._tree_path
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(tree.to_list(), f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print("Bookmark save error:", e)
+                BookmarkManager._dirty = True
+                return False
+            return True
+
+    @staticmethod
+    def _read_file():
         if not os.path.exists(BOOKMARKS_FILE):
             return []
         try:
             with open(BOOKMARKS_FILE, encoding="utf-8") as f:
                 data = json.load(f)
-            # 自动迁移旧格式
-            data = BookmarkManager._migrate(data)
-            return data
         except (OSError, json.JSONDecodeError):
             return []
+        return data if isinstance(data, list) else []
 
     @staticmethod
-    def save_bookmarks(bookmarks):
-        """保存书签数据"""
-        try:
-            with open(BOOKMARKS_FILE, "w", encoding="utf-8") as f:
-                json.dump(bookmarks, f, ensure_ascii=False, indent=2)
-            return True
-        except OSError as e:
-            print("Bookmark save error:", e)
-            return False
+    def _schedule_save():
+        with BookmarkManager._save_lock:
+            BookmarkManager._dirty = True
+            if BookmarkManager._save_timer is None:
+                timer = threading.Timer(SAVE_DELAY, BookmarkManager.flush)
+                timer.daemon = True
+                BookmarkManager._save_timer = timer
+                timer.start()
 
     @staticmethod
-    def _migrate(data):
-        """将旧格式 [{"url":..., "title":...}] 迁移为新格式"""
-        if not data:
-            return data
-        migrated = False
-        result = []
-        for item in data:
-            if "type" not in item:
-                # 旧格式条目
-                result.append(
-                    {
-                        "type": "bookmark",
-                        "url": item.get("url", ""),
-                        "title": item.get("title", ""),
-                        "added": item.get("added", ""),
-                    }
-                )
-                migrated = True
-            else:
-                result.append(item)
-        if migrated:
-            BookmarkManager.save_bookmarks(result)
-        return result
+    def _tree_changed(tree):
+        if tree is not BookmarkManager._tree:
+            return
+        BookmarkManager._schedule_save()
+        for callback in list(BookmarkManager._listeners):
+            try:
+                callback(tree)
+            except Exception as e:
+                print("Bookmark listener error:", e)
+
+    # ---- 按 URL / 文件夹名称操作（兼容旧接口） ----
 
     @staticmethod
     def add_bookmark(url, title, folder_name=None):
         """
-        添加书签。如果 folder_name 指定，则添加到对应文件夹中。
+        添加书签。如果 folder_name 指定，则添加到对应文件夹中（不存在时创建）。
         返回 True 表示添加成功，False 表示已存在或失败。
         """
-        bookmarks = BookmarkManager.load_bookmarks()
-
-        new_item = {
-            "type": "bookmark",
-            "url": url,
-            "title": title,
-            "added": time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-
-        # 检查是否已存在（递归搜索）
-        if BookmarkManager._find_bookmark(bookmarks, url):
+        tree = BookmarkManager.get_tree()
+        if tree.find_url(url) is not None:
             return False
-
-        if folder_name:
-            # 在指定文件夹中添加
-            folder = BookmarkManager._find_folder(bookmarks, folder_name)
-            if folder:
-                folder["children"].append(new_item)
-            else:
-                # 文件夹不存在，创建一个
-                bookmarks.append(
-                    {
-                        "type": "folder",
-                        "name": folder_name,
-                        "children": [new_item],
-                    }
-                )
-        else:
-            bookmarks.append(new_item)
-
-        return BookmarkManager.save_bookmarks(bookmarks)
+        with tree.batch():
+            parent_id = ROOT_ID
+            if folder_name:
+                folder = tree.find_folder(folder_name)
+                parent_id = folder["id"] if folder else tree.add_folder(folder_name)
+            return tree.add_bookmark(url, title, parent_id) is not None
 
     @staticmethod
     def remove_bookmark(url):
-        """删除指定 URL 的书签（递归搜索所有文件夹）"""
-        bookmarks = BookmarkManager.load_bookmarks()
-        modified = BookmarkManager._remove_from_list(bookmarks, url)
-        if modified:
-            return BookmarkManager.save_bookmarks(bookmarks)
-        return False
+        """删除指定 URL 的书签"""
+        tree = BookmarkManager.get_tree()
+        node = tree.find_url(url)
+        return node is not None and tree.remove(node["id"])
 
     @staticmethod
     def add_folder(name, parent_folder_name=None):
-        """添加一个文件夹"""
-        bookmarks = BookmarkManager.load_bookmarks()
-
-        # 检查同名文件夹是否已存在
-        if BookmarkManager._find_folder(bookmarks, name):
+        """添加一个文件夹（同名文件夹已存在时返回 False）"""
+        tree = BookmarkManager.get_tree()
+        if tree.find_folder(name):
             return False
-
-        new_folder = {
-            "type": "folder",
-            "name": name,
-            "children": [],
-        }
-
-        if parent_folder_name:
-            parent = BookmarkManager._find_folder(bookmarks, parent_folder_name)
-            if parent:
-                parent["children"].append(new_folder)
-            else:
-                bookmarks.append(new_folder)
-        else:
-            bookmarks.append(new_folder)
-
-        return BookmarkManager.save_bookmarks(bookmarks)
+        parent = tree.find_folder(parent_folder_name) if parent_folder_name else None
+        return tree.add_folder(name, parent["id"] if parent else ROOT_ID) is not None
 
     @staticmethod
     def remove_folder(name):
         """删除指定名称的文件夹"""
-        bookmarks = BookmarkManager.load_bookmarks()
-        modified = BookmarkManager._remove_folder_from_list(bookmarks, name)
-        if modified:
-            return BookmarkManager.save_bookmarks(bookmarks)
-        return False
+        tree = BookmarkManager.get_tree()
+        folder = tree.find_folder(name)
+        return folder is not None and tree.remove(folder["id"])
 
     @staticmethod
     def rename_folder(old_name, new_name):
         """重命名文件夹"""
-        bookmarks = BookmarkManager.load_bookmarks()
-        folder = BookmarkManager._find_folder(bookmarks, old_name)
-        if folder:
-            folder["name"] = new_name
-            return BookmarkManager.save_bookmarks(bookmarks)
-        return False
+        tree = BookmarkManager.get_tree()
+        folder = tree.find_folder(old_name)
+        return folder is not None and tree.update(folder["id"], name=new_name)
 
     @staticmethod
     def edit_bookmark(old_url, new_url, new_title):
         """编辑书签的 URL 和标题"""
-        bookmarks = BookmarkManager.load_bookmarks()
-        item = BookmarkManager._find_bookmark(bookmarks, old_url)
-        if item:
-            item["url"] = new_url
-            item["title"] = new_title
-            return BookmarkManager.save_bookmarks(bookmarks)
-        return False
+        tree = BookmarkManager.get_tree()
+        node = tree.find_url(old_url)
+        return node is not None and tree.update(node["id"], url=new_url, title=new_title)
 
     @staticmethod
     def move_bookmark(url, target_folder_name=None):
         """
-        将书签移动到指定文件夹 (target_folder_name=None 表示移到根目录)。
+        将书签移动到指定文件夹 (target_folder_name=None 或文件夹不存在时移到根目录)。
         """
-        bookmarks = BookmarkManager.load_bookmarks()
-        # 先找到并移除
-        item = BookmarkManager._find_bookmark(bookmarks, url)
-        if not item:
+        tree = BookmarkManager.get_tree()
+        node = tree.find_url(url)
+        if node is None:
             return False
-        BookmarkManager._remove_from_list(bookmarks, url)
-
-        if target_folder_name:
-            folder = BookmarkManager._find_folder(bookmarks, target_folder_name)
-            if folder:
-                folder["children"].append(item)
-            else:
-                bookmarks.append(item)
-        else:
-            bookmarks.append(item)
-
-        return BookmarkManager.save_bookmarks(bookmarks)
+        folder = tree.find_folder(target_folder_name) if target_folder_name else None
+        return tree.move(node["id"], folder["id"] if folder else ROOT_ID)
 
     @staticmethod
     def get_folder_names(bookmarks=None):
@@ -217,9 +791,11 @@ class BookmarkManager:
 
     @staticmethod
     def get_all_bookmarks_flat(bookmarks=None):
-        """获取所有书签的扁平列表 (不含文件夹结构)"""
+        """获取所有书签的扁平列表 (不含文件夹结构)，返回节点的副本，可以在后台线程中使用"""
         if bookmarks is None:
-            bookmarks = BookmarkManager.load_bookmarks()
+            tree = BookmarkManager.get_tree()
+            with tree.lock:
+                return [dict(node) for node in tree.flat_bookmarks()]
         result = []
         for item in bookmarks:
             if item.get("type") == "bookmark":
@@ -230,6 +806,16 @@ class BookmarkManager:
                 )
         return result
 
+    @staticmethod
+    def search_bookmarks(query, limit=SEARCH_LIMIT):
+        """按标签（"#tag"）和单词搜索书签，见 BookmarkTree.search"""
+        return BookmarkManager.get_tree().search(query, limit)
+
+    @staticmethod
+    def find_keyword(keyword):
+        """返回地址栏关键字对应的书签，没有时返回 None"""
+        return BookmarkManager.get_tree().find_keyword(keyword)
+
     # ---- HTML 导出 (兼容主流浏览器格式) ----
 
     @staticmethod
@@ -278,175 +864,185 @@ class BookmarkManager:
             elif item.get("type") == "bookmark":
                 url = html_module.escape(item.get("url", ""))
                 title = html_module.escape(item.get("title", ""))
-                lines.append(f'{prefix}<DT><A HREF="{url}">{title}</A>')
+                # 标签与关键字使用 Firefox 导出文件的 TAGS / SHORTCUTURL 属性
+                extra = ""
+                if item.get("tags"):
+                    extra += f' TAGS="{html_module.escape(",".join(item["tags"]))}"'
+                if item.get("keyword"):
+                    extra += f' SHORTCUTURL="{html_module.escape(item["keyword"])}"'
+                lines.append(f'{prefix}<DT><A HREF="{url}"{extra}>{title}</A>')
 
     # ---- HTML 导入 ----
 
     @staticmethod
-    def import_from_html(filepath):
+    def import_from_html(filepath, progress=None):
         """
         从 Netscape Bookmark File Format (HTML) 导入书签。
         兼容 Chrome, Firefox, Edge 等导出的书签文件。
+
+        文件按 IMPORT_CHUNK_SIZE 分块读取并增量解析，解析出的条目直接合并到书签树中，
+        大文件也不会整体读入内存。每读完一块调用 progress(已读字节数, 总字节数)。
         返回导入的书签数量。
         """
         try:
-            with open(filepath, encoding="utf-8") as f:
-                content = f.read()
+            total = os.path.getsize(filepath)
+            f = open(filepath, "rb")
         except OSError as e:
             print("Import error:", e)
             return 0
 
-        imported_items = BookmarkManager._parse_bookmark_html(content)
+        tree = BookmarkManager.get_tree()
+        merger = _ImportMerger(tree)
+        parser = NetscapeBookmarkParser(merger)
+        decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        done = 0
+        with f, tree.batch():
+            try:
+                while chunk := f.read(IMPORT_CHUNK_SIZE):
+                    parser.feed(decoder.decode(chunk))
+                    done += len(chunk)
+                    if progress is not None:
+                        progress(done, total)
+            except OSError as e:
+                print("Import error:", e)
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+        return merger.count
+
+    @staticmethod
+    def import_from_browser(filepath):
+        """
+        从其他浏览器的书签数据库导入：Firefox places.sqlite 或 Chrome/Edge 的 Bookmarks 文件。
+        与 import_from_html 相同，按 URL 去重合并到现有书签，返回导入的书签数量。
+        """
+        try:
+            imported_items = browser_import.read_bookmarks(filepath)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print("Import error:", e)
+            return 0
         if not imported_items:
             return 0
 
-        # 合并到现有书签
-        bookmarks = BookmarkManager.load_bookmarks()
-        count = BookmarkManager._merge_imported(bookmarks, imported_items)
-        BookmarkManager.save_bookmarks(bookmarks)
-        return count
+        tree = BookmarkManager.get_tree()
+        merger = _ImportMerger(tree)
+        with tree.batch():
+            BookmarkManager._merge_imported(merger, ROOT_ID, imported_items)
+        return merger.count
 
     @staticmethod
-    def _parse_bookmark_html(content):
-        """解析 Netscape Bookmark HTML 格式"""
-        items = []
-        stack = [items]  # 栈结构追踪当前层级
-
-        # 逐行解析
-        for line in content.split("\n"):
-            stripped = line.strip()
-
-            # 匹配文件夹标题 <DT><H3...>FolderName</H3>
-            folder_match = re.search(
-                r"<DT><H3[^>]*>(.*?)</H3>", stripped, re.IGNORECASE
-            )
-            if folder_match:
-                folder_name = html_module.unescape(folder_match.group(1))
-                folder = {
-                    "type": "folder",
-                    "name": folder_name,
-                    "children": [],
-                }
-                stack[-1].append(folder)
-                stack.append(folder["children"])
-                continue
-
-            # 匹配书签链接 <DT><A HREF="...">Title</A>
-            link_match = re.search(
-                r'<DT><A\s+HREF="([^"]*)"[^>]*>(.*?)</A>', stripped, re.IGNORECASE
-            )
-            if link_match:
-                url = html_module.unescape(link_match.group(1))
-                title = html_module.unescape(link_match.group(2))
-                stack[-1].append(
-                    {
-                        "type": "bookmark",
-                        "url": url,
-                        "title": title,
-                        "added": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    }
+    def _merge_imported(merger, parent_id, imported):
+        """将导入的嵌套书签列表合并到 parent_id 文件夹中（按 URL 去重）"""
+        for item in imported:
+            if item.get("type") == "bookmark":
+                merger.bookmark(
+                    parent_id,
+                    item["url"],
+                    item.get("title", ""),
+                    item.get("added"),
+                    item.get("tags"),
+                    item.get("keyword"),
                 )
-                continue
+            elif item.get("type") == "folder":
+                folder_id = merger.folder(parent_id, item["name"])
+                BookmarkManager._merge_imported(merger, folder_id, item.get("children", []))
 
-            # 匹配 </DL> - 退出当前层级
-            if re.search(r"</DL>", stripped, re.IGNORECASE):
-                if len(stack) > 1:
-                    stack.pop()
 
-        return items
+class _ImportMerger:
+    """
+    把导入的条目逐个合并到书签树中。
+    书签按规范化 URL 去重（书签树的 URL 索引）；文件夹与同一父文件夹下的同名文件夹合并，
+    每个父文件夹的 名称 -> id 表只在第一次用到时建立一次。
+    """
 
-    @staticmethod
-    def _merge_imported(existing, imported):
-        """将导入的书签合并到已有书签列表中，跳过重复的 URL"""
-        count = 0
-        existing_urls = set()
-        BookmarkManager._collect_urls(existing, existing_urls)
+    def __init__(self, tree):
+        self.tree = tree
+        self.count = 0
+        self._folders = {}  # 父文件夹 id -> {文件夹名称: 文件夹 id}
 
-        for item in imported:
-            if item.get("type") == "bookmark":
-                if item["url"] not in existing_urls:
-                    existing.append(item)
-                    existing_urls.add(item["url"])
-                    count += 1
-            elif item.get("type") == "folder":
-                # 查找同名文件夹
-                target_folder = BookmarkManager._find_folder(existing, item["name"])
-                if target_folder:
-                    count += BookmarkManager._merge_imported(
-                        target_folder["children"], item.get("children", [])
-                    )
-                else:
-                    # 创建新文件夹，递归处理子项
-                    new_folder = {
-                        "type": "folder",
-                        "name": item["name"],
-                        "children": [],
-                    }
-                    sub_count = BookmarkManager._merge_imported(
-                        new_folder["children"], item.get("children", [])
-                    )
-                    existing.append(new_folder)
-                    count += sub_count
-
-        return count
+    def folder(self, parent_id, name):
+        """返回 parent_id 下名为 name 的文件夹 id，不存在时创建"""
+        names = self._folders.get(parent_id)
+        if names is None:
+            names = {}
+            for node in self.tree.children(parent_id):
+                if node["type"] == "folder":
+                    names.setdefault(node["name"], node["id"])
+            self._folders[parent_id] = names
+        folder_id = names.get(name)
+        if folder_id is None:
+            folder_id = names[name] = self.tree.add_folder(name, parent_id)
+        return folder_id
 
-    @staticmethod
-    def _collect_urls(items, url_set):
-        """递归收集所有已有书签 URL"""
-        for item in items:
-            if item.get("type") == "bookmark":
-                url_set.add(item.get("url", ""))
-            elif item.get("type") == "folder":
-                BookmarkManager._collect_urls(item.get("children", []), url_set)
+    def bookmark(self, parent_id, url, title, added=None, tags=None, keyword=None):
+        if not url:
+            return
+        if keyword and self.tree.find_keyword(keyword) is not None:
+            keyword = None  # 关键字已被其他书签使用时只导入书签本身
+        node_id = self.tree.add_bookmark(
+            url, title, parent_id, added=added, tags=tags, keyword=keyword
+        )
+        if node_id is not None:
+            self.count += 1
 
-    # ---- 内部辅助方法 ----
 
-    @staticmethod
-    def _find_bookmark(items, url):
-        """递归查找指定 URL 的书签条目并返回引用"""
-        for item in items:
-            if item.get("type") == "bookmark" and item.get("url") == url:
-                return item
-            elif item.get("type") == "folder":
-                found = BookmarkManager._find_bookmark(item.get("children", []), url)
-                if found:
-                    return found
-        return None
+class NetscapeBookmarkParser(HTMLParser):
+    """
+    增量解析 Netscape Bookmark File Format (HTML)，每个条目解析完成后立即交给 _ImportMerger。
 
-    @staticmethod
-    def _find_folder(items, name):
-        """递归查找指定名称的文件夹并返回引用"""
-        for item in items:
-            if item.get("type") == "folder" and item.get("name") == name:
-                return item
-            elif item.get("type") == "folder":
-                found = BookmarkManager._find_folder(item.get("children", []), name)
-                if found:
-                    return found
-        return None
+    <H3> 定义文件夹，紧随其后的 <DL> 进入该文件夹，</DL> 返回上一级；<A HREF> 为书签。
+    只按标签解析、不依赖换行，同一行中有多个 <DT> 也能正确处理；
+    解析过程中只保存文件夹栈和当前标签的文本。
+    """
 
-    @staticmethod
-    def _remove_from_list(items, url):
-        """递归从列表中移除指定 URL 的书签，返回是否成功"""
-        for i, item in enumerate(items):
-            if item.get("type") == "bookmark" and item.get("url") == url:
-                items.pop(i)
-                return True
-            elif item.get("type") == "folder":
-                if BookmarkManager._remove_from_list(item.get("children", []), url):
-                    return True
-        return False
+    def __init__(self, merger, parent_id=ROOT_ID):
+        super().__init__(convert_charrefs=True)
+        self.merger = merger
+        self._stack = [parent_id]
+        self._pending_folder = None  # 最近一个 <H3> 创建的文件夹，等待对应的 <DL>
+        self._text = None  # 正在读取的 <A> / <H3> 文本片段
+        self._href = None
+        self._added = None
+        self._tags = None
+        self._keyword = None
 
-    @staticmethod
-    def _remove_folder_from_list(items, name):
-        """递归从列表中移除指定名称的文件夹，返回是否成功"""
-        for i, item in enumerate(items):
-            if item.get("type") == "folder" and item.get("name") == name:
-                items.pop(i)
-                return True
-            elif item.get("type") == "folder":
-                if BookmarkManager._remove_folder_from_list(
-                    item.get("children", []), name
-                ):
-                    return True
-        return False
+    def handle_starttag(self, tag, attrs):
+        if tag == "dl":
+            folder_id = self._pending_folder
+            self._stack.append(folder_id if folder_id is not None else self._stack[-1])
+            self._pending_folder = None
+        elif tag == "h3":
+            self._text = []
+        elif tag == "a":
+            attrs = dict(attrs)
+            self._href = attrs.get("href") or ""
+            self._added = _format_add_date(attrs.get("add_date"))
+            self._tags = attrs.get("tags")
+            self._keyword = attrs.get("shortcuturl")
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == "dl":
+            if len(self._stack) > 1:
+                self._stack.pop()
+        elif tag == "h3" and self._text is not None:
+            name = "".join(self._text).strip()
+            self._pending_folder = self.merger.folder(self._stack[-1], name)
+            self._text = None
+        elif tag == "a" and self._text is not None:
+            title = "".join(self._text).strip()
+            self.merger.bookmark(
+                self._stack[-1], self._href, title, self._added, self._tags, self._keyword
+            )
+            self._text = None
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+
+def _format_add_date(value):
+    """ADD_DATE（Unix 时间戳，秒）转为本地时间字符串，无效时返回 None"""
+    try:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(value)))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
@@ -0,0 +1,245 @@
+"""Browser Import Module - Import history and bookmarks from Chrome / Firefox profiles.
+
+支持的文件：
+- Chrome / Edge: 配置目录下的 History (SQLite) 与 Bookmarks (JSON)
+- Firefox: 配置目录下的 places.sqlite（历史与书签在同一个数据库中）
+
+历史记录按 visit 时间顺序用游标分批读取 (fetchmany)，每批转换后通过
+HistoryManager.import_history() 写入并提交，内存占用与总行数无关。
+源数据库以只读 + immutable 方式打开，浏览器运行中持有的锁不会影响导入。
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+from collections.abc import Callable, Iterator
+from typing import Any
+from urllib.request import pathname2url
+
+from history_manager import HistoryManager
+from url_canon import canonicalize
+
+# Type aliases
+HistoryRecord = dict[str, str]
+BookmarkItem = dict[str, Any]
+ProgressCallback = Callable[[int, int], Any]  # (已导入行数, 总行数)
+
+IMPORT_BATCH_SIZE = 5000
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Chrome 时间戳是自 1601-01-01 (UTC) 起的微秒数
+_CHROME_EPOCH_OFFSET = 11644473600 * 1_000_000
+
+# Chrome: 只导入重定向链的终点，并跳过子框架加载
+_CHROME_HISTORY_QUERY = """
+    SELECT v.visit_time, u.url, u.title
+    FROM visits v JOIN urls u ON u.id = v.url
+    WHERE (v.transition & 0xFF) NOT IN (3, 4)
+      AND (v.transition & 0x20000000) != 0
+"""
+# Firefox: 跳过嵌入资源 (4)、下载 (7) 与框架内链接 (8)
+_FIREFOX_HISTORY_QUERY = """
+    SELECT v.visit_date, p.url, p.title
+    FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id
+    WHERE v.visit_type NOT IN (4, 7, 8)
+"""
+
+# Firefox 书签根文件夹 guid -> 导入后的文件夹名称 (tags 根目录不导入)
+_FIREFOX_ROOTS = {
+    "toolbar_____": "Bookmarks Toolbar",
+    "menu________": "Bookmarks Menu",
+    "unfiled_____": "Other Bookmarks",
+    "mobile______": "Mobile Bookmarks",
+}
+_CHROME_ROOTS = {
+    "bookmark_bar": "Bookmarks Toolbar",
+    "other": "Other Bookmarks",
+    "synced": "Mobile Bookmarks",
+}
+
+
+def open_readonly(path: str) -> sqlite3.Connection:
+    """Open a browser database without taking locks or writing journals."""
+    uri = "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True)
+
+
+def detect_format(path: str) -> str | None:
+    """Return "chrome", "firefox", or None if path is not a supported history database."""
+    try:
+        conn = open_readonly(path)
+        try:
+            tables = {
+                row[0]
+                for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    if {"moz_places", "moz_historyvisits"} <= tables:
+        return "firefox"
+    if {"urls", "visits"} <= tables:
+        return "chrome"
+    return None
+
+
+def chrome_time(value: int) -> str:
+    return _format_timestamp((value - _CHROME_EPOCH_OFFSET) / 1_000_000)
+
+
+def firefox_time(value: int) -> str:
+    return _format_timestamp(value / 1_000_000)
+
+
+def _format_timestamp(seconds: float) -> str:
+    try:
+        return datetime.datetime.fromtimestamp(seconds).strftime(TIME_FORMAT)
+    except (ValueError, OverflowError, OSError):
+        return ""
+
+
+def iter_history_batches(
+    path: str, batch_size: int = IMPORT_BATCH_SIZE
+) -> Iterator[tuple[list[HistoryRecord], int, int]]:
+    """
+    Stream visits from a Chrome History or Firefox places.sqlite file.
+
+    Yields:
+        (一批按时间排序的记录, 已读取行数, 总行数)
+    """
+    kind = detect_format(path)
+    if kind is None:
+        raise ValueError(f"Not a Chrome or Firefox history database: {path}")
+    if kind == "chrome":
+        query, time_column, convert = _CHROME_HISTORY_QUERY, "v.visit_time", chrome_time
+    else:
+        query, time_column, convert = _FIREFOX_HISTORY_QUERY, "v.visit_date", firefox_time
+
+    conn = open_readonly(path)
+    try:
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()
+        cursor = conn.execute(f"{query} ORDER BY {time_column}")
+        done = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = []
+            for visit_time, url, title in rows:
+                time_str = convert(visit_time or 0)
+                if url and time_str:
+                    batch.append(
+                        {"time": time_str, "url": canonicalize(url), "title": title or ""}
+                    )
+            done += len(rows)
+            yield batch, done, total
+    finally:
+        conn.close()
+
+
+def import_history(
+    path: str,
+    progress: ProgressCallback | None = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    cancelled: Callable[[], bool] | None = None,
+) -> int:
+    """
+    Import all visits from a browser history database into NanoBrowser.
+
+    每批单独提交，中途失败或取消（cancelled() 返回 True，在批次之间检查）时
+    已提交的批次会保留。返回导入的记录数。
+    """
+    imported = 0
+    for batch, done, total in iter_history_batches(path, batch_size):
+        if cancelled is not None and cancelled():
+            break
+        if batch and not HistoryManager.import_history(batch):
+            break
+        imported += len(batch)
+        if progress is not None:
+            progress(done, total)
+    return imported
+
+
+# ---- 书签 ----
+
+
+def read_bookmarks(path: str) -> list[BookmarkItem]:
+    """Read bookmarks from Firefox places.sqlite or a Chrome Bookmarks file."""
+    if detect_format(path) == "firefox":
+        return read_firefox_bookmarks(path)
+    return read_chrome_bookmarks(path)
+
+
+def read_firefox_bookmarks(path: str) -> list[BookmarkItem]:
+    """Convert moz_bookmarks into the BookmarkManager folder/bookmark tree."""
+    conn = open_readonly(path)
+    try:
+        rows = conn.execute(
+            "SELECT b.id, b.type, b.parent, b.title, b.guid, b.dateAdded, p.url "
+            "FROM moz_bookmarks b LEFT JOIN moz_places p ON p.id = b.fk "
+            "ORDER BY b.parent, b.position"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    children: dict[int, list[tuple]] = {}
+    for row in rows:
+        children.setdefault(row[2], []).append(row)
+
+    def build(parent_id: int) -> list[BookmarkItem]:
+        items = []
+        for item_id, item_type, _, title, _, added, url in children.get(parent_id, []):
+            if item_type == 2:
+                items.append(
+                    {"type": "folder", "name": title or "", "children": build(item_id)}
+                )
+            elif item_type == 1 and url and not url.startswith("place:"):
+                items.append(
+                    {
+                        "type": "bookmark",
+                        "url": url,
+                        "title": title or "",
+                        "added": firefox_time(added or 0),
+                    }
+                )
+        return items
+
+    result = []
+    for item_id, _, _, _, guid, _, _ in rows:
+        name = _FIREFOX_ROOTS.get(guid)
+        if name:
+            folder_children = build(item_id)
+            if folder_children:
+                result.append({"type": "folder", "name": name, "children": folder_children})
+    return result
+
+
+def read_chrome_bookmarks(path: str) -> list[BookmarkItem]:
+    """Convert a Chrome/Edge Bookmarks JSON file into the BookmarkManager tree."""
+    with open(path, encoding="utf-8") as f:
+        roots = json.load(f).get("roots", {})
+
+    def convert(node: dict) -> BookmarkItem | None:
+        if node.get("type") == "folder":
+            items = [c for c in map(convert, node.get("children", [])) if c]
+            return {"type": "folder", "name": node.get("name", ""), "children": items}
+        if node.get("type") == "url" and node.get("url"):
+            return {
+                "type": "bookmark",
+                "url": node["url"],
+                "title": node.get("name", ""),
+                "added": chrome_time(int(node.get("date_added") or 0)),
+            }
+        return None
+
+    result = []
+    for key, name in _CHROME_ROOTS.items():
+        root = roots.get(key)
+        if root and root.get("children"):
+            folder = convert(root)
+            folder["name"] = name
+            result.append(folder)
+    return result
@@ -8,6 +8,7 @@ _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # 文件路径常量
 SETTINGS_FILE = os.path.join(_PROJECT_ROOT, "settings.json")
 HISTORY_FILE = os.path.join(_PROJECT_ROOT, "history.json")
+HISTORY_DB_FILE = os.path.join(_PROJECT_ROOT, "history.db")
 BOOKMARKS_FILE = os.path.join(_PROJECT_ROOT, "bookmarks.json")
 SESSION_FILE = os.path.join(_PROJECT_ROOT, "session.json")
 DOWNLOADS_FILE = os.path.join(_PROJECT_ROOT, "downloads.json")
@@ -22,13 +23,26 @@ SEARCH_ENGINES = {
     "Baidu": "https://www.baidu.com/s?wd={}",
 }
 
+# 搜索建议接口（OpenSearch JSON 格式）
+SEARCH_SUGGEST_URLS = {
+    "Bing": "https://api.bing.com/osjson.aspx?query={}",
+    "Google": "https://suggestqueries.google.com/complete/search?client=firefox&q={}",
+    "Baidu": "https://suggestion.baidu.com/su?wd={}&action=opensearch&ie=utf-8",
+}
+
 # 默认设置
 DEFAULT_SETTINGS = {
     "search_engine": "Bing",
     "home_page": "https://www.bing.com",
     "restore_session": True,
+    "search_suggestions": True,
     "theme": "Dark (Default)",
     "user_agent": "Chrome (Windows)",
+    "history_backend": "sqlite",
+    "history_max_age_days": 0,
+    "history_max_entries": 0,
+    "history_max_bytes": 0,
+    "history_coalesce_seconds": 30,
 }
 
 # 用户代理选项
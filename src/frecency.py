@@ -0,0 +1,107 @@
+"""Frecency Module - Frequency + recency scoring for visited URLs.
+
+每次访问贡献权重 0.5 ** (距今天数 / HALF_LIFE_DAYS)，URL 的分数是所有访问权重之和。
+
+为了让每次访问只需 O(1) 更新且无需定期重新衰减，分数以对数形式存储，
+并以固定时间点 _EPOCH 为基准：
+    stored = ln(sum(exp(DECAY_RATE * (t_i - _EPOCH))))
+所有 URL 共享同一基准，因此直接按存储值排序即等价于按当前分数排序；
+需要具体数值时再用 current_score() 换算到当前时刻。
+"""
+
+import datetime
+import heapq
+import math
+import time
+from typing import Any
+
+HALF_LIFE_DAYS = 30
+DECAY_RATE = math.log(2) / (HALF_LIFE_DAYS * 86400)
+_EPOCH = datetime.datetime(2020, 1, 1).timestamp()
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Type aliases
+HistoryRecord = dict[str, str]
+SiteStats = dict[str, Any]
+
+
+def parse_time(time_str: str) -> float:
+    """Convert a record time string to a Unix timestamp (now if unparsable)."""
+    try:
+        return time.mktime(time.strptime(time_str, TIME_FORMAT))
+    except (ValueError, OverflowError):
+        return time.time()
+
+
+def visit_weight(timestamp: float) -> float:
+    """Log-domain weight of a single visit at timestamp."""
+    return DECAY_RATE * (timestamp - _EPOCH)
+
+
+def add_visit(score: float | None, timestamp: float) -> float:
+    """Add one visit to a stored (log-domain) score."""
+    return log_add(score, visit_weight(timestamp))
+
+
+def log_add(a: float | None, b: float) -> float:
+    """Return ln(exp(a) + exp(b)) without overflow; a=None means an empty score."""
+    if a is None:
+        return b
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def current_score(score: float, now: float | None = None) -> float:
+    """Convert a stored score to the decayed visit count at time now."""
+    if now is None:
+        now = time.time()
+    return math.exp(score - DECAY_RATE * (now - _EPOCH))
+
+
+class FrecencyTable:
+    """In-memory per-URL aggregates (visit count, last visit, frecency score)."""
+
+    def __init__(self) -> None:
+        self._sites: dict[str, SiteStats] = {}
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def build(self, records: list[HistoryRecord]) -> None:
+        self._sites.clear()
+        for record in records:
+            self.add(record)
+
+    def add(self, record: HistoryRecord) -> None:
+        """Account for one visit in O(1)."""
+        url = record.get("url", "")
+        if not url:
+            return
+        visit_time = record.get("time", "")
+        site = self._sites.get(url)
+        if site is None:
+            site = self._sites[url] = {
+                "url": url,
+                "title": "",
+                "visit_count": 0,
+                "last_visit": "",
+                "frecency": None,
+            }
+        site["visit_count"] += 1
+        site["last_visit"] = max(site["last_visit"], visit_time)
+        if record.get("title"):
+            site["title"] = record["title"]
+        site["frecency"] = add_visit(site["frecency"], parse_time(visit_time))
+
+    def top(self, k: int, now: float | None = None) -> list[SiteStats]:
+        """Return the k highest-scoring URLs with their current scores."""
+        best = heapq.nlargest(k, self._sites.values(), key=lambda s: s["frecency"])
+        return [to_site_stats(s, now) for s in best]
+
+
+def to_site_stats(site: SiteStats, now: float | None = None) -> SiteStats:
+    """Copy of site with "frecency" replaced by the decayed score at now."""
+    result = dict(site)
+    result["frecency"] = current_score(site["frecency"], now)
+    return result
@@ -0,0 +1,322 @@
+"""Fuzzy Match Module - Typo-tolerant matching for the omnibox and history search.
+
+每个查询词在候选文本中按子序列匹配（"gthb" 匹配 "github"），类似 fzf 的打分：
+- 每个匹配字符得分，落在单词边界（开头、/ . - _ 空格之后）或与上一个匹配字符相邻时加分
+- 匹配字符之间的间隔扣分，整个词连续出现（子串）得分最高；
+  扣分超过全部加分的分散匹配视为不匹配
+- 相邻两个字符写反（"gihtub"）时按交换后的词匹配，并扣除 TRANSPOSE_PENALTY
+多个查询词之间为 AND 关系，顺序不限。
+
+FuzzyIndex 在打分前用两级预筛选缩小候选集：
+1. 三元组 (trigram) 倒排索引：查询词（及其相邻字符交换后的变体）的三元组，
+   从最少见的开始合并倒排列表，按命中数取前 MAX_SCORED 个候选
+2. 字符位图：每个条目记录出现过的字符（64 位），缩写等无三元组命中的查询
+   只需检查位图包含关系；有 numpy 时对全部条目做一次向量化比较
+"""
+
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from typing import Any
+from urllib.parse import urlsplit
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时逐条比较位图
+    np = None
+
+# Type aliases
+FuzzyMatch = tuple[float, Any]  # (分数, 条目)
+
+SCORE_MATCH = 16
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 6
+BONUS_FIRST = 8  # 匹配从文本开头开始
+PENALTY_GAP_START = 3
+PENALTY_GAP_EXTENSION = 1
+TRANSPOSE_PENALTY = 12
+WEIGHT_SCALE = 4.0  # 条目权重（如访问次数的对数）换算为分数的系数
+
+MAX_TEXT = 256
+MAX_SCORED = 2000  # 每个查询最多打分的候选数
+MAX_GRAM_POSTINGS = 20000  # 合并的三元组倒排列表总长度上限
+
+_SEPARATORS = frozenset("/.-_ ?=&#:")
+
+
+def match_text(url: str, title: str = "") -> str:
+    """Lowercased host, path and title that a URL is matched against (query string dropped)."""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return f"{url} {title}".lower()[:MAX_TEXT]
+    rest = parts.netloc + parts.path if parts.netloc else url
+    if rest.startswith("www."):
+        rest = rest[4:]
+    return f"{rest} {title}".lower()[:MAX_TEXT]
+
+
+def _char_bit(c: str) -> int:
+    if "a" <= c <= "z":
+        return 1 << (ord(c) - 97)
+    if "0" <= c <= "9":
+        return 1 << (ord(c) - 22)
+    return 0 if c == " " else 1 << (36 + ord(c) % 28)
+
+
+_ASCII_BITS = {chr(i): _char_bit(chr(i)) for i in range(128)}
+
+
+def char_mask(text: str) -> int:
+    """64-bit set of the characters in text (letters and digits get their own bit)."""
+    bits = _ASCII_BITS
+    return sum({bits[c] if c in bits else _char_bit(c) for c in set(text)})
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def transpositions(term: str) -> list[str]:
+    """Variants of term with two adjacent characters swapped."""
+    return [
+        term[:i] + term[i + 1] + term[i] + term[i + 2 :]
+        for i in range(len(term) - 1)
+        if term[i] != term[i + 1]
+    ]
+
+
+def score_term(term: str, text: str) -> float | None:
+    """Score one lowercase term against text, or None if it does not match."""
+    result = _score_exact(term, text)
+    if result is not None or len(term) < 2:
+        return result
+    best = None
+    for variant in transpositions(term):
+        variant_score = _score_exact(variant, text)
+        if variant_score is not None and (best is None or variant_score > best):
+            best = variant_score
+    return None if best is None else best - TRANSPOSE_PENALTY
+
+
+def score(query: str, text: str) -> float | None:
+    """Score every term of query against text (already lowercased); None if any fails."""
+    total = 0.0
+    terms = query.lower().split()
+    if not terms:
+        return None
+    for term in terms:
+        term_score = score_term(term, text)
+        if term_score is None:
+            return None
+        total += term_score
+    return total
+
+
+def _is_boundary(text: str, pos: int) -> bool:
+    return pos == 0 or text[pos - 1] in _SEPARATORS
+
+
+def _score_exact(term: str, text: str) -> float | None:
+    # 子串匹配：检查前几次出现，优先落在单词边界上的
+    pos = text.find(term)
+    if pos >= 0:
+        best = -math.inf
+        for _ in range(3):
+            value = len(term) * SCORE_MATCH + (len(term) - 1) * BONUS_CONSECUTIVE
+            if _is_boundary(text, pos):
+                value += BONUS_BOUNDARY * 2 + (BONUS_FIRST if pos == 0 else 0)
+            best = max(best, value)
+            pos = text.find(term, pos + 1)
+            if pos < 0:
+                break
+        return best
+
+    # 子序列匹配：先向前找到最早的结束位置，再向后收紧起点
+    end = -1
+    for c in term:
+        end = text.find(c, end + 1)
+        if end < 0:
+            return None
+    positions = [end]
+    for c in reversed(term[:-1]):
+        positions.append(text.rfind(c, 0, positions[-1]))
+    positions.reverse()
+
+    value = 0.0
+    prev = -2
+    for pos in positions:
+        value += SCORE_MATCH
+        if pos == prev + 1:
+            value += BONUS_CONSECUTIVE
+        else:
+            if prev >= 0:
+                value -= PENALTY_GAP_START + PENALTY_GAP_EXTENSION * (pos - prev - 2)
+            if _is_boundary(text, pos):
+                value += BONUS_BOUNDARY
+        prev = pos
+    if positions[0] == 0:
+        value += BONUS_FIRST
+    # 间隔扣分超过全部加分时匹配过于分散，视为不匹配
+    return value if value >= len(term) * SCORE_MATCH else None
+
+
+class FuzzyIndex:
+    """Trigram and character-mask prefilters in front of the fuzzy scorer."""
+
+    def __init__(self) -> None:
+        self._texts: list[str | None] = []
+        self._items: list[Any] = []
+        self._ids: dict[str, int] = {}
+        self._weights = array("d")
+        self._masks = array("Q")
+        # 三元组 -> 条目 id；更新或删除后旧的 id 会留在列表中，打分时按当前文本校验
+        self._postings: defaultdict[str, array] = defaultdict(lambda: array("I"))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, key: str, text: str, weight: float = 0.0, item: Any = None) -> None:
+        """Add or update an entry (text is the lowercased text to match, see match_text)."""
+        text = text[:MAX_TEXT]
+        doc_id = self._ids.get(key)
+        if doc_id is None:
+            doc_id = self._ids[key] = len(self._texts)
+            self._texts.append(None)
+            self._items.append(None)
+            self._weights.append(0.0)
+            self._masks.append(0)
+        self._items[doc_id] = item if item is not None else key
+        self._weights[doc_id] = weight
+        old_text = self._texts[doc_id]
+        if text != old_text:
+            self._texts[doc_id] = text
+            self._masks[doc_id] = char_mask(text)
+            postings = self._postings
+            for gram in trigrams(text) - trigrams(old_text or ""):
+                postings[gram].append(doc_id)
+
+    def get(self, key: str) -> Any:
+        """Return the item stored for key, or None."""
+        doc_id = self._ids.get(key)
+        return None if doc_id is None else self._items[doc_id]
+
+    def set_weight(self, key: str, weight: float) -> None:
+        doc_id = self._ids.get(key)
+        if doc_id is not None:
+            self._weights[doc_id] = weight
+
+    def remove(self, key: str) -> None:
+        doc_id = self._ids.pop(key, None)
+        if doc_id is not None:
+            self._texts[doc_id] = None
+            self._items[doc_id] = None
+            self._masks[doc_id] = 0
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def search(self, query: str, k: int = 10) -> list[FuzzyMatch]:
+        """Return the k best (score, item) pairs for query, best first."""
+        terms = query.lower().split()
+        if not terms or not self._ids:
+            return []
+        query_mask = char_mask("".join(terms))
+        candidates = self._trigram_candidates(terms, query_mask)
+        scored = self._score_candidates(terms, candidates)
+        if len(scored) < k:
+            # 缩写等查询没有三元组命中，按字符位图从全部条目中补充候选
+            extra = self._mask_candidates(query_mask, set(candidates))
+            scored.update(self._score_candidates(terms, extra))
+            candidates += extra
+        if len(scored) < k:
+            # 匹配仍然不足时才尝试相邻字符交换，避免为每个候选生成变体
+            rest = [d for d in candidates if d not in scored]
+            scored.update(self._score_candidates(terms, rest, transposed=True))
+        best = heapq.nlargest(k, scored.items(), key=lambda pair: pair[1])
+        return [(value, self._items[doc_id]) for doc_id, value in best]
+
+    # ---- 内部辅助方法 ----
+
+    def _trigram_candidates(self, terms: list[str], query_mask: int) -> list[int]:
+        grams = set()
+        for term in terms:
+            grams |= trigrams(term)
+            for variant in transpositions(term):
+                grams |= trigrams(variant)
+        # 从最少见的三元组开始合并，常见三元组区分度低，超过上限后不再合并
+        postings = []
+        merged = 0
+        for posting in sorted((self._postings[g] for g in grams if g in self._postings), key=len):
+            merged += len(posting)
+            if merged > MAX_GRAM_POSTINGS and postings:
+                break
+            postings.append(posting)
+        if not postings:
+            return []
+
+        if np is not None:
+            ids, hits = np.unique(
+                np.concatenate([np.frombuffer(p, dtype=np.uint32) for p in postings]),
+                return_counts=True,
+            )
+            mask = np.uint64(query_mask)
+            keep = (np.frombuffer(self._masks, dtype=np.uint64)[ids] & mask) == mask
+            ids, hits = ids[keep], hits[keep]
+            if len(ids) > MAX_SCORED:
+                weights = np.frombuffer(self._weights, dtype=np.float64)[ids]
+                ids = ids[np.lexsort((-weights, -hits))[:MAX_SCORED]]
+            return ids.tolist()
+
+        counts: dict[int, int] = {}
+        for posting in postings:
+            for doc_id in posting:
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        masks = self._masks
+        candidates = [d for d in counts if masks[d] & query_mask == query_mask]
+        if len(candidates) > MAX_SCORED:
+            weights = self._weights
+            candidates = heapq.nlargest(
+                MAX_SCORED, candidates, key=lambda d: (counts[d], weights[d])
+            )
+        return candidates
+
+    def _mask_candidates(self, query_mask: int, exclude: set[int]) -> list[int]:
+        """Entries containing every query character, highest weight first."""
+        if np is not None:
+            mask = np.uint64(query_mask)
+            ids = np.flatnonzero((np.frombuffer(self._masks, dtype=np.uint64) & mask) == mask)
+            if len(ids) > MAX_SCORED:
+                weights = np.frombuffer(self._weights, dtype=np.float64)[ids]
+                ids = ids[np.argpartition(-weights, MAX_SCORED - 1)[:MAX_SCORED]]
+            return [d for d in ids.tolist() if d not in exclude]
+        candidates = [
+            d
+            for d, mask in enumerate(self._masks)
+            if mask & query_mask == query_mask and d not in exclude
+        ]
+        if len(candidates) > MAX_SCORED:
+            weights = self._weights
+            candidates = heapq.nlargest(MAX_SCORED, candidates, key=lambda d: weights[d])
+        return candidates
+
+    def _score_candidates(
+        self, terms: list[str], candidates: list[int], transposed: bool = False
+    ) -> dict[int, float]:
+        scorer = score_term if transposed else _score_exact
+        texts, weights = self._texts, self._weights
+        scored = {}
+        for doc_id in candidates:
+            text = texts[doc_id]
+            if text is None:
+                continue
+            total = 0.0
+            for term in terms:
+                term_score = scorer(term, text)
+                if term_score is None:
+                    break
+                total += term_score
+            else:
+                scored[doc_id] = total + WEIGHT_SCALE * weights[doc_id]
+        return scored
@@ -0,0 +1,257 @@
+"""History Analytics Module - Vectorized aggregates over visit history.
+
+访问记录被压缩成两个定长数组：
+- times:      int64，访问时间（把本地时间字符串按 UTC 解析得到的秒数，
+              因此 times // 86400 就是本地日期，无需时区换算）
+- domain_ids: int32，域名在驻留表 domains 中的下标
+
+按天 / 按小时 / 按域名的统计都用 numpy 的 bincount / unique 完成，不在 Python 中逐条循环。
+新访问到达时通过 add() 追加（容量倍增），已有的聚合结果随之增量更新。
+
+停留时间估算：一次访问持续到下一次访问为止，最长 MAX_DWELL_SECONDS 秒
+（更长的间隔视为用户离开）。
+"""
+
+from typing import Any
+from urllib.parse import urlsplit
+
+from url_canon import canonical_host
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时统计视图不可用
+    np = None
+
+# Type aliases
+HistoryRecord = dict[str, str]
+DomainStats = dict[str, Any]
+DaySummary = dict[str, Any]
+
+MAX_DWELL_SECONDS = 30 * 60
+_DAY = 86400
+_INITIAL_CAPACITY = 1024
+# 没有主机名的地址（file:, about: 等）固定使用 0 号域名，不参与按站点的统计
+_LOCAL_DOMAIN = 0
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def domain_of(url: str) -> str:
+    """Host of url without a leading "www." (empty for non-network URLs)."""
+    try:
+        host = canonical_host(urlsplit(url).hostname or "")
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_times(time_strs: list[str]) -> "np.ndarray":
+    """Parse "%Y-%m-%d %H:%M:%S" strings in one vectorized call (bad values become 0)."""
+    try:
+        parsed = np.array(time_strs, dtype="datetime64[s]")
+    except ValueError:
+        return np.array([_parse_time(t) for t in time_strs], dtype=np.int64)
+    result = parsed.astype(np.int64)
+    result[np.isnat(parsed)] = 0
+    return result
+
+
+def _parse_time(time_str: str) -> int:
+    try:
+        parsed = np.datetime64(time_str, "s")
+    except ValueError:
+        return 0
+    return 0 if np.isnat(parsed) else int(parsed.astype(np.int64))
+
+
+def _day_str(day: int) -> str:
+    return str(np.datetime64(day, "D"))
+
+
+class HistoryAnalytics:
+    """Per-day, per-hour and per-domain visit aggregates backed by NumPy arrays."""
+
+    def __init__(self) -> None:
+        if np is None:
+            raise RuntimeError("History analytics requires numpy")
+        self._times = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self._domain_ids = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+        self._size = 0
+        # 时间最晚的一次访问，新访问的停留时间间隔从它算起
+        self._last_time = 0
+        self._last_domain = -1
+        # 域名驻留表：id -> 域名，域名 -> id
+        self._domains: list[str] = [""]
+        self._domain_lookup: dict[str, int] = {"": _LOCAL_DOMAIN}
+        # URL -> 域名 id 缓存，避免重复解析同一 URL
+        self._url_domains: dict[str, int] = {}
+        # 聚合结果缓存（None 表示需要重新计算）
+        self._aggregates: dict[str, Any] | None = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def build(self, records: list[HistoryRecord]) -> None:
+        n = len(records)
+        self._reserve(n)
+        self._times[:n] = parse_times([r.get("time", "") for r in records])
+        self._domain_ids[:n] = np.fromiter(
+            (self._domain_id(r.get("url", "")) for r in records), dtype=np.int32, count=n
+        )
+        self._size = n
+        self._aggregates = None
+        if n:
+            latest = int(np.argmax(self._times[:n]))
+            self._last_time = int(self._times[latest])
+            self._last_domain = int(self._domain_ids[latest])
+        else:
+            self._last_time, self._last_domain = 0, -1
+
+    def add(self, record: HistoryRecord) -> None:
+        """Append one visit and update cached aggregates in O(1) (amortized)."""
+        t = _parse_time(record.get("time", ""))
+        domain_id = self._domain_id(record.get("url", ""))
+        self._reserve(self._size + 1)
+        self._times[self._size] = t
+        self._domain_ids[self._size] = domain_id
+        self._size += 1
+        prev_time, prev_domain = self._last_time, self._last_domain
+        if t >= prev_time:
+            self._last_time, self._last_domain = t, domain_id
+
+        agg = self._aggregates
+        if agg is None:
+            return
+        if t < prev_time:
+            # 乱序到达，停留时间需要整体重算
+            self._aggregates = None
+            return
+        agg["days"][t // _DAY] = agg["days"].get(t // _DAY, 0) + 1
+        agg["hours"][(t % _DAY) // 3600] += 1
+        self._grow_domain_arrays(agg)
+        agg["domain_visits"][domain_id] += 1
+        agg["last_visit"][domain_id] = max(agg["last_visit"][domain_id], t)
+        if prev_domain >= 0:
+            agg["dwell"][prev_domain] += min(t - prev_time, MAX_DWELL_SECONDS)
+        agg["daily_top"] = None
+
+    def visits_per_day(self) -> list[tuple[str, int]]:
+        """(YYYY-MM-DD, visits) for each day with visits, oldest first."""
+        days = self._compute()["days"]
+        return [(_day_str(day), days[day]) for day in sorted(days)]
+
+    def visits_per_hour(self) -> list[int]:
+        """Visit counts for each hour of the day (0-23)."""
+        return self._compute()["hours"].tolist()
+
+    def top_domains(self, k: int = 20) -> list[DomainStats]:
+        """The k most visited domains with visit counts, estimated dwell time and last visit."""
+        agg = self._compute()
+        visits = agg["domain_visits"].copy()
+        visits[_LOCAL_DOMAIN] = 0
+        k = min(k, len(visits))
+        if k <= 0:
+            return []
+        # argpartition 取前 k 个，再只对这 k 个排序
+        top = np.argpartition(-visits, k - 1)[:k]
+        top = top[np.lexsort((top, -visits[top]))]
+        return [
+            {
+                "domain": self._domains[i],
+                "visits": int(visits[i]),
+                "dwell_seconds": int(agg["dwell"][i]),
+                "last_visit": str(np.datetime64(int(agg["last_visit"][i]), "s")).replace(
+                    "T", " "
+                ),
+            }
+            for i in top
+            if visits[i]
+        ]
+
+    def daily_summary(self) -> list[DaySummary]:
+        """Per-day visit count and most visited domain, newest day first."""
+        agg = self._compute()
+        if agg["daily_top"] is None:
+            agg["daily_top"] = self._daily_top()
+        days = agg["days"]
+        return [
+            {"day": _day_str(day), "visits": days[day], "top_domain": agg["daily_top"].get(day, "")}
+            for day in sorted(days, reverse=True)
+        ]
+
+    # ---- 内部辅助方法 ----
+
+    def _domain_id(self, url: str) -> int:
+        domain_id = self._url_domains.get(url)
+        if domain_id is None:
+            domain = domain_of(url)
+            domain_id = self._domain_lookup.get(domain)
+            if domain_id is None:
+                domain_id = self._domain_lookup[domain] = len(self._domains)
+                self._domains.append(domain)
+            self._url_domains[url] = domain_id
+        return domain_id
+
+    def _reserve(self, n: int) -> None:
+        capacity = len(self._times)
+        if n <= capacity:
+            return
+        while capacity < n:
+            capacity *= 2
+        self._times = np.resize(self._times, capacity)
+        self._domain_ids = np.resize(self._domain_ids, capacity)
+
+    def _grow_domain_arrays(self, agg: dict[str, Any]) -> None:
+        missing = len(self._domains) - len(agg["domain_visits"])
+        if missing > 0:
+            for key in ("domain_visits", "dwell", "last_visit"):
+                agg[key] = np.concatenate([agg[key], np.zeros(missing, dtype=agg[key].dtype)])
+
+    def _compute(self) -> dict[str, Any]:
+        if self._aggregates is not None:
+            return self._aggregates
+        n_domains = len(self._domains)
+        times = self._times[: self._size]
+        domains = self._domain_ids[: self._size]
+
+        day_numbers, day_counts = np.unique(times // _DAY, return_counts=True)
+        last_visit = np.zeros(n_domains, dtype=np.int64)
+        np.maximum.at(last_visit, domains, times)
+
+        # 停留时间：按时间排序后相邻访问的间隔，归到前一次访问的域名
+        order = np.argsort(times, kind="stable")
+        sorted_times = times[order]
+        gaps = np.minimum(np.diff(sorted_times), MAX_DWELL_SECONDS)
+        dwell = np.bincount(domains[order][:-1], weights=gaps, minlength=n_domains)
+
+        self._aggregates = {
+            "days": dict(zip(day_numbers.tolist(), day_counts.tolist(), strict=True)),
+            "hours": np.bincount((times % _DAY) // 3600, minlength=24),
+            "domain_visits": np.bincount(domains, minlength=n_domains),
+            "dwell": dwell,
+            "last_visit": last_visit,
+            "daily_top": None,
+        }
+        return self._aggregates
+
+    def _daily_top(self) -> dict[int, str]:
+        """Most visited domain of each day, via one unique() over (day, domain) keys."""
+        domains = self._domain_ids[: self._size]
+        network = domains != _LOCAL_DOMAIN
+        if not network.any():
+            return {}
+        n_domains = len(self._domains)
+        keys = (self._times[: self._size][network] // _DAY) * n_domains + domains[network]
+        pairs, counts = np.unique(keys, return_counts=True)
+        days = pairs // n_domains
+        # 每天按访问次数降序，取第一项
+        order = np.lexsort((-counts, days))
+        days, pairs = days[order], pairs[order]
+        first = np.ones(len(days), dtype=bool)
+        first[1:] = days[1:] != days[:-1]
+        return {
+            int(day): self._domains[int(pair % n_domains)]
+            for day, pair in zip(days[first], pairs[first], strict=True)
+        }
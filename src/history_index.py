@@ -0,0 +1,137 @@
+"""History Index Module - Incremental inverted index over history titles and URLs.
+
+每个 URL 是一个文档，索引其标题和 URL 的词元 (token)。
+- 英文/数字按单词切分，查询词按前缀匹配（"git" 可匹配 "github"）
+- 中文等非 ASCII 文本按单字切分，多字查询相当于按字求交集
+- 多个查询词之间为 AND 关系，结果按最近访问时间倒序分页返回
+"""
+
+import bisect
+import heapq
+import re
+
+# Type aliases
+HistoryRecord = dict[str, str]
+SearchPage = tuple[list[HistoryRecord], int]
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> set[str]:
+    """Split text into lowercase index tokens."""
+    tokens = set()
+    for word in _WORD_RE.findall(text.lower()):
+        if word.isascii():
+            tokens.add(word)
+        else:
+            # 非 ASCII（如中文）按单字索引
+            tokens.update(word)
+    return tokens
+
+
+class HistorySearchIndex:
+    """Inverted index (token -> doc ids) with a sorted token list for prefix lookup."""
+
+    def __init__(self) -> None:
+        self._docs: list[HistoryRecord | None] = []
+        self._doc_tokens: list[set[str]] = []
+        self._doc_ids: dict[str, int] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._sorted_tokens: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def build(self, records: list[HistoryRecord]) -> None:
+        """Rebuild the index from records in chronological order."""
+        self.clear()
+        for record in records:
+            self._add(record, keep_sorted=False)
+        # 新词元逐个 insort 是 O(V²)，批量构建时最后排序一次
+        self._sorted_tokens = sorted(self._postings)
+
+    def clear(self) -> None:
+        self._docs.clear()
+        self._doc_tokens.clear()
+        self._doc_ids.clear()
+        self._postings.clear()
+        self._sorted_tokens.clear()
+
+    def add(self, record: HistoryRecord) -> None:
+        """Add a visit; an already indexed URL gets its title and time updated."""
+        self._add(record, keep_sorted=True)
+
+    def _add(self, record: HistoryRecord, keep_sorted: bool) -> None:
+        url = record.get("url", "")
+        if not url:
+            return
+        title = record.get("title", "")
+        doc_id = self._doc_ids.get(url)
+        if doc_id is None:
+            doc_id = len(self._docs)
+            self._doc_ids[url] = doc_id
+            self._docs.append({"time": record.get("time", ""), "url": url, "title": title})
+            self._doc_tokens.append(set())
+        else:
+            doc = self._docs[doc_id]
+            doc["time"] = max(doc["time"], record.get("time", ""))
+            if not title:
+                return
+            doc["title"] = title
+
+        tokens = tokenize(url) | tokenize(self._docs[doc_id]["title"])
+        old_tokens = self._doc_tokens[doc_id]
+        for token in old_tokens - tokens:
+            self._postings[token].discard(doc_id)
+        for token in tokens - old_tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                if keep_sorted:
+                    bisect.insort(self._sorted_tokens, token)
+            posting.add(doc_id)
+        self._doc_tokens[doc_id] = tokens
+
+    def remove(self, url: str) -> None:
+        """Remove a URL from the index."""
+        doc_id = self._doc_ids.pop(url, None)
+        if doc_id is None:
+            return
+        for token in self._doc_tokens[doc_id]:
+            self._postings[token].discard(doc_id)
+        self._doc_tokens[doc_id] = set()
+        self._docs[doc_id] = None
+
+    def search(self, query: str, page: int = 0, page_size: int = 50) -> SearchPage:
+        """
+        Search the index.
+
+        Returns:
+            Tuple of (records on this page newest first, total number of matches)
+        """
+        terms = sorted(tokenize(query), key=len, reverse=True)
+        if not terms:
+            return [], 0
+
+        matches: set[int] | None = None
+        for term in terms:
+            # 较长的词通常更有区分度，先求交集可以尽快缩小候选集
+            docs = self._prefix_docs(term)
+            matches = docs if matches is None else matches & docs
+            if not matches:
+                return [], 0
+
+        total = len(matches)
+        end = (page + 1) * page_size
+        top = heapq.nlargest(end, matches, key=lambda d: self._docs[d]["time"])
+        return [dict(self._docs[d]) for d in top[page * page_size : end]], total
+
+    def _prefix_docs(self, prefix: str) -> set[int]:
+        """Union of postings for all tokens starting with prefix."""
+        exact = self._postings.get(prefix)
+        result = set(exact) if exact else set()
+        i = bisect.bisect_right(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            result |= self._postings[self._sorted_tokens[i]]
+            i += 1
+        return result
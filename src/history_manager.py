@@ -1,56 +1,1148 @@
-"""History Manager Module - Manages browser history records."""
+"""History Manager Module - Manages browser history records.
+
+HistoryManager 是静态门面，实际存储由可插拔的后端完成：
+- SqliteHistoryStore (默认): history.db，urls/visits 两张表，按访问时间和 URL 建索引
+- JsonHistoryStore: history_segments/ 目录下按天分段的 JSON-lines 文件
+
+两种后端都按天 (segment) 统计记录数与大小，时间范围删除和保留策略
+（最长保留天数 / 最大条数 / 最大字节数）以整段为单位丢弃旧数据。
+
+旧版本的 history.json / history.jsonl 会在首次使用时自动迁移。
+"""
 
 import datetime
 import json
+import math
 import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import frecency
+import history_analytics
+from frecency import FrecencyTable, SiteStats
+from fuzzy_match import FuzzyIndex, match_text
+from history_analytics import HistoryAnalytics
+from history_index import HistorySearchIndex, SearchPage
+from history_writer import HistoryWriter
+from url_canon import canonicalize
+from visit_coalescer import VISIT_MERGED, VISIT_REDIRECT, VisitCoalescer
 
 # 使用项目根目录（src 的上级目录）作为数据文件存储路径
 _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 HISTORY_FILE = os.path.join(_PROJECT_ROOT, "history.json")
+HISTORY_JOURNAL_FILE = os.path.join(_PROJECT_ROOT, "history.jsonl")
+HISTORY_DB_FILE = os.path.join(_PROJECT_ROOT, "history.db")
+HISTORY_SEGMENTS_DIR = os.path.join(_PROJECT_ROOT, "history_segments")
+
+# 后台执行保留策略的间隔（秒）
+RETENTION_INTERVAL = 600
+
+# 可选的存储后端名称（settings.json 中的 "history_backend"）
+HISTORY_BACKENDS = ("sqlite", "json")
+DEFAULT_HISTORY_BACKEND = "sqlite"
 
 # Type aliases
 HistoryRecord = dict[str, str]
+Segment = tuple[str, int, int]  # (day, record count, bytes)
+RetentionPolicy = dict[str, int | None]
+HistoryListener = Callable[[HistoryRecord | None], Any]  # None 表示历史整体发生了变化
 
 
-class HistoryManager:
-    """Manages browser history records with persistence."""
+class HistoryStore:
+    """
+    History storage backend interface.
 
-    @staticmethod
-    def load_history() -> list[HistoryRecord]:
-        """Load history records from file."""
-        if not os.path.exists(HISTORY_FILE):
+    默认实现基于 load_all() 在内存中完成查询，子类可以用索引覆盖。
+    """
+
+    # 最近一条记录的 URL 缓存（None 表示需要重新读取）
+    _last_url: str | None = None
+
+    def load_all(self) -> list[HistoryRecord]:
+        """Return all records in chronological order."""
+        raise NotImplementedError
+
+    def add_records(self, records: list[HistoryRecord]) -> bool:
+        """Append records (already in chronological order)."""
+        raise NotImplementedError
+
+    def import_records(self, records: list[HistoryRecord]) -> bool:
+        """Add a chunk of records that may be older than the existing history."""
+        ok = self.add_records(records)
+        # 导入的记录不一定晚于已有记录，最后访问的 URL 需要重新读取
+        self._last_url = None
+        return ok
+
+    def last_url(self) -> str:
+        """Return the URL of the most recent record, or "" if empty."""
+        history = self.load_all()
+        return history[-1].get("url", "") if history else ""
+
+    def recent(self, limit: int, filter_text: str = "", offset: int = 0) -> list[HistoryRecord]:
+        """Return up to limit records after skipping offset, newest first, optionally filtered."""
+        needle = filter_text.lower()
+        result = []
+        for item in reversed(self.load_all()):
+            if (
+                not needle
+                or needle in item.get("title", "").lower()
+                or needle in item.get("url", "").lower()
+            ):
+                result.append(item)
+                if len(result) >= offset + limit:
+                    break
+        return result[offset:]
+
+    def recent_urls(self, limit: int) -> list[HistoryRecord]:
+        """Return up to limit distinct URLs, most recently visited first."""
+        seen = set()
+        result = []
+        for item in reversed(self.load_all()):
+            url = item.get("url", "")
+            if url and url not in seen:
+                seen.add(url)
+                result.append(item)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def top_sites(self, k: int) -> list[SiteStats]:
+        """Return the k URLs with the highest frecency score."""
+        table = FrecencyTable()
+        table.build(self.load_all())
+        return table.top(k)
+
+    def segments(self) -> list[Segment]:
+        """Return (day, record count, bytes) for every segment, oldest first."""
+        raise NotImplementedError
+
+    def drop_segments_before(self, day: str) -> int:
+        """Drop whole segments older than day. Returns the number of records removed."""
+        raise NotImplementedError
+
+    def apply_retention(self, policy: RetentionPolicy, now: datetime.datetime | None = None) -> int:
+        """
+        Drop the oldest segments until the policy is satisfied.
+
+        policy 的键：max_age_days / max_entries / max_bytes（None 或 0 表示不限制）。
+        最新的一段总会保留。返回删除的记录数。
+        """
+        segments = self.segments()
+        if not segments:
+            return 0
+        keep_from = segments[0][0]
+
+        max_age_days = policy.get("max_age_days")
+        if max_age_days:
+            now = now or datetime.datetime.now()
+            cutoff_day = (now - datetime.timedelta(days=max_age_days)).strftime("%Y-%m-%d")
+            keep_from = max(keep_from, cutoff_day)
+
+        max_entries = policy.get("max_entries")
+        max_bytes = policy.get("max_bytes")
+        if max_entries or max_bytes:
+            total_entries = total_bytes = 0
+            newer_day = None
+            for day, count, size in reversed(segments):
+                total_entries += count
+                total_bytes += size
+                if (max_entries and total_entries > max_entries) or (
+                    max_bytes and total_bytes > max_bytes
+                ):
+                    keep_from = max(keep_from, newer_day or day)
+                    break
+                newer_day = day
+
+        keep_from = min(keep_from, segments[-1][0])
+        if keep_from <= segments[0][0]:
+            return 0
+        return self.drop_segments_before(keep_from)
+
+    def clear(self) -> bool:
+        """Remove all records."""
+        raise NotImplementedError
+
+    def delete_since(self, cutoff: str) -> bool:
+        """Remove records whose time is at or after cutoff."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class JsonHistoryStore(HistoryStore):
+    """
+    Day-segmented JSON-lines backend.
+
+    每天一个追加日志 history_segments/YYYY-MM-DD.jsonl，每行一条记录。
+    按时间范围删除或执行保留策略时，整天的数据直接删除文件，
+    只有跨越边界的那一天需要重写。
+    """
+
+    def __init__(self, segments_dir: str | None = None, migrate: bool = True):
+        self.segments_dir = segments_dir or HISTORY_SEGMENTS_DIR
+        # 会话内缓存（None 表示尚未读取）
+        self._last_url: str | None = None
+        self._segment_counts: dict[str, int] | None = None
+        # 每个 URL 的聚合数据，首次查询时构建，之后随追加增量更新
+        self._frecency: FrecencyTable | None = None
+        if migrate:
+            self._migrate_legacy()
+
+    def load_all(self) -> list[HistoryRecord]:
+        history = []
+        counts = {}
+        for day in self._segment_days():
+            records = self._read_segment(day)
+            counts[day] = len(records)
+            history.extend(records)
+        self._segment_counts = counts
+        self._last_url = history[-1].get("url", "") if history else ""
+        return history
+
+    def last_url(self) -> str:
+        if self._last_url is None:
+            self._last_url = ""
+            for day in reversed(self._segment_days()):
+                records = self._read_segment(day)
+                if records:
+                    self._last_url = records[-1].get("url", "")
+                    break
+        return self._last_url
+
+    def add_records(self, records: list[HistoryRecord]) -> bool:
+        if not records:
+            return True
+        by_day: dict[str, list[HistoryRecord]] = {}
+        for record in records:
+            by_day.setdefault(segment_key(record.get("time", "")), []).append(record)
+        try:
+            os.makedirs(self.segments_dir, exist_ok=True)
+            for day, day_records in by_day.items():
+                with open(self._segment_path(day), "a", encoding="utf-8") as f:
+                    for record in day_records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if self._segment_counts is not None:
+                    self._segment_counts[day] = self._segment_counts.get(day, 0) + len(
+                        day_records
+                    )
+        except OSError as e:
+            print("History save error:", e)
+            return False
+
+        self._last_url = records[-1].get("url", "")
+        if self._frecency is not None:
+            for record in records:
+                self._frecency.add(record)
+        return True
+
+    def top_sites(self, k: int) -> list[SiteStats]:
+        if self._frecency is None:
+            self._frecency = FrecencyTable()
+            self._frecency.build(self.load_all())
+        return self._frecency.top(k)
+
+    def segments(self) -> list[Segment]:
+        if self._segment_counts is None:
+            self._segment_counts = {
+                day: len(self._read_segment(day)) for day in self._segment_days()
+            }
+        result = []
+        for day in sorted(self._segment_counts):
+            try:
+                size = os.path.getsize(self._segment_path(day))
+            except OSError:
+                size = 0
+            result.append((day, self._segment_counts[day], size))
+        return result
+
+    def drop_segments_before(self, day: str) -> int:
+        dropped = 0
+        for segment_day in self._segment_days():
+            if segment_day >= day:
+                break
+            dropped += self._remove_segment(segment_day)
+        if dropped:
+            self._invalidate()
+        return dropped
+
+    def clear(self) -> bool:
+        try:
+            for day in self._segment_days():
+                os.remove(self._segment_path(day))
+        except OSError as e:
+            print("History clear error:", e)
+            return False
+        self._invalidate()
+        self._last_url = ""
+        return True
+
+    def delete_since(self, cutoff: str) -> bool:
+        cutoff_day = segment_key(cutoff)
+        try:
+            for day in self._segment_days():
+                if day > cutoff_day:
+                    os.remove(self._segment_path(day))
+                elif day == cutoff_day:
+                    records = self._read_segment(day)
+                    kept = [r for r in records if r.get("time", "") < cutoff]
+                    if len(kept) != len(records):
+                        self._write_segment(day, kept)
+        except OSError as e:
+            print("History clear error:", e)
+            return False
+        self._invalidate()
+        return True
+
+    # ---- 内部辅助方法 ----
+
+    def _segment_path(self, day: str) -> str:
+        return os.path.join(self.segments_dir, day + ".jsonl")
+
+    def _segment_days(self) -> list[str]:
+        """Days that have a segment file, oldest first."""
+        try:
+            names = os.listdir(self.segments_dir)
+        except OSError:
             return []
+        return sorted(name[:-6] for name in names if name.endswith(".jsonl"))
+
+    def _read_segment(self, day: str) -> list[HistoryRecord]:
+        records = _read_json_lines(self._segment_path(day))
+        # 导入的旧记录可能追加在已有记录之后，按时间稳定排序
+        records.sort(key=lambda r: r.get("time", ""))
+        return records
+
+    def _write_segment(self, day: str, records: list[HistoryRecord]) -> None:
+        path = self._segment_path(day)
+        if not records:
+            os.remove(path)
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+    def _remove_segment(self, day: str) -> int:
+        count = (self._segment_counts or {}).get(day)
+        if count is None:
+            count = len(self._read_segment(day))
+        try:
+            os.remove(self._segment_path(day))
+        except OSError as e:
+            print("History clear error:", e)
+            return 0
+        return count
+
+    def _invalidate(self) -> None:
+        self._segment_counts = None
+        self._last_url = None
+        self._frecency = None
+
+    def _migrate_legacy(self) -> None:
+        """Split the old history.json snapshot / history.jsonl journal into day segments."""
+        records = _read_legacy_history()
+        if records is None or not self.add_records(records):
+            return
+        _retire_legacy_history()
+
+
+def segment_key(time_str: str) -> str:
+    """Segment (day) a record time belongs to, e.g. "2026-03-11"."""
+    return time_str[:10] if len(time_str) >= 10 else "0000-00-00"
+
+
+def _read_legacy_history() -> list[HistoryRecord] | None:
+    """Read the old history.json snapshot and history.jsonl journal (None if neither exists)."""
+    has_snapshot = os.path.exists(HISTORY_FILE)
+    has_journal = os.path.exists(HISTORY_JOURNAL_FILE)
+    if not has_snapshot and not has_journal:
+        return None
+    records = []
+    if has_snapshot:
         try:
             with open(HISTORY_FILE, encoding="utf-8") as f:
-                return json.load(f)
+                records = json.load(f)
         except (OSError, json.JSONDecodeError):
-            return []
+            records = []
+    records.extend(_read_json_lines(HISTORY_JOURNAL_FILE))
+    return records
+
+
+def _retire_legacy_history() -> None:
+    """Keep the old snapshot as history.json.migrated and drop the journal once imported."""
+    try:
+        if os.path.exists(HISTORY_FILE):
+            os.replace(HISTORY_FILE, HISTORY_FILE + ".migrated")
+        if os.path.exists(HISTORY_JOURNAL_FILE):
+            os.remove(HISTORY_JOURNAL_FILE)
+    except OSError as e:
+        print("History migration error:", e)
+
+
+def _read_json_lines(path: str) -> list[HistoryRecord]:
+    if not os.path.exists(path):
+        return []
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 写入中断留下的残行，跳过
+                    continue
+    except OSError:
+        return []
+    return records
+
+
+class SqliteHistoryStore(HistoryStore):
+    """
+    SQLite backend.
+
+    urls 表按 URL 去重并保存访问次数、最后访问时间和 frecency 分数（见 frecency 模块）；
+    visits 表每次访问一行，按 time 和 (url_id, time) 建索引；
+    segments 表按天汇总记录数与估算字节数，保留策略无需扫描 visits 即可决定丢弃范围。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS urls (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL DEFAULT '',
+            visit_count INTEGER NOT NULL DEFAULT 0,
+            last_visit TEXT NOT NULL DEFAULT '',
+            frecency REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS visits (
+            id INTEGER PRIMARY KEY,
+            url_id INTEGER NOT NULL REFERENCES urls(id),
+            time TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS segments (
+            day TEXT PRIMARY KEY,
+            visit_count INTEGER NOT NULL DEFAULT 0,
+            bytes INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_visits_time ON visits(time);
+        CREATE INDEX IF NOT EXISTS idx_visits_url ON visits(url_id, time);
+        CREATE INDEX IF NOT EXISTS idx_urls_last_visit ON urls(last_visit);
+    """
+
+    def __init__(self, db_path: str | None = None):
+        self.db_path = db_path or HISTORY_DB_FILE
+        is_new = not os.path.exists(self.db_path)
+        # 连接会被后台写入线程使用，访问由 HistoryManager._lock 串行化
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.create_function("log_add", 2, frecency.log_add, deterministic=True)
+        self._conn.executescript(self.SCHEMA)
+        self._upgrade_schema()
+        self._last_url: str | None = None
+        if is_new:
+            self.migrate_from_json()
+
+    def _upgrade_schema(self) -> None:
+        """Add columns introduced after the first release and backfill them."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(urls)")}
+        if "frecency" not in columns:
+            with self._conn:
+                self._conn.execute(
+                    "ALTER TABLE urls ADD COLUMN frecency REAL NOT NULL DEFAULT 0"
+                )
+                url_ids = [row[0] for row in self._conn.execute("SELECT id FROM urls")]
+                for url_id in url_ids:
+                    self._recompute_url(url_id)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_urls_frecency ON urls(frecency)"
+        )
+        has_segments = self._conn.execute("SELECT 1 FROM segments LIMIT 1").fetchone()
+        has_visits = self._conn.execute("SELECT 1 FROM visits LIMIT 1").fetchone()
+        if has_visits and not has_segments:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO segments (day, visit_count, bytes) "
+                    "SELECT substr(v.time, 1, 10), COUNT(*), "
+                    "SUM(length(u.url) + length(u.title) + length(v.time)) "
+                    "FROM visits v JOIN urls u ON u.id = v.url_id GROUP BY 1"
+                )
+
+    def migrate_from_json(self) -> int:
+        """
+        Bulk import JSON history inside a single transaction.
+
+        旧版 history.json / history.jsonl 直接读取，不经过 JsonHistoryStore 转存为分段；
+        事务提交后再将它们移走。已有的 JSON 分段（切换后端前的数据）只读导入。
+        """
+        legacy = _read_legacy_history()
+        records = (legacy or []) + JsonHistoryStore(migrate=False).load_all()
+        records.sort(key=lambda r: r.get("time", ""))
+        if not self.add_records(records):
+            return 0
+        if legacy is not None:
+            _retire_legacy_history()
+        return len(records)
+
+    def load_all(self) -> list[HistoryRecord]:
+        rows = self._conn.execute(
+            "SELECT v.time, u.url, u.title FROM visits v JOIN urls u ON u.id = v.url_id "
+            "ORDER BY v.time, v.id"
+        )
+        return [{"time": t, "url": url, "title": title} for t, url, title in rows]
+
+    def last_url(self) -> str:
+        if self._last_url is None:
+            row = self._conn.execute(
+                "SELECT u.url FROM visits v JOIN urls u ON u.id = v.url_id "
+                "ORDER BY v.time DESC, v.id DESC LIMIT 1"
+            ).fetchone()
+            self._last_url = row[0] if row else ""
+        return self._last_url
+
+    def add_records(self, records: list[HistoryRecord]) -> bool:
+        if not records:
+            return True
+        try:
+            with self._conn:
+                for record in records:
+                    url = record.get("url", "")
+                    title = record.get("title", "")
+                    visit_time = record.get("time", "")
+                    weight = frecency.visit_weight(frecency.parse_time(visit_time))
+                    self._conn.execute(
+                        "INSERT INTO urls (url, title, visit_count, last_visit, frecency) "
+                        "VALUES (?, ?, 1, ?, ?) "
+                        "ON CONFLICT(url) DO UPDATE SET "
+                        "title = CASE WHEN excluded.title != '' THEN excluded.title ELSE title END, "
+                        "visit_count = visit_count + 1, "
+                        "last_visit = MAX(last_visit, excluded.last_visit), "
+                        "frecency = log_add(frecency, excluded.frecency)",
+                        (url, title, visit_time, weight),
+                    )
+                    self._conn.execute(
+                        "INSERT INTO visits (url_id, time) "
+                        "SELECT id, ? FROM urls WHERE url = ?",
+                        (visit_time, url),
+                    )
+                    self._conn.execute(
+                        "INSERT INTO segments (day, visit_count, bytes) VALUES (?, 1, ?) "
+                        "ON CONFLICT(day) DO UPDATE SET "
+                        "visit_count = visit_count + 1, bytes = bytes + excluded.bytes",
+                        (segment_key(visit_time), len(url) + len(title) + len(visit_time)),
+                    )
+        except sqlite3.Error as e:
+            print("History save error:", e)
+            return False
+        self._last_url = records[-1].get("url", "")
+        return True
+
+    def recent(self, limit: int, filter_text: str = "", offset: int = 0) -> list[HistoryRecord]:
+        sql = "SELECT v.time, u.url, u.title FROM visits v JOIN urls u ON u.id = v.url_id "
+        params: list = []
+        if filter_text:
+            sql += "WHERE u.url LIKE ? ESCAPE '\\' OR u.title LIKE ? ESCAPE '\\' "
+            pattern = "%" + _escape_like(filter_text) + "%"
+            params.extend([pattern, pattern])
+        sql += "ORDER BY v.time DESC, v.id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        rows = self._conn.execute(sql, params)
+        return [{"time": t, "url": url, "title": title} for t, url, title in rows]
+
+    def recent_urls(self, limit: int) -> list[HistoryRecord]:
+        rows = self._conn.execute(
+            "SELECT last_visit, url, title FROM urls ORDER BY last_visit DESC LIMIT ?",
+            (limit,),
+        )
+        return [{"time": t, "url": url, "title": title} for t, url, title in rows]
+
+    def top_sites(self, k: int) -> list[SiteStats]:
+        rows = self._conn.execute(
+            "SELECT url, title, visit_count, last_visit, frecency FROM urls "
+            "ORDER BY frecency DESC LIMIT ?",
+            (k,),
+        )
+        return [
+            frecency.to_site_stats(
+                {
+                    "url": url,
+                    "title": title,
+                    "visit_count": count,
+                    "last_visit": last_visit,
+                    "frecency": score,
+                }
+            )
+            for url, title, count, last_visit, score in rows
+        ]
+
+    def segments(self) -> list[Segment]:
+        return list(
+            self._conn.execute("SELECT day, visit_count, bytes FROM segments ORDER BY day")
+        )
+
+    def drop_segments_before(self, day: str) -> int:
+        try:
+            with self._conn:
+                (dropped,) = self._conn.execute(
+                    "SELECT COALESCE(SUM(visit_count), 0) FROM segments WHERE day < ?",
+                    (day,),
+                ).fetchone()
+                # "YYYY-MM-DD hh:mm:ss" < "YYYY-MM-DD" 对当天及之后的记录不成立
+                self._delete_visits("time < ?", day)
+                self._conn.execute("DELETE FROM segments WHERE day < ?", (day,))
+        except sqlite3.Error as e:
+            print("History clear error:", e)
+            return 0
+        self._last_url = None
+        return dropped
+
+    def clear(self) -> bool:
+        try:
+            with self._conn:
+                self._conn.execute("DELETE FROM visits")
+                self._conn.execute("DELETE FROM urls")
+                self._conn.execute("DELETE FROM segments")
+        except sqlite3.Error as e:
+            print("History clear error:", e)
+            return False
+        self._last_url = ""
+        return True
+
+    def delete_since(self, cutoff: str) -> bool:
+        cutoff_day = segment_key(cutoff)
+        try:
+            with self._conn:
+                self._delete_visits("time >= ?", cutoff)
+                self._conn.execute("DELETE FROM segments WHERE day > ?", (cutoff_day,))
+                self._refresh_segment(cutoff_day)
+        except sqlite3.Error as e:
+            print("History clear error:", e)
+            return False
+        self._last_url = None
+        return True
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _delete_visits(self, where: str, param: str) -> None:
+        """Delete visits matching an indexed time condition and fix up their URLs."""
+        affected = [
+            row[0]
+            for row in self._conn.execute(
+                f"SELECT DISTINCT url_id FROM visits WHERE {where}", (param,)
+            )
+        ]
+        self._conn.execute(f"DELETE FROM visits WHERE {where}", (param,))
+        for url_id in affected:
+            self._recompute_url(url_id)
+
+    def _refresh_segment(self, day: str) -> None:
+        """Recount one segment from its visits."""
+        count, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(u.url) + length(u.title) + length(v.time)), 0) "
+            "FROM visits v JOIN urls u ON u.id = v.url_id "
+            "WHERE v.time >= ? AND v.time < ?",
+            (day, day + "~"),
+        ).fetchone()
+        if count:
+            self._conn.execute(
+                "UPDATE segments SET visit_count = ?, bytes = ? WHERE day = ?",
+                (count, size, day),
+            )
+        else:
+            self._conn.execute("DELETE FROM segments WHERE day = ?", (day,))
+
+    def _recompute_url(self, url_id: int) -> None:
+        """Rebuild one URL's aggregates from its visits (deleting it if none remain)."""
+        times = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT time FROM visits WHERE url_id = ? ORDER BY time", (url_id,)
+            )
+        ]
+        if not times:
+            self._conn.execute("DELETE FROM urls WHERE id = ?", (url_id,))
+            return
+        score = None
+        for visit_time in times:
+            score = frecency.add_visit(score, frecency.parse_time(visit_time))
+        self._conn.execute(
+            "UPDATE urls SET visit_count = ?, last_visit = ?, frecency = ? WHERE id = ?",
+            (len(times), times[-1], score, url_id),
+        )
+
+
+def _escape_like(text: str) -> str:
+    """Escape LIKE wildcards so the text is matched literally."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class HistoryManager:
+    """Manages browser history records through a pluggable storage backend.
+
+    页面访问经 record_visit() 先由 VisitCoalescer 合并重复访问与重定向链，
+    再进入后台写入队列 (HistoryWriter)，不会在 GUI 线程上写盘；
+    所有对存储的访问都由 _lock 串行化，因此后台线程与 GUI 线程可以共享同一个存储。
+    """
+
+    _store: HistoryStore | None = None
+    _lock = threading.RLock()
+    _writer: HistoryWriter | None = None
+    # 全文搜索索引，首次搜索时构建，之后随新访问增量更新
+    _search_index: HistorySearchIndex | None = None
+    # 模糊匹配索引（缩写、相邻字符写反），全文搜索无结果时使用
+    _fuzzy_index: FuzzyIndex | None = None
+    # 按天 / 按站点的统计（需要 numpy），首次使用时构建，之后随新访问增量更新
+    _analytics: HistoryAnalytics | None = None
+    # 保留策略，由后台写入线程每隔 RETENTION_INTERVAL 秒执行一次
+    _retention: RetentionPolicy = {}
+    # 合并重复访问与重定向链，减少写入量
+    _coalescer = VisitCoalescer()
+    # 来自标签页的新访问在重定向窗口结束前暂不进入搜索索引、统计和监听者，
+    # 被重定向的下一跳替换时直接丢弃：source -> (记录, 窗口结束的 monotonic 时间)
+    _unindexed: dict[Any, tuple[HistoryRecord, float]] = {}
+    # 新访问 / 历史整体变化的通知对象（如地址栏建议索引）
+    _listeners: list[HistoryListener] = []
+
+    @staticmethod
+    def create_store(backend: str = DEFAULT_HISTORY_BACKEND) -> HistoryStore:
+        """Create a store for the given backend name, falling back to JSON."""
+        if backend == "sqlite":
+            try:
+                return SqliteHistoryStore()
+            except sqlite3.Error as e:
+                print("History database error, falling back to JSON:", e)
+        return JsonHistoryStore()
+
+    @staticmethod
+    def get_store() -> HistoryStore:
+        """Return the active store, creating the default one on first use."""
+        with HistoryManager._lock:
+            if HistoryManager._store is None:
+                HistoryManager._store = HistoryManager.create_store()
+            return HistoryManager._store
+
+    @staticmethod
+    def set_store(store: HistoryStore) -> None:
+        """Replace the active store (queued records and the previous store are flushed/closed)."""
+        if HistoryManager._writer is not None:
+            HistoryManager._writer.flush()
+        with HistoryManager._lock:
+            if HistoryManager._store is not None and HistoryManager._store is not store:
+                HistoryManager._store.close()
+            HistoryManager._store = store
+            HistoryManager._reset_derived()
+
+    @staticmethod
+    def use_backend(backend: str) -> None:
+        """Switch to the named backend ("sqlite" or "json")."""
+        if backend not in HISTORY_BACKENDS:
+            backend = DEFAULT_HISTORY_BACKEND
+        HistoryManager.set_store(HistoryManager.create_store(backend))
+
+    @staticmethod
+    def load_history() -> list[HistoryRecord]:
+        """Load all history records (including queued ones) in chronological order."""
+        with HistoryManager._lock:
+            return HistoryManager.get_store().load_all() + HistoryManager._pending()
 
     @staticmethod
     def add_history(url: str, title: str) -> None:
-        """Add a history record."""
-        history = HistoryManager.load_history()
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        record: HistoryRecord = {"time": now, "url": url, "title": title}
+        """Add a history record synchronously."""
+        record = HistoryManager._make_record(url, title)
+        if record is None:
+            return
+        with HistoryManager._lock:
+            if HistoryManager.get_store().add_records([record]):
+                HistoryManager._index_visit(record)
 
-        # 避免连续相同记录
-        if history and history[-1]["url"] == url:
+    @staticmethod
+    def record_visit(url: str, title: str, source: Any = None, redirected: bool = False) -> None:
+        """
+        Queue a visit for the background writer; returns without touching disk.
+
+        Args:
+            url: Visited URL
+            title: Page title
+            source: Identifies the tab the page loaded in, used to collapse redirect chains
+            redirected: The load was started by a (client-side) redirect, not by the user
+        """
+        record = HistoryManager._make_record(url, title)
+        if record is None:
             return
+        writer = HistoryManager.get_writer()
+        with HistoryManager._lock:
+            now = time.monotonic()
+            action, previous = HistoryManager._coalescer.offer(record, source, now, redirected)
+            if action == VISIT_MERGED:
+                return
+            held = HistoryManager._unindexed.pop(source, None)
+            # 上一跳已写入存储时无法替换，只能作为新访问记录
+            if action == VISIT_REDIRECT and writer.replace(previous, record):
+                if held is None or held[0] is not previous:
+                    # 上一跳已经进入索引（窗口内发生过重建），只能整体重建
+                    HistoryManager._reset_derived()
+                    return
+            else:
+                writer.submit(record)
+                if held is not None:
+                    HistoryManager._index_visit(held[0])
+            HistoryManager._index_deferred(now)
+            if source is None:
+                HistoryManager._index_visit(record)
+            else:
+                window = HistoryManager._coalescer.redirect_window
+                HistoryManager._unindexed[source] = (record, now + window)
 
-        history.append(record)
-        try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-        except OSError as e:
-            print("History save error:", e)
+    @staticmethod
+    def index_deferred_visits() -> None:
+        """Index visits whose redirect window has closed (call shortly after record_visit)."""
+        with HistoryManager._lock:
+            HistoryManager._index_deferred(time.monotonic())
+
+    @staticmethod
+    def import_history(records: list[HistoryRecord]) -> bool:
+        """
+        Commit one chunk of imported records (e.g. from browser_import).
+
+        记录可以早于已有历史；每次调用单独提交。
+        """
+        with HistoryManager._lock:
+            HistoryManager._reset_derived()
+            return HistoryManager.get_store().import_records(records)
+
+    @staticmethod
+    def forget_visit_source(source: Any) -> None:
+        """Drop redirect-tracking state for a closed tab."""
+        with HistoryManager._lock:
+            HistoryManager._coalescer.forget_source(source)
+            held = HistoryManager._unindexed.pop(source, None)
+            if held is not None:
+                HistoryManager._index_visit(held[0])
+
+    @staticmethod
+    def set_coalesce_window(seconds: float) -> None:
+        """Set how long repeat visits to the same URL are merged into one (0 disables)."""
+        with HistoryManager._lock:
+            HistoryManager._coalescer.window = max(0.0, seconds)
+
+    @staticmethod
+    def get_writer() -> HistoryWriter:
+        """Return the write-behind worker, starting it on first use."""
+        with HistoryManager._lock:
+            if HistoryManager._writer is None:
+                HistoryManager._writer = HistoryWriter(
+                    HistoryManager._write_batch,
+                    store_lock=HistoryManager._lock,
+                    maintenance=HistoryManager.apply_retention,
+                    maintenance_interval=RETENTION_INTERVAL,
+                )
+            return HistoryManager._writer
+
+    @staticmethod
+    def flush(timeout: float | None = None) -> bool:
+        """Write all queued visits now. Returns False if timeout expired first."""
+        if HistoryManager._writer is None:
+            return True
+        return HistoryManager._writer.flush(timeout)
+
+    @staticmethod
+    def shutdown() -> None:
+        """Flush queued visits and stop the background writer (call before exit)."""
+        writer = HistoryManager._writer
+        if writer is not None:
+            writer.shutdown()
+            HistoryManager._writer = None
+
+    @staticmethod
+    def get_write_stats() -> dict[str, Any]:
+        """Return the writer's queue depth and flush latency statistics."""
+        if HistoryManager._writer is None:
+            stats = {"queue_depth": 0, "flush_count": 0}
+        else:
+            stats = HistoryManager._writer.stats()
+        with HistoryManager._lock:
+            stats.update(HistoryManager._coalescer.stats())
+        return stats
+
+    @staticmethod
+    def get_recent_history(
+        limit: int = 1000, filter_text: str = "", offset: int = 0
+    ) -> list[HistoryRecord]:
+        """Return up to limit records after skipping offset, newest first."""
+        with HistoryManager._lock:
+            return HistoryManager.get_store().recent(limit, filter_text, offset)
+
+    @staticmethod
+    def get_search_index() -> HistorySearchIndex:
+        """Return the full-text index, building it from the store on first use."""
+        with HistoryManager._lock:
+            HistoryManager._settle_deferred(HistoryManager._search_index is None)
+            if HistoryManager._search_index is None:
+                index = HistorySearchIndex()
+                index.build(HistoryManager.load_history())
+                HistoryManager._search_index = index
+            return HistoryManager._search_index
+
+    @staticmethod
+    def get_fuzzy_index() -> FuzzyIndex:
+        """Return the fuzzy index over visited URLs, building it on first use."""
+        with HistoryManager._lock:
+            HistoryManager._settle_deferred(HistoryManager._fuzzy_index is None)
+            if HistoryManager._fuzzy_index is None:
+                index = FuzzyIndex()
+                for record in HistoryManager.load_history():
+                    HistoryManager._fuzzy_add(index, record)
+                HistoryManager._fuzzy_index = index
+            return HistoryManager._fuzzy_index
+
+    @staticmethod
+    def fuzzy_search_history(query: str, limit: int = 50) -> list[HistoryRecord]:
+        """
+        Typo-tolerant search (e.g. "gthb iss" finds GitHub issues), best match first.
+
+        每项包含 time（最近访问）, url, title 与 visits。
+        """
+        index = HistoryManager.get_fuzzy_index()
+        with HistoryManager._lock:
+            return [dict(item) for _, item in index.search(query, limit)]
+
+    @staticmethod
+    def search_history(query: str, page: int = 0, page_size: int = 50) -> SearchPage:
+        """
+        Search visited URLs by title/URL tokens (prefix match, all terms required).
+
+        Returns:
+            Tuple of (records on this page newest first, total number of matches)
+        """
+        index = HistoryManager.get_search_index()
+        with HistoryManager._lock:
+            return index.search(query, page, page_size)
+
+    @staticmethod
+    def get_top_sites(k: int = 10) -> list[SiteStats]:
+        """
+        Return the k URLs ranked by frecency (visit frequency with recency decay).
+
+        每项包含 url, title, visit_count, last_visit 以及当前时刻的 frecency 分数。
+        """
+        with HistoryManager._lock:
+            return HistoryManager.get_store().top_sites(k)
+
+    @staticmethod
+    def get_recent_urls(limit: int = 500) -> list[HistoryRecord]:
+        """Return up to limit distinct URLs, most recently visited first."""
+        with HistoryManager._lock:
+            return HistoryManager.get_store().recent_urls(limit)
 
     @staticmethod
     def clear_history() -> bool:
         """Clear all history records."""
+        if HistoryManager._writer is not None:
+            HistoryManager._writer.discard()
+        with HistoryManager._lock:
+            HistoryManager._coalescer.reset()
+            HistoryManager._unindexed.clear()
+            if HistoryManager._search_index is not None:
+                HistoryManager._search_index.clear()
+            HistoryManager._fuzzy_index = None
+            HistoryManager._analytics = None
+            HistoryManager._notify(None)
+            ok = HistoryManager.get_store().clear()
+            HistoryManager._clear_stale_copies()
+            return ok
+
+    @staticmethod
+    def clear_history_since(cutoff: str) -> bool:
+        """
+        Remove records visited at or after cutoff.
+
+        Args:
+            cutoff: Time string in "%Y-%m-%d %H:%M:%S" format
+        """
+        if HistoryManager._writer is not None:
+            HistoryManager._writer.discard(lambda r: r.get("time", "") >= cutoff)
+        with HistoryManager._lock:
+            # 范围删除较少发生，直接让索引在下次搜索时重建
+            HistoryManager._reset_derived()
+            HistoryManager._coalescer.reset()
+            ok = HistoryManager.get_store().delete_since(cutoff)
+            HistoryManager._clear_stale_copies(cutoff)
+            return ok
+
+    @staticmethod
+    def _clear_stale_copies(cutoff: str | None = None) -> None:
+        """
+        Apply a clear to history kept outside the active store.
+
+        迁移留下的 history.json.migrated 备份直接删除；当前后端不是 JSON 时，
+        history_segments/ 中旧的分段（较早版本的迁移或切换后端前的数据）同样清除。
+        """
+        backup = HISTORY_FILE + ".migrated"
         try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump([], f)
-            return True
+            if os.path.exists(backup):
+                os.remove(backup)
         except OSError as e:
             print("History clear error:", e)
-            return False
+        if isinstance(HistoryManager._store, JsonHistoryStore):
+            return
+        segments = JsonHistoryStore(migrate=False)
+        if cutoff is None:
+            segments.clear()
+        else:
+            segments.delete_since(cutoff)
+
+    @staticmethod
+    def set_retention_policy(
+        max_age_days: int | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        """
+        Configure how much history to keep (None or 0 disables a limit).
+
+        超出限制的最旧的整天记录会被后台线程删除，最近一天总会保留。
+        """
+        HistoryManager._retention = {
+            "max_age_days": max_age_days or None,
+            "max_entries": max_entries or None,
+            "max_bytes": max_bytes or None,
+        }
+
+    @staticmethod
+    def apply_retention() -> int:
+        """Apply the retention policy now. Returns the number of records removed."""
+        policy = HistoryManager._retention
+        if not any(policy.values()):
+            return 0
+        with HistoryManager._lock:
+            removed = HistoryManager.get_store().apply_retention(policy)
+            if removed:
+                HistoryManager._reset_derived()
+            return removed
+
+    @staticmethod
+    def get_analytics() -> HistoryAnalytics | None:
+        """
+        Return per-day / per-site aggregates, or None if numpy is not installed.
+
+        首次调用时从全部历史构建，之后 record_visit() 增量更新。
+        """
+        if not history_analytics.is_available():
+            return None
+        with HistoryManager._lock:
+            HistoryManager._settle_deferred(HistoryManager._analytics is None)
+            if HistoryManager._analytics is None:
+                analytics = HistoryAnalytics()
+                analytics.build(HistoryManager.load_history())
+                HistoryManager._analytics = analytics
+            return HistoryManager._analytics
+
+    @staticmethod
+    def add_listener(callback: HistoryListener) -> None:
+        """
+        Register callback(record) to be told about new visits.
+
+        导入、范围删除、保留策略等批量变化时以 None 调用，可能来自后台线程。
+        """
+        HistoryManager._listeners.append(callback)
+
+    @staticmethod
+    def remove_listener(callback: HistoryListener) -> None:
+        if callback in HistoryManager._listeners:
+            HistoryManager._listeners.remove(callback)
+
+    # ---- 内部辅助方法 ----
+
+    @staticmethod
+    def _index_visit(record: HistoryRecord) -> None:
+        """Feed a new visit to the search indexes, analytics and listeners."""
+        if HistoryManager._search_index is not None:
+            HistoryManager._search_index.add(record)
+        if HistoryManager._fuzzy_index is not None:
+            HistoryManager._fuzzy_add(HistoryManager._fuzzy_index, record)
+        if HistoryManager._analytics is not None:
+            HistoryManager._analytics.add(record)
+        HistoryManager._notify(record)
+
+    @staticmethod
+    def _index_deferred(now: float | None = None) -> None:
+        """Index held-back visits whose redirect window has closed (all of them if now is None)."""
+        for source, (record, expires) in list(HistoryManager._unindexed.items()):
+            if now is None or expires <= now:
+                del HistoryManager._unindexed[source]
+                HistoryManager._index_visit(record)
+
+    @staticmethod
+    def _settle_deferred(rebuilding: bool) -> None:
+        """
+        Release held-back visits before a derived index is read.
+
+        重建时的数据来源（存储 + 写入队列）已包含暂缓的访问，先全部放行，
+        避免它们之后再被增量加入一次。
+        """
+        HistoryManager._index_deferred(None if rebuilding else time.monotonic())
+
+    @staticmethod
+    def _reset_derived() -> None:
+        """Drop the search indexes and analytics; they are rebuilt on next use."""
+        # 重建时会从存储与写入队列读到暂缓的访问
+        HistoryManager._unindexed.clear()
+        HistoryManager._search_index = None
+        HistoryManager._fuzzy_index = None
+        HistoryManager._analytics = None
+        HistoryManager._notify(None)
+
+    @staticmethod
+    def _fuzzy_add(index: FuzzyIndex, record: HistoryRecord) -> None:
+        """Count one visit in the fuzzy index (weight is log(1 + visits))."""
+        url = record.get("url", "")
+        if not url:
+            return
+        item = index.get(url)
+        if item is None:
+            item = {"time": "", "url": url, "title": "", "visits": 0}
+        item["time"] = max(item["time"], record.get("time", ""))
+        item["title"] = record.get("title") or item["title"]
+        item["visits"] += 1
+        index.add(url, match_text(url, item["title"]), math.log1p(item["visits"]), item)
+
+    @staticmethod
+    def _notify(record: HistoryRecord | None) -> None:
+        for callback in list(HistoryManager._listeners):
+            try:
+                callback(record)
+            except Exception as e:
+                print("History listener error:", e)
+
+    @staticmethod
+    def _pending() -> list[HistoryRecord]:
+        if HistoryManager._writer is None:
+            return []
+        return HistoryManager._writer.pending()
+
+    @staticmethod
+    def _make_record(url: str, title: str) -> HistoryRecord | None:
+        """Build a record for url, or None if it repeats the most recent visit."""
+        # 历史统一保存规范化后的 URL，同一页面的不同写法聚合为一个条目
+        url = canonicalize(url)
+        pending = HistoryManager._pending()
+        with HistoryManager._lock:
+            last_url = pending[-1]["url"] if pending else HistoryManager.get_store().last_url()
+        # 避免连续相同记录
+        if last_url == url:
+            return None
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return {"time": now, "url": url, "title": title}
+
+    @staticmethod
+    def _write_batch(records: list[HistoryRecord]) -> bool:
+        """Called from the writer thread."""
+        with HistoryManager._lock:
+            return HistoryManager.get_store().add_records(records)
@@ -0,0 +1,221 @@
+"""History Writer Module - Write-behind persistence worker for history records.
+
+页面加载时只把访问记录放入内存队列，由后台线程按批次写入存储：
+- 队列中的记录数达到 batch_size 时立即写入
+- 否则最多等待 flush_interval 秒后写入
+- 退出前调用 shutdown() 保证队列被完全写出
+- 可选的 maintenance 回调（如历史保留策略）每隔 maintenance_interval 秒在同一线程上运行
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from typing import Any
+
+# Type aliases
+HistoryRecord = dict[str, str]
+WriteBatch = Callable[[list[HistoryRecord]], bool]
+Maintenance = Callable[[], Any]
+
+DEFAULT_FLUSH_INTERVAL = 2.0  # 秒
+DEFAULT_BATCH_SIZE = 50
+
+
+class HistoryWriter:
+    """Batches history records in memory and writes them from a background thread."""
+
+    def __init__(
+        self,
+        write_batch: WriteBatch,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        store_lock: AbstractContextManager | None = None,
+        maintenance: Maintenance | None = None,
+        maintenance_interval: float = 600.0,
+    ) -> None:
+        self._write_batch = write_batch
+        # 写入存储时持有的锁；读者持有同一把锁读取 "存储 + pending()" 时
+        # 不会看到批次既不在队列中也不在存储中的中间状态
+        self._store_lock = store_lock or threading.RLock()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._maintenance = maintenance
+        self.maintenance_interval = maintenance_interval
+        # 第一次维护在启动后不久进行，而不是等满一个周期
+        self._next_maintenance = time.monotonic() + min(flush_interval, maintenance_interval)
+
+        self._pending: list[HistoryRecord] = []
+        self._cond = threading.Condition()
+        self._flush_requested = False
+        self._in_flight: list[HistoryRecord] = []
+        self._stopped = False
+
+        # 统计信息
+        self._flush_count = 0
+        self._records_written = 0
+        self._failed_flushes = 0
+        self._total_latency = 0.0
+        self._last_latency = 0.0
+        self._max_latency = 0.0
+
+        self._thread = threading.Thread(
+            target=self._run, name="HistoryWriter", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, record: HistoryRecord) -> None:
+        """Queue a record for writing; never blocks on disk."""
+        with self._cond:
+            stopped = self._stopped
+            if not stopped:
+                self._pending.append(record)
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify_all()
+        if stopped:
+            # 已停止时直接同步写入，避免丢失
+            self._write([record])
+
+    def pending(self) -> list[HistoryRecord]:
+        """Return a copy of records not yet written to the store (oldest first)."""
+        with self._cond:
+            return self._in_flight + self._pending
+
+    def discard(self, predicate: Callable[[HistoryRecord], bool] | None = None) -> int:
+        """Drop queued records (all, or those matching predicate). Returns the count."""
+        with self._cond:
+            before = len(self._pending)
+            if predicate is None:
+                self._pending.clear()
+            else:
+                self._pending = [r for r in self._pending if not predicate(r)]
+            return before - len(self._pending)
+
+    def replace(self, old: HistoryRecord, new: HistoryRecord) -> bool:
+        """Swap a queued record for another in place. False if old was already written."""
+        with self._cond:
+            for i, record in enumerate(self._pending):
+                if record is old:
+                    self._pending[i] = new
+                    return True
+            return False
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Ask the worker to write everything now and wait until the queue is drained.
+
+        调用方不能持有 store_lock，否则后台线程无法写入。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._stopped:
+                return not self._pending
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def shutdown(self, timeout: float | None = 5.0) -> None:
+        """Flush the queue and stop the worker thread."""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        # 线程未能及时结束时，由调用线程写出剩余记录
+        with self._cond:
+            batch = []
+            if self._pending and not self._in_flight:
+                batch, self._pending = self._pending, []
+                self._in_flight = batch
+        if batch:
+            self._write(batch)
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth and flush latency statistics (latencies in milliseconds)."""
+        with self._cond:
+            flushes = self._flush_count
+            return {
+                "queue_depth": len(self._pending) + len(self._in_flight),
+                "flush_count": flushes,
+                "records_written": self._records_written,
+                "failed_flushes": self._failed_flushes,
+                "last_flush_ms": self._last_latency * 1000,
+                "avg_flush_ms": (self._total_latency / flushes * 1000) if flushes else 0.0,
+                "max_flush_ms": self._max_latency * 1000,
+            }
+
+    # ---- 后台线程 ----
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while (
+                    not self._stopped
+                    and not self._flush_requested
+                    and len(self._pending) < self.batch_size
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                if not self._pending:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._stopped:
+                        return
+                    batch = []
+                else:
+                    batch, self._pending = self._pending, []
+                    self._in_flight = batch
+
+            if not batch:
+                self._maybe_run_maintenance()
+                continue
+
+            # 写盘时不持有条件变量，submit() 不会被阻塞
+            self._write(batch)
+
+            with self._cond:
+                if not self._pending:
+                    self._flush_requested = False
+                self._cond.notify_all()
+            self._maybe_run_maintenance()
+
+    def _maybe_run_maintenance(self) -> None:
+        if self._maintenance is None or time.monotonic() < self._next_maintenance:
+            return
+        self._next_maintenance = time.monotonic() + self.maintenance_interval
+        try:
+            self._maintenance()
+        except Exception as e:  # 维护失败不影响后续写入
+            print("History maintenance error:", e)
+
+    def _write(self, batch: list[HistoryRecord]) -> None:
+        """Hand a batch to the store; must be called without holding the condition."""
+        with self._store_lock:
+            start = time.perf_counter()
+            try:
+                ok = self._write_batch(batch)
+            except Exception as e:  # 后台线程不能因为存储异常而退出
+                print("History write error:", e)
+                ok = False
+            latency = time.perf_counter() - start
+            with self._cond:
+                self._in_flight = []
+        with self._cond:
+            self._flush_count += 1
+            self._last_latency = latency
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            if ok:
+                self._records_written += len(batch)
+            else:
+                self._failed_flushes += 1
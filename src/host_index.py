@@ -0,0 +1,155 @@
+"""Host Index Module - Inline domain completion for the address bar.
+
+输入 "git" 时直接在地址栏内补全为 "github.com/"（补全部分处于选中状态）。
+
+- 主机名按反序标签保存（gist.github.com -> ("com", "github", "gist")），
+  访问次数同时累加到各级上级域名，因此访问子域名也会让 "github.com" 成为候选；
+  累加止于 public_suffix 模块给出的可注册域名，不会越过 co.uk、github.io 这样的公共后缀
+- 每个主机名的所有前缀都预先记录当前最佳的补全结果 (_best)，
+  每次按键只做一次字典查找，不扫描历史
+- 新访问只会增加计数，_best 可以就地更新；计数减少（如删除书签）时
+  只用内存中的计数重建 _best
+"""
+
+import re
+from typing import Any
+
+from public_suffix import registrable_domain
+from url_canon import canonicalize, host_key
+
+# Type aliases
+HostKey = tuple[str, ...]  # 反序的域名标签
+Completion = tuple[float, int, str]  # (访问次数, -主机名长度, 主机名)
+
+BOOKMARK_VISITS = 5  # 书签相当于的访问次数
+_SCHEME_RE = re.compile(r"^[a-z][a-z0-9+.-]*://")
+
+
+def reversed_labels(host: str) -> HostKey:
+    return tuple(reversed(host.split(".")))
+
+
+class HostIndex:
+    """Visit counts per host with constant-time prefix completion."""
+
+    def __init__(self) -> None:
+        self._counts: dict[HostKey, float] = {}
+        self._bookmarks: dict[str, int] = {}  # 主机名 -> 书签数量
+        self._bookmark_urls: dict[str, str] = {}  # 规范化的书签 URL -> 主机名
+        self._best: dict[str, Completion] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def build(self, sites: list[dict[str, Any]], bookmarks: list[dict[str, Any]]) -> None:
+        """
+        Rebuild from history aggregates and a flat bookmark list.
+
+        Args:
+            sites: HistoryManager.get_top_sites() 的结果（使用 visit_count）
+            bookmarks: BookmarkManager.get_all_bookmarks_flat() 的结果
+        """
+        self._counts = {}
+        self._bookmarks = {}
+        self._bookmark_urls = {}
+        for site in sites:
+            self._add(host_key(site.get("url", "")), site.get("visit_count") or 1)
+        self.sync_bookmarks(bookmarks, rebuild=False)
+        self._rebuild()
+
+    def add_visit(self, url: str) -> None:
+        self._add(host_key(url), 1, update=True)
+
+    def sync_bookmarks(self, bookmarks: list[dict[str, Any]], rebuild: bool = True) -> None:
+        """Make the bookmark bonus match bookmarks (a flat list)."""
+        urls = {}
+        for item in bookmarks:
+            if item.get("url"):
+                urls[canonicalize(item["url"])] = host_key(item["url"])
+        counts: dict[str, int] = {}
+        for host in urls.values():
+            counts[host] = counts.get(host, 0) + 1
+        removed = False
+        for host in self._bookmarks.keys() | counts.keys():
+            delta = counts.get(host, 0) - self._bookmarks.get(host, 0)
+            if delta:
+                self._add(host, delta * BOOKMARK_VISITS, update=rebuild and delta > 0)
+                removed = removed or delta < 0
+        self._bookmarks = counts
+        self._bookmark_urls = urls
+        if rebuild and removed:
+            self._rebuild()
+
+    def set_bookmark(self, url: str, bookmarked: bool = True) -> None:
+        """Add or remove the bookmark bonus of one URL."""
+        canonical = canonicalize(url)
+        if bookmarked == (canonical in self._bookmark_urls):
+            return
+        if bookmarked:
+            host = self._bookmark_urls[canonical] = host_key(url)
+            delta = 1
+        else:
+            host = self._bookmark_urls.pop(canonical)
+            delta = -1
+        count = self._bookmarks.get(host, 0) + delta
+        if count:
+            self._bookmarks[host] = count
+        else:
+            self._bookmarks.pop(host, None)
+        self._add(host, delta * BOOKMARK_VISITS, update=delta > 0)
+        if delta < 0:
+            self._rebuild()
+
+    def complete(self, text: str) -> str | None:
+        """
+        Return text completed to the best matching host followed by "/", or None.
+
+        已输入的部分（包括 scheme 与 "www."）保持原样，只在其后追加补全的部分。
+        """
+        typed = text.lower()
+        match = _SCHEME_RE.match(typed)
+        start = match.end() if match else 0
+        if typed.startswith("www.", start):
+            start += 4
+        prefix = typed[start:]
+        if not prefix or "/" in prefix or " " in prefix:
+            return None
+        best = self._best.get(prefix)
+        if best is None:
+            return None
+        return text + (best[2] + "/")[len(prefix) :]
+
+    # ---- 内部辅助方法 ----
+
+    def _add(self, host: str, amount: float, update: bool = False) -> None:
+        """Add amount visits to host and its parent domains."""
+        if not host:
+            return
+        key = reversed_labels(host)
+        # 只向上累加到可注册域名（example.com / example.co.uk / alice.github.io）这一级，
+        # 与密码管理器匹配站点使用同一份公共后缀规则
+        shortest = len(reversed_labels(registrable_domain(host)))
+        for n in range(shortest, len(key) + 1):
+            ancestor = key[:n]
+            self._counts[ancestor] = self._counts.get(ancestor, 0) + amount
+            if update:
+                self._offer(ancestor)
+
+    def _offer(self, key: HostKey) -> None:
+        """Make key the completion of each of its prefixes where it ranks best."""
+        count = self._counts.get(key, 0)
+        if count <= 0 or key[-1] == "www":
+            # www.example.com 的访问已累加到 example.com
+            return
+        host = ".".join(reversed(key))
+        candidate = (count, -len(host), host)
+        for n in range(1, len(host) + 1):
+            current = self._best.get(host[:n])
+            if current is None or candidate[:2] > current[:2] or current[2] == host:
+                self._best[host[:n]] = candidate
+
+    def _rebuild(self) -> None:
+        self._counts = {key: count for key, count in self._counts.items() if count > 0}
+        self._best = {}
+        for key in self._counts:
+            self._offer(key)
@@ -3,15 +3,29 @@
 import json
 import os
 import re
+import sqlite3
 import sys
+import threading
 from typing import Any
+from urllib.parse import quote_plus
 
 # 修复在不同目录下执行导致找不到同级模块的问题
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import time as _time
 
-from PyQt6.QtCore import QStringListModel, Qt, QThread, QTimer, QUrl, pyqtSignal
+from PyQt6.QtCore import (
+    QAbstractItemModel,
+    QByteArray,
+    QMimeData,
+    QModelIndex,
+    QStringListModel,
+    Qt,
+    QThread,
+    QTimer,
+    QUrl,
+    pyqtSignal,
+)
 from PyQt6.QtGui import QAction, QColor, QFont, QIcon, QKeySequence, QShortcut
 from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile
 from PyQt6.QtWebEngineWidgets import QWebEngineView
@@ -37,8 +51,10 @@ from PyQt6.QtWidgets import (
     QMenu,
     QMessageBox,
     QProgressBar,
+    QProgressDialog,
     QPushButton,
     QScrollArea,
+    QSpinBox,
     QSplitter,
     QStackedWidget,
     QStyle,
@@ -47,20 +63,30 @@ from PyQt6.QtWidgets import (
     QTabWidget,
     QTextEdit,
     QToolBar,
+    QTreeView,
     QTreeWidget,
     QTreeWidgetItem,
     QVBoxLayout,
     QWidget,
 )
 
-from bookmark_manager import BookmarkManager
+import bookmark_checker
+import browser_import
+import fuzzy_match
+import history_analytics
+from bookmark_manager import ROOT_ID, BookmarkManager
 from download_manager import DownloadManager
 from extension_manager import ExtensionManager
 from feed_reader import FeedManager, FeedParser
 from history_manager import HistoryManager
-from password_manager import PasswordCrypto, PasswordManager
+from host_index import HostIndex
+from password_manager import PasswordManager, VaultKey
+from search_suggest import SearchSuggester
 from session_manager import SessionManager
+from suggestion_index import SUGGESTION_HISTORY_LIMIT, SuggestionIndex
 from theme_manager import DEFAULT_THEME_COLORS, ThemeManager, generate_stylesheet
+from url_canon import canonical_host
+from visit_coalescer import DEFAULT_REDIRECT_WINDOW
 
 # Type aliases
 SettingsDict = dict[str, Any]
@@ -79,11 +105,47 @@ SEARCH_ENGINES = {
     "Baidu": "https://www.baidu.com/s?wd={}",
 }
 
+# 搜索建议接口（OpenSearch JSON 格式）
+SEARCH_SUGGEST_URLS = {
+    "Bing": "https://api.bing.com/osjson.aspx?query={}",
+    "Google": "https://suggestqueries.google.com/complete/search?client=firefox&q={}",
+    "Baidu": "https://suggestion.baidu.com/su?wd={}&action=opensearch&ie=utf-8",
+}
 
 # Type alias for module-level use
 MainWindowType = "MainWindow"
 
 
+class BrowserPage(QWebEnginePage):
+    """
+    Page that remembers how its current main-frame load was started.
+
+    服务器重定向发生在同一次加载内部（之前会先有一次链接点击等导航请求），
+    只有一次加载的第一个导航请求就是重定向时（JS / meta refresh 跳转），
+    上一次加载才是重定向链中的一跳。
+    """
+
+    def __init__(self, profile: QWebEngineProfile | None = None, parent: QWidget | None = None) -> None:
+        if profile:
+            super().__init__(profile, parent)
+        else:
+            super().__init__(parent)
+        self.redirected = False
+        self._load_started = False
+        self.loadFinished.connect(self._on_load_finished)
+
+    def acceptNavigationRequest(self, url, nav_type, is_main_frame):
+        accepted = super().acceptNavigationRequest(url, nav_type, is_main_frame)
+        if accepted and is_main_frame and not self._load_started:
+            self._load_started = True
+            self.redirected = nav_type == QWebEnginePage.NavigationType.NavigationTypeRedirect
+        return accepted
+
+    def _on_load_finished(self, ok):
+        # 先于视图的 loadFinished 处理函数执行，redirected 保留到下一次加载开始
+        self._load_started = False
+
+
 class WebEngineView(QWebEngineView):
     """
     Custom WebEngineView that overrides createWindow method.
@@ -94,9 +156,7 @@ class WebEngineView(QWebEngineView):
         super().__init__(parent)
         self._main_window = main_window
         self._custom_profile = profile
-        if profile:
-            page = QWebEnginePage(profile, self)
-            self.setPage(page)
+        self.setPage(BrowserPage(profile, self))
 
     def createWindow(self, window_type: QWebEnginePage.WebWindowType) -> "WebEngineView":
         """Handle new window requests by creating a new tab."""
@@ -895,16 +955,359 @@ class ShortcutsHelpDialog(QDialog):
         layout.addLayout(btn_layout)
 
 
+def bookmark_column_text(node, column):
+    """书签在 Title / URL / Tags 列中显示的文本"""
+    if column == 0:
+        return node["title"]
+    if column == 1:
+        return node["url"]
+    return ", ".join(node.get("tags", ()))
+
+
+class BookmarkEditDialog(QDialog):
+    """添加或编辑单个书签：标题、URL、标签（逗号分隔）和地址栏关键字"""
+
+    def __init__(self, title="", url="https://", tags=(), keyword="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bookmark")
+        self.resize(420, 0)
+
+        form = QFormLayout(self)
+        self.title_input = QLineEdit(title)
+        self.url_input = QLineEdit(url)
+        self.tags_input = QLineEdit(", ".join(tags))
+        self.tags_input.setPlaceholderText("news, python, reading-list")
+        self.keyword_input = QLineEdit(keyword)
+        self.keyword_input.setPlaceholderText("Type it in the address bar to open this bookmark")
+        form.addRow("Title:", self.title_input)
+        form.addRow("URL:", self.url_input)
+        form.addRow("Tags:", self.tags_input)
+        form.addRow("Keyword:", self.keyword_input)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        ok_btn = QPushButton("OK")
+        ok_btn.setDefault(True)
+        ok_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(ok_btn)
+        buttons.addWidget(cancel_btn)
+        form.addRow(buttons)
+
+    def values(self):
+        """返回 {"title", "url", "tags", "keyword"}"""
+        return {
+            "title": self.title_input.text().strip(),
+            "url": self.url_input.text().strip(),
+            "tags": self.tags_input.text(),
+            "keyword": self.keyword_input.text(),
+        }
+
+
+class BookmarkTreeModel(QAbstractItemModel):
+    """
+    书签树 (BookmarkTree) 的树形模型，索引的 internalPointer 直接指向书签节点。
+
+    - 文件夹的子节点按 FETCH_BATCH 分批暴露（canFetchMore / fetchMore），
+      只有展开并滚动到的行才会被视图创建
+    - 添加、编辑、删除、拖拽都直接修改书签树中对应的节点并发出行级信号，不重建整棵树；
+      书签树负责延迟保存
+    - 外部的整体变化（如导入）之后调用 reload()
+    """
+
+    FETCH_BATCH = 256
+    MIME_TYPE = "application/x-nanobrowser-bookmark-ids"
+    HEADERS = ("Title", "URL", "Tags")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tree = BookmarkManager.get_tree()
+        self._rows = {}  # 文件夹 id -> 子节点 id 列表（首次展开时从书签树复制）
+        self._fetched = {}  # 文件夹 id -> 已暴露给视图的行数（_rows 的前缀）
+        self._positions = {}  # 文件夹 id -> {子节点 id: 行号}，_rows 变化时丢弃，按需重建
+
+    def reload(self):
+        self.beginResetModel()
+        self.tree = BookmarkManager.get_tree()
+        self._rows = {}
+        self._fetched = {}
+        self._positions = {}
+        self.endResetModel()
+
+    def node(self, index):
+        """索引对应的书签节点，根目录返回 None"""
+        return index.internalPointer() if index.isValid() else None
+
+    def folder_id(self, index):
+        """索引对应的文件夹 id；根目录为 ROOT_ID，书签返回 None"""
+        node = self.node(index)
+        if node is None:
+            return ROOT_ID
+        return node["id"] if node["type"] == "folder" else None
+
+    # ---- QAbstractItemModel 接口 ----
+
+    def index(self, row, column, parent=QModelIndex()):
+        folder_id = self.folder_id(parent)
+        if not 0 <= column < len(self.HEADERS) or not 0 <= row < self._fetched.get(folder_id, 0):
+            return QModelIndex()
+        return self.createIndex(row, column, self.tree.get(self._rows[folder_id][row]))
+
+    def parent(self, index):
+        node = self.node(index)
+        if node is None or node["parent"] == ROOT_ID:
+            return QModelIndex()
+        folder = self.tree.get(node["parent"])
+        self._child_rows(folder["parent"])
+        return self.createIndex(self._row_of(folder["parent"], folder["id"]), 0, folder)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return self._fetched.get(self.folder_id(parent), 0)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        folder_id = self.folder_id(parent)
+        return folder_id is not None and self._count(folder_id) > 0
+
+    def canFetchMore(self, parent):
+        folder_id = self.folder_id(parent)
+        return folder_id is not None and self._fetched.get(folder_id, 0) < self._count(folder_id)
+
+    def fetchMore(self, parent):
+        folder_id = self.folder_id(parent)
+        if folder_id is None:
+            return
+        rows = self._child_rows(folder_id)
+        start = self._fetched.get(folder_id, 0)
+        end = min(len(rows), start + self.FETCH_BATCH)
+        if end > start:
+            self.beginInsertRows(parent, start, end - 1)
+            self._fetched[folder_id] = end
+            self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        node = self.node(index)
+        if node is None:
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if node["type"] == "folder":
+                return node["name"] if index.column() == 0 else ""
+            return bookmark_column_text(node, index.column())
+        if role == Qt.ItemDataRole.ToolTipRole and node["type"] == "bookmark":
+            keyword = node.get("keyword")
+            return f"{node['url']}\nKeyword: {keyword}" if keyword else node["url"]
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        """就地编辑（F2）：只修改这一个节点"""
+        node = self.node(index)
+        if node is None or role != Qt.ItemDataRole.EditRole:
+            return False
+        if node["type"] == "folder":
+            fields = {"name": value}
+        else:
+            fields = {("title", "url", "tags")[index.column()]: value}
+        return self.update(index, **fields)
+
+    def flags(self, index):
+        node = self.node(index)
+        if node is None:
+            return Qt.ItemFlag.ItemIsDropEnabled
+        flags = (
+            Qt.ItemFlag.ItemIsEnabled
+            | Qt.ItemFlag.ItemIsSelectable
+            | Qt.ItemFlag.ItemIsDragEnabled
+        )
+        if node["type"] == "folder":
+            flags |= Qt.ItemFlag.ItemIsDropEnabled
+            if index.column() == 0:
+                flags |= Qt.ItemFlag.ItemIsEditable
+        else:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    # ---- 拖拽：按节点 id 移动 ----
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        node_ids = dict.fromkeys(self.node(i)["id"] for i in indexes if i.isValid())
+        mime = QMimeData()
+        mime.setData(self.MIME_TYPE, QByteArray(",".join(map(str, node_ids)).encode()))
+        return mime
+
+    def dropMimeData(self, mime, action, row, column, parent):
+        folder_id = self.folder_id(parent)
+        if action != Qt.DropAction.MoveAction or folder_id is None:
+            return False
+        if not mime.hasFormat(self.MIME_TYPE):
+            return False
+        node_ids = [int(i) for i in bytes(mime.data(self.MIME_TYPE)).decode().split(",") if i]
+        self.move_nodes(node_ids, folder_id, row if row >= 0 else None)
+        # 视图随后会对源行调用 removeRows；默认实现不删除任何内容，节点已经移动完毕
+        return True
+
+    # ---- 修改 ----
+
+    def add_bookmark(self, parent, url, title, tags=None, keyword=None):
+        """在 parent 文件夹末尾添加书签，返回节点 id（URL 或关键字已存在时返回 None）"""
+        folder_id = self.folder_id(parent)
+        node_id = self.tree.add_bookmark(url, title, folder_id, tags=tags, keyword=keyword)
+        if node_id is not None:
+            self._appended(parent, folder_id, node_id)
+        return node_id
+
+    def add_folder(self, parent, name):
+        folder_id = self.folder_id(parent)
+        node_id = self.tree.add_folder(name, folder_id)
+        if node_id is not None:
+            self._appended(parent, folder_id, node_id)
+        return node_id
+
+    def update(self, index, **fields):
+        """修改节点字段（书签 URL 与其他书签重复时返回 False）"""
+        node = self.node(index)
+        if node is None or not self.tree.update(node["id"], **fields):
+            return False
+        last = index.siblingAtColumn(len(self.HEADERS) - 1)
+        self.dataChanged.emit(index.siblingAtColumn(0), last)
+        return True
+
+    def remove(self, index):
+        """删除节点（文件夹连同其内容）"""
+        node = self.node(index)
+        if node is None:
+            return False
+        folder_id, row = node["parent"], index.row()
+        self.beginRemoveRows(index.parent(), row, row)
+        self.tree.remove(node["id"])
+        del self._rows[folder_id][row]
+        self._fetched[folder_id] -= 1
+        self._positions.pop(folder_id, None)
+        self._forget_folder(node["id"])
+        self.endRemoveRows()
+        return True
+
+    def move_nodes(self, node_ids, folder_id, row=None):
+        """
+        把多个节点移动到 folder_id 的 row 行之前。无论拖拽多少节点都只做一次布局变化，
+        并按节点重新定位视图持有的持久索引（选中项、展开状态等）。
+        """
+        sources = {self.tree.get(i)["parent"] for i in node_ids if self.tree.get(i)}
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        nodes = [self.node(index) for index in persistent]
+        moved = self.tree.move_many(node_ids, folder_id, row)
+        if moved:
+            for changed in sources | {folder_id}:
+                old_rows = self._rows.get(changed)
+                if old_rows is None:
+                    continue
+                new_rows = self.tree.child_ids(changed)
+                fetched = self._fetched.get(changed, 0) + len(new_rows) - len(old_rows)
+                self._rows[changed] = new_rows
+                self._fetched[changed] = max(0, min(len(new_rows), fetched))
+                self._positions.pop(changed, None)
+            self.changePersistentIndexList(
+                persistent,
+                [
+                    self._locate(node, index.column())
+                    for node, index in zip(nodes, persistent, strict=True)
+                ],
+            )
+        self.layoutChanged.emit()
+        return moved
+
+    # ---- 内部辅助方法 ----
+
+    def _count(self, folder_id):
+        rows = self._rows.get(folder_id)
+        return len(rows) if rows is not None else self.tree.child_count(folder_id)
+
+    def _child_rows(self, folder_id):
+        rows = self._rows.get(folder_id)
+        if rows is None:
+            rows = self._rows[folder_id] = self.tree.child_ids(folder_id)
+        return rows
+
+    def _appended(self, parent, folder_id, node_id):
+        rows = self._rows.get(folder_id)
+        if rows is None:
+            # 还没有复制过子节点列表（如原来是空文件夹），此时复制的列表已包含新节点
+            self.fetchMore(parent)
+            return
+        rows.append(node_id)
+        positions = self._positions.get(folder_id)
+        if positions is not None:
+            positions[node_id] = len(rows) - 1
+        fetched = self._fetched.get(folder_id, 0)
+        if fetched == len(rows) - 1:
+            self.beginInsertRows(parent, fetched, fetched)
+            self._fetched[folder_id] = fetched + 1
+            self.endInsertRows()
+
+    def _row_of(self, folder_id, node_id):
+        """节点在 _rows[folder_id] 中的行号（文件夹尚未复制子节点列表或不含该节点时为 None）"""
+        positions = self._positions.get(folder_id)
+        if positions is None:
+            rows = self._rows.get(folder_id)
+            if rows is None:
+                return None
+            positions = self._positions[folder_id] = {
+                child_id: i for i, child_id in enumerate(rows)
+            }
+        return positions.get(node_id)
+
+    def _forget_folder(self, folder_id):
+        """丢弃已删除的文件夹及其子文件夹的行缓存"""
+        rows = self._rows.pop(folder_id, None)
+        self._fetched.pop(folder_id, None)
+        self._positions.pop(folder_id, None)
+        for child_id in rows or ():
+            if child_id in self._rows:
+                self._forget_folder(child_id)
+
+    def _locate(self, node, column):
+        """节点当前的模型索引；节点所在行尚未暴露时返回无效索引"""
+        if node is None:
+            return QModelIndex()
+        current = node
+        row = 0
+        while True:
+            folder_id = current["parent"]
+            position = self._row_of(folder_id, current["id"])
+            if position is None or position >= self._fetched.get(folder_id, 0):
+                return QModelIndex()
+            if current is node:
+                row = position
+            if folder_id == ROOT_ID:
+                return self.createIndex(row, column, node)
+            current = self.tree.get(folder_id)
+
+
 class BookmarkManagerDialog(QDialog):
     """
     完整的书签管理对话框 - 支持文件夹、添加/编辑/删除、拖拽排序、导入导出。
-    使用 QTreeWidget 展示书签的层级结构。
+    使用 QTreeView + BookmarkTreeModel 展示书签的层级结构，大文件夹展开时才分批加载；
+    每次操作直接修改书签树中的对应节点（F2 可就地编辑标题、URL 或标签）。
+    搜索框按标签（"#tag"）和单词即时查询书签树的倒排索引，结果以列表显示。
     """
 
-    # 自定义角色存储数据
-    ROLE_TYPE = Qt.ItemDataRole.UserRole
-    ROLE_URL = Qt.ItemDataRole.UserRole + 1
-    ROLE_FOLDER_NAME = Qt.ItemDataRole.UserRole + 2
+    SEARCH_RESULTS = 200
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -912,6 +1315,7 @@ class BookmarkManagerDialog(QDialog):
         self.resize(700, 500)
         self.main_window = parent
         self._changed = False
+        self._check_worker = None
 
         layout = QVBoxLayout(self)
 
@@ -940,22 +1344,45 @@ class BookmarkManagerDialog(QDialog):
         import_btn.clicked.connect(self.import_bookmarks)
         toolbar_layout.addWidget(import_btn)
 
+        import_browser_btn = QPushButton("Import Browser")
+        import_browser_btn.setToolTip(
+            "Import from Firefox places.sqlite or a Chrome/Edge Bookmarks file"
+        )
+        import_browser_btn.clicked.connect(self.import_browser_bookmarks)
+        toolbar_layout.addWidget(import_browser_btn)
+
         export_btn = QPushButton("Export HTML")
         export_btn.clicked.connect(self.export_bookmarks)
         toolbar_layout.addWidget(export_btn)
 
+        self.check_btn = QPushButton("Check Links")
+        self.check_btn.setToolTip("Find dead links and permanently redirected bookmarks")
+        self.check_btn.clicked.connect(self.check_links)
+        toolbar_layout.addWidget(self.check_btn)
+
         layout.addLayout(toolbar_layout)
 
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search bookmarks (words or #tag)...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.run_search)
+        layout.addWidget(self.search_input)
+
         # 树形书签列表
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["Title", "URL"])
+        self.model = BookmarkTreeModel(self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
         self.tree.setColumnWidth(0, 300)
         self.tree.setAlternatingRowColors(True)
+        self.tree.setUniformRowHeights(True)
         self.tree.setStyleSheet(
-            "QTreeWidget { background-color: #2b2b2b; color: #a9b7c6; "
+            "QTreeView { background-color: #2b2b2b; color: #a9b7c6; "
             "alternate-background-color: #313335; border: 1px solid #555555; } "
-            "QTreeWidget::item:selected { background-color: #4b6eaf; color: #ffffff; }"
+            "QTreeView::item:selected { background-color: #4b6eaf; color: #ffffff; }"
         )
+        self.tree.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        # 双击打开书签，F2 就地编辑
+        self.tree.setEditTriggers(QAbstractItemView.EditTrigger.EditKeyPressed)
 
         # 启用拖拽排序
         self.tree.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
@@ -964,8 +1391,21 @@ class BookmarkManagerDialog(QDialog):
         self.tree.setDropIndicatorShown(True)
         self.tree.setDefaultDropAction(Qt.DropAction.MoveAction)
 
-        self.tree.itemDoubleClicked.connect(self.on_double_click)
-        layout.addWidget(self.tree)
+        self.tree.doubleClicked.connect(self.on_double_click)
+
+        # 搜索结果列表（搜索框非空时替换树形视图）
+        self.results = QTreeWidget()
+        self.results.setHeaderLabels(list(BookmarkTreeModel.HEADERS))
+        self.results.setColumnWidth(0, 300)
+        self.results.setRootIsDecorated(False)
+        self.results.setAlternatingRowColors(True)
+        self.results.setStyleSheet(self.tree.styleSheet().replace("QTreeView", "QTreeWidget"))
+        self.results.itemDoubleClicked.connect(self._open_result)
+
+        self.stack = QStackedWidget()
+        self.stack.addWidget(self.tree)
+        self.stack.addWidget(self.results)
+        layout.addWidget(self.stack)
 
         # 底部关闭按钮
         bottom_layout = QHBoxLayout()
@@ -975,96 +1415,75 @@ class BookmarkManagerDialog(QDialog):
         bottom_layout.addWidget(close_btn)
         layout.addLayout(bottom_layout)
 
-        self.load_tree()
-
     def load_tree(self):
-        """从 BookmarkManager 加载书签数据到树形控件"""
-        self.tree.clear()
-        bookmarks = BookmarkManager.load_bookmarks()
-        self._populate_tree(self.tree.invisibleRootItem(), bookmarks)
-        self.tree.expandAll()
-
-    def _populate_tree(self, parent_item, items):
-        """递归填充树形控件"""
-        for item in items:
-            if item.get("type") == "folder":
-                node = QTreeWidgetItem(parent_item)
-                node.setText(0, item["name"])
-                node.setText(1, "")
-                node.setData(0, self.ROLE_TYPE, "folder")
-                node.setData(0, self.ROLE_FOLDER_NAME, item["name"])
-                # 允许文件夹接收拖拽
-                node.setFlags(
-                    node.flags()
-                    | Qt.ItemFlag.ItemIsDropEnabled
-                    | Qt.ItemFlag.ItemIsDragEnabled
-                )
-                self._populate_tree(node, item.get("children", []))
-            elif item.get("type") == "bookmark":
-                node = QTreeWidgetItem(parent_item)
-                node.setText(0, item.get("title", ""))
-                node.setText(1, item.get("url", ""))
-                node.setData(0, self.ROLE_TYPE, "bookmark")
-                node.setData(0, self.ROLE_URL, item.get("url", ""))
-                node.setFlags(node.flags() | Qt.ItemFlag.ItemIsDragEnabled)
-
-    def _tree_to_bookmarks(self):
-        """将树形控件的当前状态转换回书签数据列表"""
-        root = self.tree.invisibleRootItem()
-        return self._node_children_to_list(root)
-
-    def _node_children_to_list(self, node):
-        """递归将树形节点转为书签列表"""
-        result = []
-        for i in range(node.childCount()):
-            child = node.child(i)
-            item_type = child.data(0, self.ROLE_TYPE)
-            if item_type == "folder":
-                result.append(
-                    {
-                        "type": "folder",
-                        "name": child.text(0),
-                        "children": self._node_children_to_list(child),
-                    }
-                )
-            elif item_type == "bookmark":
-                result.append(
-                    {
-                        "type": "bookmark",
-                        "url": child.text(1),
-                        "title": child.text(0),
-                        "added": "",
-                    }
-                )
-        return result
+        """书签树整体变化（如导入）后重新加载模型"""
+        self.model.reload()
+        self.run_search()
+
+    def run_search(self, text=None):
+        """即时搜索书签；搜索框为空时回到树形视图"""
+        text = self.search_input.text() if text is None else text
+        if not text.strip():
+            self.stack.setCurrentWidget(self.tree)
+            return
+        self.results.clear()
+        for node in BookmarkManager.search_bookmarks(text, self.SEARCH_RESULTS):
+            item = QTreeWidgetItem(
+                self.results, [bookmark_column_text(node, c) for c in range(3)]
+            )
+            item.setData(0, Qt.ItemDataRole.UserRole, node["id"])
+        self.stack.setCurrentWidget(self.results)
+
+    def _selected_node(self):
+        """返回选中的 (节点, 模型索引)；搜索结果中的节点没有模型索引"""
+        if self.stack.currentWidget() is self.results:
+            item = self.results.currentItem()
+            if item is None:
+                return None, None
+            return BookmarkManager.get_tree().get(item.data(0, Qt.ItemDataRole.UserRole)), None
+        index = self.tree.currentIndex().siblingAtColumn(0)
+        return self.model.node(index), index
+
+    def _update_node(self, node, index, **fields):
+        """树形视图中通过模型修改（发出行级信号）；搜索结果中直接修改书签树后刷新"""
+        if index is not None:
+            return self.model.update(index, **fields)
+        if not BookmarkManager.get_tree().update(node["id"], **fields):
+            return False
+        self.load_tree()
+        return True
+
+    def _target_folder(self, include_bookmark_parent=True):
+        """返回选中的文件夹，或选中书签所在的文件夹的索引，默认根目录（无效索引）"""
+        index = self.tree.currentIndex().siblingAtColumn(0)
+        node = self.model.node(index)
+        if node is None:
+            return QModelIndex()
+        if node["type"] == "folder":
+            return index
+        return index.parent() if include_bookmark_parent else QModelIndex()
 
     def add_bookmark(self):
         """添加新书签"""
-        title, ok = QInputDialog.getText(self, "Add Bookmark", "Title:")
-        if not ok or not title:
+        dlg = BookmarkEditDialog(parent=self)
+        dlg.setWindowTitle("Add Bookmark")
+        if not dlg.exec():
             return
-        url, ok = QInputDialog.getText(self, "Add Bookmark", "URL:", text="https://")
-        if not ok or not url:
+        values = dlg.values()
+        if not values["title"] or not values["url"]:
             return
 
         # 添加到当前选中的文件夹节点或根节点
-        selected = self.tree.currentItem()
-        parent_node = self.tree.invisibleRootItem()
-        if selected:
-            if selected.data(0, self.ROLE_TYPE) == "folder":
-                parent_node = selected
-            elif selected.parent():
-                parent_node = selected.parent()
-
-        node = QTreeWidgetItem(parent_node)
-        node.setText(0, title)
-        node.setText(1, url)
-        node.setData(0, self.ROLE_TYPE, "bookmark")
-        node.setData(0, self.ROLE_URL, url)
-        node.setFlags(node.flags() | Qt.ItemFlag.ItemIsDragEnabled)
-
+        parent = self._target_folder()
+        if self.model.add_bookmark(parent, **values) is None:
+            QMessageBox.information(
+                self, "Add Bookmark", "This URL or keyword is already in use."
+            )
+            return
+        self.tree.expand(parent)
+        self.run_search()
         self._changed = True
-        self._save_from_tree()
+        self._update_main_menu()
 
     def add_folder(self):
         """添加新文件夹"""
@@ -1072,92 +1491,71 @@ class BookmarkManagerDialog(QDialog):
         if not ok or not name:
             return
 
-        selected = self.tree.currentItem()
-        parent_node = self.tree.invisibleRootItem()
-        if selected and selected.data(0, self.ROLE_TYPE) == "folder":
-            parent_node = selected
-
-        node = QTreeWidgetItem(parent_node)
-        node.setText(0, name)
-        node.setText(1, "")
-        node.setData(0, self.ROLE_TYPE, "folder")
-        node.setData(0, self.ROLE_FOLDER_NAME, name)
-        node.setFlags(
-            node.flags() | Qt.ItemFlag.ItemIsDropEnabled | Qt.ItemFlag.ItemIsDragEnabled
-        )
-
+        parent = self._target_folder(include_bookmark_parent=False)
+        if self.model.add_folder(parent, name) is None:
+            return
+        self.tree.expand(parent)
         self._changed = True
-        self._save_from_tree()
+        self._update_main_menu()
 
     def edit_item(self):
         """编辑选中的书签或文件夹"""
-        selected = self.tree.currentItem()
-        if not selected:
+        node, index = self._selected_node()
+        if node is None:
             QMessageBox.information(self, "Edit", "Please select an item to edit.")
             return
 
-        item_type = selected.data(0, self.ROLE_TYPE)
-        if item_type == "bookmark":
-            title, ok = QInputDialog.getText(
-                self, "Edit Bookmark", "Title:", text=selected.text(0)
+        if node["type"] == "bookmark":
+            dlg = BookmarkEditDialog(
+                node["title"], node["url"], node.get("tags", ()), node.get("keyword", ""), self
             )
-            if not ok:
+            dlg.setWindowTitle("Edit Bookmark")
+            if not dlg.exec():
                 return
-            url, ok = QInputDialog.getText(
-                self, "Edit Bookmark", "URL:", text=selected.text(1)
-            )
-            if not ok:
+            if not self._update_node(node, index, **dlg.values()):
+                QMessageBox.information(self, "Edit", "This URL or keyword is already in use.")
                 return
-            selected.setText(0, title)
-            selected.setText(1, url)
-            selected.setData(0, self.ROLE_URL, url)
-        elif item_type == "folder":
+        else:
             name, ok = QInputDialog.getText(
-                self, "Edit Folder", "Folder name:", text=selected.text(0)
+                self, "Edit Folder", "Folder name:", text=node["name"]
             )
             if not ok:
                 return
-            selected.setText(0, name)
-            selected.setData(0, self.ROLE_FOLDER_NAME, name)
+            self._update_node(node, index, name=name)
 
         self._changed = True
-        self._save_from_tree()
+        self._update_main_menu()
 
     def delete_item(self):
         """删除选中的书签或文件夹"""
-        selected = self.tree.currentItem()
-        if not selected:
+        node, index = self._selected_node()
+        if node is None:
             QMessageBox.information(self, "Delete", "Please select an item to delete.")
             return
 
-        item_type = selected.data(0, self.ROLE_TYPE)
-        label = selected.text(0)
-
-        if item_type == "folder":
+        if node["type"] == "folder":
             reply = QMessageBox.question(
                 self,
                 "Delete Folder",
-                f"Delete folder '{label}' and all its contents?",
+                f"Delete folder '{node['name']}' and all its contents?",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             )
         else:
             reply = QMessageBox.question(
                 self,
                 "Delete Bookmark",
-                f"Delete bookmark '{label}'?",
+                f"Delete bookmark '{node['title']}'?",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             )
 
         if reply == QMessageBox.StandardButton.Yes:
-            parent = selected.parent()
-            if parent:
-                parent.removeChild(selected)
+            if index is not None:
+                self.model.remove(index)
             else:
-                index = self.tree.indexOfTopLevelItem(selected)
-                self.tree.takeTopLevelItem(index)
-
+                BookmarkManager.get_tree().remove(node["id"])
+                self.load_tree()
             self._changed = True
-            self._save_from_tree()
+            self._update_main_menu()
 
     def import_bookmarks(self):
         """从 HTML 文件导入书签"""
@@ -1167,7 +1565,108 @@ class BookmarkManagerDialog(QDialog):
         if not filepath:
             return
 
-        count = BookmarkManager.import_from_html(filepath)
+        # 模态进度对话框在 setValue 时处理事件，大文件导入期间界面保持响应
+        progress = QProgressDialog("Importing bookmarks...", None, 0, 100, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(300)
+        count = BookmarkManager.import_from_html(
+            filepath, lambda done, total: progress.setValue(done * 100 // max(total, 1))
+        )
+        progress.close()
+        self.load_tree()
+        self._changed = True
+        QMessageBox.information(
+            self, "Import Complete", f"Successfully imported {count} bookmarks."
+        )
+
+    def check_links(self):
+        """在后台线程中检查所有书签的链接（最近检查过的使用缓存结果）"""
+        self.check_btn.setEnabled(False)
+        self._check_progress = QProgressDialog("Checking links...", "Cancel", 0, 100, self)
+        self._check_progress.setMinimumDuration(300)
+        self._check_worker = LinkCheckWorker(self)
+        self._check_progress.canceled.connect(self._check_worker.checker.cancel)
+        self._check_worker.progress.connect(
+            lambda done, total: self._check_progress.setValue(done * 100 // max(total, 1))
+        )
+        self._check_worker.finished.connect(self._on_links_checked)
+        self._check_worker.error.connect(self._on_link_check_error)
+        self._check_worker.start()
+
+    def _stop_link_check(self):
+        """关闭对话框时取消正在进行的链接检查，并等待线程结束"""
+        worker, self._check_worker = self._check_worker, None
+        if worker is None:
+            return
+        worker.checker.cancel()
+        worker.wait()
+        self._check_progress.close()
+
+    def _on_link_check_error(self, message):
+        if self._check_worker is None:
+            return  # 对话框已关闭
+        self._check_worker = None
+        self.check_btn.setEnabled(True)
+        self._check_progress.close()
+        QMessageBox.warning(self, "Link Check Error", message)
+
+    def _on_links_checked(self, report):
+        if self._check_worker is None:
+            return  # 对话框已关闭
+        self._check_worker = None
+        self.check_btn.setEnabled(True)
+        self._check_progress.close()
+        dead, errors, redirects = report["dead"], report["errors"], report["redirects"]
+
+        details = []
+        for title, pairs in (("Dead", dead), ("Unreachable", errors)):
+            for bookmark, result in pairs:
+                reason = result.get("status") or result.get("error")
+                details.append(f"{title}: {bookmark['title']} <{bookmark['url']}> ({reason})")
+        for bookmark, result in redirects:
+            details.append(f"Moved: {bookmark['url']} -> {result['location']}")
+        slow = sorted(
+            (item for item in report["hosts"].items() if item[1]["latency"] is not None),
+            key=lambda item: -item[1]["latency"],
+        )
+        for host, stats in slow[:10]:
+            details.append(
+                f"Latency: {host} avg {stats['latency'] * 1000:.0f} ms, "
+                f"max {stats['max_latency'] * 1000:.0f} ms ({stats['count']} links)"
+            )
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Link Check Cancelled" if report["cancelled"] else "Link Check")
+        box.setText(
+            f"{len(dead)} dead, {len(errors)} unreachable, "
+            f"{len(redirects)} permanently redirected "
+            f"({report['checked']} links checked, others from cache)."
+        )
+        if details:
+            box.setDetailedText("\n".join(details))
+        if redirects:
+            box.setInformativeText("Update redirected bookmarks to their new addresses?")
+            box.setStandardButtons(
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+        if box.exec() == QMessageBox.StandardButton.Yes and redirects:
+            if bookmark_checker.apply_redirects(redirects):
+                self.load_tree()
+                self._changed = True
+                self._update_main_menu()
+
+    def import_browser_bookmarks(self):
+        """从 Firefox places.sqlite 或 Chrome Bookmarks 文件导入书签"""
+        filepath, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import Bookmarks",
+            "",
+            "Browser Bookmarks (places.sqlite Bookmarks);;All Files (*)",
+        )
+        if not filepath:
+            return
+
+        count = BookmarkManager.import_from_browser(filepath)
         self.load_tree()
         self._changed = True
         QMessageBox.information(
@@ -1185,9 +1684,6 @@ class BookmarkManagerDialog(QDialog):
         if not filepath:
             return
 
-        # 先保存当前树的状态
-        self._save_from_tree()
-
         if BookmarkManager.export_to_html(filepath):
             QMessageBox.information(
                 self, "Export Complete", f"Bookmarks exported to:\n{filepath}"
@@ -1195,28 +1691,106 @@ class BookmarkManagerDialog(QDialog):
         else:
             QMessageBox.warning(self, "Export Error", "Failed to export bookmarks.")
 
-    def on_double_click(self, item, column):
+    def on_double_click(self, index):
         """双击书签在主窗口中打开"""
-        if item.data(0, self.ROLE_TYPE) == "bookmark":
-            url = item.text(1)
-            if url and self.main_window:
-                self.main_window.add_new_tab(QUrl(url), item.text(0))
-
-    def _save_from_tree(self):
-        """将树形控件的当前状态保存回 bookmarks.json"""
-        data = self._tree_to_bookmarks()
-        BookmarkManager.save_bookmarks(data)
+        self._open_node(self.model.node(index))
+
+    def _open_result(self, item, column=0):
+        self._open_node(BookmarkManager.get_tree().get(item.data(0, Qt.ItemDataRole.UserRole)))
+
+    def _open_node(self, node):
+        if node and node["type"] == "bookmark" and node["url"] and self.main_window:
+            self.main_window.add_new_tab(QUrl(node["url"]), node["title"])
+
+    def _update_main_menu(self):
         # 通知主窗口更新书签菜单
         if self.main_window and hasattr(self.main_window, "update_bookmark_menu"):
             self.main_window.update_bookmark_menu()
 
+    def reject(self):
+        self._stop_link_check()
+        super().reject()
+
     def closeEvent(self, event):
-        """关闭时保存拖拽后的排序结果"""
-        self._save_from_tree()
+        """修改已直接写入书签树（由书签树延迟保存），关闭时只需停止链接检查并刷新主窗口菜单"""
+        self._stop_link_check()
+        self._update_main_menu()
         event.accept()
 
 
+class VaultWorker(QThread):
+    """后台线程：运行密码库的耗时操作（PBKDF2 解锁、创建、重新加密）"""
+
+    progress = pyqtSignal(int, int)  # (已完成, 总数)
+    finished = pyqtSignal(object)  # task 的返回值
+    error = pyqtSignal(str)
+
+    def __init__(self, task, parent=None):
+        super().__init__(parent)
+        self.task = task  # task(progress) -> 结果
+
+    def run(self):
+        try:
+            result = self.task(self.progress.emit)
+        except Exception as e:
+            # 任何异常都要报告，否则进度对话框不会关闭，密码库也一直处于忙碌状态
+            self.error.emit(str(e) or type(e).__name__)
+            return
+        self.finished.emit(result)
+
+
+class LinkCheckWorker(QThread):
+    """后台线程：检查书签链接（bookmark_checker）"""
+
+    progress = pyqtSignal(int, int)  # (已完成, 总数)
+    finished = pyqtSignal(dict)  # 检查报告
+    error = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.checker = bookmark_checker.BookmarkChecker()
+
+    def run(self):
+        try:
+            report = self.checker.check(progress=self.progress.emit)
+        except Exception as e:
+            print("Link check error:", e)
+            self.error.emit(str(e))
+            return
+        self.finished.emit(report)
+
+
+class HistoryImportWorker(QThread):
+    """后台线程：从 Chrome/Firefox 历史数据库分批导入"""
+
+    progress = pyqtSignal(int, int)  # (已读取行数, 总行数)
+    finished = pyqtSignal(int)  # 导入的记录数
+    error = pyqtSignal(str)
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Stop after the batch being committed (may be called from any thread)."""
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            count = browser_import.import_history(
+                self.path, self.progress.emit, cancelled=self._cancelled.is_set
+            )
+        except (ValueError, OSError, sqlite3.Error) as e:
+            self.error.emit(str(e))
+            return
+        self.finished.emit(count)
+
+
 class HistoryDialog(QDialog):
+    # 每页显示的记录数，点击 "Load More" 追加下一页
+    PAGE_SIZE = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("History")
@@ -1231,10 +1805,25 @@ class HistoryDialog(QDialog):
         self.search_input.setPlaceholderText("Search history...")
         self.search_input.textChanged.connect(self.filter_history)
 
+        # 排序方式：按时间 / 按 frecency（访问频率 + 时间衰减）/ 按天或站点分组统计
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItems(["Recent", "Most Visited"])
+        if history_analytics.is_available():
+            self.sort_combo.addItems(["By Day", "By Site"])
+        self.sort_combo.currentIndexChanged.connect(
+            lambda _: self.load_history(self.search_input.text())
+        )
+
         clear_btn = QPushButton("Clear History")
         clear_btn.clicked.connect(self.clear_history)
 
+        self.import_btn = QPushButton("Import...")
+        self.import_btn.setToolTip("Import history from Chrome (History) or Firefox (places.sqlite)")
+        self.import_btn.clicked.connect(self.import_history)
+
         top_layout.addWidget(self.search_input)
+        top_layout.addWidget(self.sort_combo)
+        top_layout.addWidget(self.import_btn)
         top_layout.addWidget(clear_btn)
         layout.addLayout(top_layout)
 
@@ -1251,34 +1840,114 @@ class HistoryDialog(QDialog):
 
         layout.addWidget(self.table)
 
+        # 底部分页栏
+        page_layout = QHBoxLayout()
+        self.result_label = QLabel()
+        page_layout.addWidget(self.result_label)
+        page_layout.addStretch()
+        self.import_progress = QProgressBar()
+        self.import_progress.hide()
+        page_layout.addWidget(self.import_progress)
+        self.load_more_btn = QPushButton("Load More")
+        self.load_more_btn.clicked.connect(self.load_more)
+        page_layout.addWidget(self.load_more_btn)
+        layout.addLayout(page_layout)
+
+        self._filter_text = ""
+        self._page = 0
+        self._import_worker = None
         self.load_history()
 
+    GROUP_HEADERS = {
+        "By Day": ["Day", "Visits", "Top Site"],
+        "By Site": ["Site", "Visits", "Time Spent"],
+    }
+
     def load_history(self, filter_text=""):
+        self._filter_text = filter_text.strip()
+        self._page = 0
         self.table.setRowCount(0)
-        history = HistoryManager.load_history()
-        # 反转以显示最新
-        history = list(reversed(history))
-
-        for item in history:
-            time_str = item.get("time", "")
-            title_str = item.get("title", "")
-            url_str = item.get("url", "")
-
-            if (
-                filter_text.lower() in title_str.lower()
-                or filter_text.lower() in url_str.lower()
-                or not filter_text
-            ):
-                row = self.table.rowCount()
-                self.table.insertRow(row)
-                self.table.setItem(row, 0, QTableWidgetItem(time_str))
-                self.table.setItem(row, 1, QTableWidgetItem(title_str))
-                self.table.setItem(row, 2, QTableWidgetItem(url_str))
+        mode = self.sort_combo.currentText()
+        if mode in self.GROUP_HEADERS and not self._filter_text:
+            self._show_groups(mode)
+            return
+        self.table.setHorizontalHeaderLabels(["Time", "Title", "URL"])
+        self._append_page()
+
+    def _show_groups(self, mode):
+        """按天或按站点显示统计结果（由 HistoryAnalytics 的向量化聚合提供）"""
+        analytics = HistoryManager.get_analytics()
+        self.table.setHorizontalHeaderLabels(self.GROUP_HEADERS[mode])
+        if mode == "By Day":
+            rows = [
+                (d["day"], str(d["visits"]), d["top_domain"])
+                for d in analytics.daily_summary()
+            ]
+        else:
+            rows = [
+                (s["domain"], str(s["visits"]), f"{s['dwell_seconds'] // 60} min")
+                for s in analytics.top_domains(self.PAGE_SIZE)
+            ]
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+        self.result_label.setText(f"{len(analytics)} visits")
+        self.load_more_btn.setEnabled(False)
+
+    def load_more(self):
+        self._page += 1
+        self._append_page()
+
+    def _append_page(self):
+        """取下一页结果追加到表格末尾"""
+        if self._filter_text:
+            # 搜索走全文索引（按 URL 聚合，最近访问在前）
+            history, total = HistoryManager.search_history(
+                self._filter_text, self._page, self.PAGE_SIZE
+            )
+            has_more = (self._page + 1) * self.PAGE_SIZE < total
+            self.result_label.setText(f"{total} matching pages")
+            if total == 0:
+                # 没有精确匹配时按模糊匹配（缩写、拼写错误）排序显示
+                history = HistoryManager.fuzzy_search_history(self._filter_text, self.PAGE_SIZE)
+                self.result_label.setText(f"{len(history)} similar pages")
+        elif self.sort_combo.currentText() == "Most Visited":
+            end = (self._page + 1) * self.PAGE_SIZE
+            sites = HistoryManager.get_top_sites(end)
+            has_more = len(sites) == end
+            history = [
+                {"time": s["last_visit"], "title": s["title"], "url": s["url"]}
+                for s in sites[self._page * self.PAGE_SIZE :]
+            ]
+            self.result_label.setText("")
+        else:
+            # 无过滤条件时按访问时间索引倒序分页
+            history = HistoryManager.get_recent_history(
+                self.PAGE_SIZE, offset=self._page * self.PAGE_SIZE
+            )
+            has_more = len(history) == self.PAGE_SIZE
+            self.result_label.setText("")
+
+        start = self.table.rowCount()
+        self.table.setRowCount(start + len(history))
+        for row, item in enumerate(history, start):
+            self.table.setItem(row, 0, QTableWidgetItem(item.get("time", "")))
+            self.table.setItem(row, 1, QTableWidgetItem(item.get("title", "")))
+            self.table.setItem(row, 2, QTableWidgetItem(item.get("url", "")))
+        self.load_more_btn.setEnabled(has_more)
 
     def filter_history(self, text):
         self.load_history(text)
 
     def on_double_click(self, row, col):
+        mode = self.sort_combo.currentText()
+        if mode in self.GROUP_HEADERS and not self._filter_text:
+            # 分组视图中双击站点 / 当天最常访问的站点，切换为搜索该站点
+            site = self.table.item(row, 0 if mode == "By Site" else 2).text()
+            self.sort_combo.setCurrentText("Recent")
+            self.search_input.setText(site)
+            return
         url = self.table.item(row, 2).text()
         if self.main_window:
             self.main_window.add_new_tab(QUrl(url), "Loading...")
@@ -1295,6 +1964,57 @@ class HistoryDialog(QDialog):
             HistoryManager.clear_history()
             self.load_history()
 
+    def import_history(self):
+        """从其他浏览器的历史数据库导入（后台线程，分批提交）"""
+        filepath, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import History",
+            "",
+            "Browser History (History places.sqlite);;All Files (*)",
+        )
+        if not filepath:
+            return
+
+        self.import_btn.setEnabled(False)
+        self.import_progress.setValue(0)
+        self.import_progress.show()
+        self._import_worker = HistoryImportWorker(filepath, self)
+        self._import_worker.progress.connect(self._on_import_progress)
+        self._import_worker.finished.connect(self._on_import_finished)
+        self._import_worker.error.connect(self._on_import_error)
+        self._import_worker.start()
+
+    def reject(self):
+        """关闭对话框时取消导入（已提交的批次保留），并等待线程结束"""
+        worker, self._import_worker = self._import_worker, None
+        if worker is not None and worker.isRunning():
+            worker.cancel()
+            worker.wait()
+        super().reject()
+
+    def _on_import_progress(self, done, total):
+        self.import_progress.setMaximum(max(total, 1))
+        self.import_progress.setValue(done)
+
+    def _on_import_finished(self, count):
+        if self._import_worker is None:
+            return  # 对话框已关闭
+        self._import_worker = None
+        self.import_btn.setEnabled(True)
+        self.import_progress.hide()
+        self.load_history(self.search_input.text())
+        QMessageBox.information(
+            self, "Import Complete", f"Successfully imported {count} history entries."
+        )
+
+    def _on_import_error(self, message):
+        if self._import_worker is None:
+            return
+        self._import_worker = None
+        self.import_btn.setEnabled(True)
+        self.import_progress.hide()
+        QMessageBox.warning(self, "Import Error", message)
+
 
 class SettingsDialog(QDialog):
     """统一的浏览器设置对话框"""
@@ -1370,6 +2090,9 @@ class SettingsDialog(QDialog):
         if current_engine in ["Bing", "Google", "Baidu"]:
             self.engine_combo_setting.setCurrentText(current_engine)
         form.addRow("Search Engine:", self.engine_combo_setting)
+        self.search_suggest_cb = QCheckBox("Show search suggestions in the address bar")
+        self.search_suggest_cb.setChecked(self.settings.get("search_suggestions", True))
+        form.addRow("", self.search_suggest_cb)
 
         # 启动行为
         self.restore_session_cb = QCheckBox("Restore previous session on startup")
@@ -1416,6 +2139,15 @@ class SettingsDialog(QDialog):
         self.js_enabled_cb.setChecked(self.settings.get("javascript_enabled", True))
         group_layout.addWidget(self.js_enabled_cb)
 
+        # 历史记录保留期限，超期的整天记录由后台线程删除
+        retention_layout = QHBoxLayout()
+        retention_layout.addWidget(QLabel("Keep history for (days, 0 = forever):"))
+        self.history_days_spin = QSpinBox()
+        self.history_days_spin.setRange(0, 3650)
+        self.history_days_spin.setValue(self.settings.get("history_max_age_days", 0))
+        retention_layout.addWidget(self.history_days_spin)
+        group_layout.addLayout(retention_layout)
+
         layout.addWidget(group)
 
         # 清除浏览数据（支持时间范围）
@@ -1521,22 +2253,7 @@ class SettingsDialog(QDialog):
                 HistoryManager.clear_history()
             else:
                 # 按时间范围清除历史
-                history = HistoryManager.load_history()
-                filtered = [h for h in history if h.get("time", "") < cutoff]
-                try:
-                    import json as _json
-
-                    with open(
-                        os.path.join(
-                            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                            "history.json",
-                        ),
-                        "w",
-                        encoding="utf-8",
-                    ) as f:
-                        _json.dump(filtered, f, ensure_ascii=False, indent=2)
-                except OSError:
-                    pass
+                HistoryManager.clear_history_since(cutoff)
 
         if self.clear_downloads_cb.isChecked():
             DownloadManager.clear_downloads()
@@ -1895,11 +2612,13 @@ class SettingsDialog(QDialog):
 
         self.homepage_edit.setText("https://www.bing.com")
         self.engine_combo_setting.setCurrentText("Bing")
+        self.search_suggest_cb.setChecked(True)
         self.restore_session_cb.setChecked(True)
         self.download_dir_edit.setText(os.path.expanduser("~/Downloads"))
         self.block_popups_cb.setChecked(True)
         self.do_not_track_cb.setChecked(False)
         self.js_enabled_cb.setChecked(True)
+        self.history_days_spin.setValue(0)
         self.theme_combo.setCurrentText("Dark (Default)")
         self.default_zoom_combo.setCurrentText("100%")
         self.ua_combo.setCurrentText("Default (NanoBrowser)")
@@ -1911,11 +2630,13 @@ class SettingsDialog(QDialog):
         return {
             "homepage": self.homepage_edit.text().strip() or "https://www.bing.com",
             "search_engine": self.engine_combo_setting.currentText(),
+            "search_suggestions": self.search_suggest_cb.isChecked(),
             "restore_session": self.restore_session_cb.isChecked(),
             "download_dir": self.download_dir_edit.text().strip(),
             "block_popups": self.block_popups_cb.isChecked(),
             "do_not_track": self.do_not_track_cb.isChecked(),
             "javascript_enabled": self.js_enabled_cb.isChecked(),
+            "history_max_age_days": self.history_days_spin.value(),
             "theme": self.theme_combo.currentText(),
             "default_zoom": self.default_zoom_combo.currentText(),
             "user_agent": self.ua_combo.currentText(),
@@ -2074,11 +2795,13 @@ class CookieManagerDialog(QDialog):
         if not ok or not domain.strip():
             return
 
-        domain = domain.strip()
+        # Cookie 域名可能带前导 "."、大小写不一或是 IDN，统一规范化后比较
+        domain = canonical_host(domain)
         cookie_store = QWebEngineProfile.defaultProfile().cookieStore()
         count = 0
         for _i, cookie in enumerate(self._cookie_list):
-            if cookie.domain() == domain or cookie.domain().endswith("." + domain):
+            cookie_domain = canonical_host(cookie.domain())
+            if cookie_domain == domain or cookie_domain.endswith("." + domain):
                 cookie_store.deleteCookie(cookie)
                 count += 1
 
@@ -2404,12 +3127,12 @@ class FeedReaderDialog(QDialog):
 class PasswordManagerDialog(QDialog):
     """密码管理器对话框：查看和删除已保存的密码"""
 
-    def __init__(self, master_password: str, parent=None):
+    def __init__(self, vault_key: VaultKey, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Password Manager")
         self.setMinimumSize(600, 400)
         self.resize(700, 450)
-        self._master_password = master_password
+        self._vault_key = vault_key
         self._init_ui()
         self._refresh_table()
 
@@ -2425,10 +3148,20 @@ class PasswordManagerDialog(QDialog):
         self.toggle_pw_btn = QPushButton("Show Passwords")
         self.toggle_pw_btn.setCheckable(True)
         self.toggle_pw_btn.toggled.connect(self._toggle_password_visibility)
+        self.change_master_btn = QPushButton("Change Master Password")
+        self.change_master_btn.clicked.connect(self._change_master_password)
+        self.import_csv_btn = QPushButton("Import CSV...")
+        self.import_csv_btn.setToolTip("Import passwords exported from Chrome or Firefox")
+        self.import_csv_btn.clicked.connect(self._import_csv)
+        self.export_csv_btn = QPushButton("Export CSV...")
+        self.export_csv_btn.clicked.connect(self._export_csv)
         btn_layout.addWidget(self.delete_btn)
         btn_layout.addWidget(self.delete_all_btn)
         btn_layout.addWidget(self.toggle_pw_btn)
         btn_layout.addStretch()
+        btn_layout.addWidget(self.import_csv_btn)
+        btn_layout.addWidget(self.export_csv_btn)
+        btn_layout.addWidget(self.change_master_btn)
         layout.addLayout(btn_layout)
 
         # 密码表格
@@ -2470,8 +3203,7 @@ class PasswordManagerDialog(QDialog):
             # 解密密码
             pw = ""
             if i < len(raw_entries):
-                enc = raw_entries[i].get("password_encrypted", {})
-                decrypted = PasswordCrypto.decrypt(enc, self._master_password)
+                decrypted = PasswordManager.decrypt_entry(raw_entries[i], self._vault_key)
                 pw = decrypted if decrypted else "[decrypt error]"
             self._decrypted_passwords.append(pw)
 
@@ -2513,6 +3245,100 @@ class PasswordManagerDialog(QDialog):
                     PasswordManager.delete_password(entry["url"], entry["username"])
             self._refresh_table()
 
+    def _change_master_password(self):
+        """修改主密码：在后台线程（进程池）中重新加密所有条目"""
+        pw, ok = QInputDialog.getText(
+            self, "Change Master Password", "New master password:", QLineEdit.EchoMode.Password
+        )
+        if not ok or not pw.strip():
+            return
+        pw2, ok = QInputDialog.getText(
+            self,
+            "Change Master Password",
+            "Confirm new master password:",
+            QLineEdit.EchoMode.Password,
+        )
+        if not ok or pw2 != pw:
+            QMessageBox.warning(self, "Error", "Passwords do not match.")
+            return
+
+        def task(progress):
+            return PasswordManager.change_master_password(self._vault_key, pw, progress)
+
+        self._run_vault_task(
+            "Re-encrypting saved passwords...", task, self._on_master_password_changed
+        )
+
+    def _run_vault_task(self, label, task, on_finished):
+        """在主窗口的 VaultWorker 中运行 task，期间禁用所有会读写密码库的按钮"""
+        self._set_vault_busy(True)
+
+        def done(result):
+            self._set_vault_busy(False)
+            on_finished(result)
+
+        if not self.parent()._run_vault_task(
+            label, task, done, lambda: self._set_vault_busy(False)
+        ):
+            self._set_vault_busy(False)
+
+    def _set_vault_busy(self, busy):
+        for button in (
+            self.delete_btn,
+            self.delete_all_btn,
+            self.change_master_btn,
+            self.import_csv_btn,
+            self.export_csv_btn,
+        ):
+            button.setEnabled(not busy)
+
+    def _on_master_password_changed(self, key):
+        self._vault_key = key
+        self.parent()._vault_key = key
+        self._refresh_table()
+        QMessageBox.information(self, "Master Password", "Master password changed.")
+
+    def _import_csv(self):
+        """从 Chrome / Firefox 导出的 CSV 批量导入密码（后台线程中加密，只写一次文件）"""
+        filepath, _ = QFileDialog.getOpenFileName(
+            self, "Import Passwords", "", "CSV Files (*.csv);;All Files (*)"
+        )
+        if not filepath:
+            return
+
+        def task(progress):
+            return PasswordManager.import_csv(filepath, self._vault_key, progress)
+
+        def done(count):
+            self._refresh_table()
+            QMessageBox.information(
+                self, "Import Complete", f"Successfully imported {count} passwords."
+            )
+
+        self._run_vault_task("Importing passwords...", task, done)
+
+    def _export_csv(self):
+        """导出为 CSV（明文，需要确认）"""
+        reply = QMessageBox.question(
+            self,
+            "Export Passwords",
+            "The exported file will contain your passwords in plain text. Continue?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        filepath, _ = QFileDialog.getSaveFileName(
+            self, "Export Passwords", "passwords.csv", "CSV Files (*.csv)"
+        )
+        if not filepath:
+            return
+        try:
+            count = PasswordManager.export_csv(filepath, self._vault_key)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Error", str(e))
+            return
+        QMessageBox.information(self, "Export Complete", f"Exported {count} passwords.")
+
     def _delete_all(self):
         """删除所有密码"""
         reply = QMessageBox.question(
@@ -2665,6 +3491,9 @@ class ExtensionManagerDialog(QDialog):
 
 
 class MainWindow(QMainWindow):
+    # 搜索建议在后台线程返回，经由信号切回 GUI 线程
+    search_suggestions_ready = pyqtSignal(str, list)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("NanoBrowser")
@@ -2674,6 +3503,10 @@ class MainWindow(QMainWindow):
         # 加载设置
         self.settings = SettingsManager.load_settings()
 
+        # 历史记录存储后端 (sqlite / json)
+        HistoryManager.use_backend(self.settings.get("history_backend", "sqlite"))
+        self._apply_history_retention(self.settings)
+
         # 应用保存的主题
         saved_theme = self.settings.get("theme", "Dark (Default)")
         theme_css = ThemeManager.get_stylesheet(saved_theme)
@@ -2772,13 +3605,28 @@ class MainWindow(QMainWindow):
         self._completer_model = QStringListModel()
         self._url_completer = QCompleter()
         self._url_completer.setModel(self._completer_model)
-        self._url_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self._url_completer.setFilterMode(Qt.MatchFlag.MatchContains)
         self._url_completer.setMaxVisibleItems(10)
-        self._url_completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+        # 建议已由 SuggestionIndex 匹配并排序，弹出列表不再二次过滤
+        self._url_completer.setCompletionMode(
+            QCompleter.CompletionMode.UnfilteredPopupCompletion
+        )
         self._url_completer.activated.connect(self._on_completer_activated)
         self.url_bar.setCompleter(self._url_completer)
         self.url_bar.textEdited.connect(self._refresh_completer_model)
+        self.url_bar.textEdited.connect(self._inline_complete)
+        self._suggestions = None
+        self._suggestions_dirty = False
+        self._bookmarks_dirty = False
+        self._bookmark_seq = 0
+        self._host_index = HostIndex()
+        self._url_typed = ""
+        self._inline_completion = None
+        self._suggest_query = ""
+        self._local_suggestions = []
+        self._search_suggester = SearchSuggester(self.search_suggestions_ready.emit)
+        self.search_suggestions_ready.connect(self._on_search_suggestions)
+        HistoryManager.add_listener(self._on_history_changed)
+        BookmarkManager.add_listener(self._on_bookmarks_changed)
 
         # 收藏按钮
         bookmark_btn = QAction("★", self)
@@ -2824,9 +3672,13 @@ class MainWindow(QMainWindow):
         save_pdf_action.triggered.connect(self.save_as_pdf)
         file_menu.addAction(save_pdf_action)
 
-        # 5. 书签菜单
+        # 5. 书签菜单（显示前才填充，见 _fill_bookmark_menu）
         self.bookmark_menu = self.menuBar().addMenu("Bookmarks")
-        self.update_bookmark_menu()
+        self.bookmark_menu.bookmark_folder_id = ROOT_ID
+        self.bookmark_menu.bookmark_version = None
+        self.bookmark_menu.aboutToShow.connect(
+            lambda: self._fill_bookmark_menu(self.bookmark_menu)
+        )
 
         # 5. 下载菜单
         download_menu = self.menuBar().addMenu("Downloads")
@@ -3031,7 +3883,9 @@ class MainWindow(QMainWindow):
         self._closed_tabs = []  # 最近关闭的标签页 [{"url": ..., "title": ...}, ...]
         self._pinned_tabs = set()  # 固定的标签页 widget id 集合
         self._original_url_before_translate = None  # 翻译前的原始 URL
-        self._master_password_cache = None  # 会话中缓存的主密码（内存中，不持久化）
+        self._vault_key = None  # 解锁后的会话密钥（VaultKey，只在内存中，不持久化）
+        self._vault_worker = None  # 正在运行的密码库后台任务（同一时间只有一个）
+        self._vault_waiters = []  # 等待后台任务完成后再使用会话密钥的回调
 
         # 12. 扩展系统初始化
         self.extension_manager = ExtensionManager()
@@ -3098,31 +3952,51 @@ class MainWindow(QMainWindow):
         return template.format(keyword)
 
     def update_bookmark_menu(self):
-        self.bookmark_menu.clear()
-        bookmarks = BookmarkManager.load_bookmarks()
-
-        self._build_bookmark_menu(self.bookmark_menu, bookmarks)
-
-        if bookmarks:
-            self.bookmark_menu.addSeparator()
-
-        manage_action = QAction("Manage Bookmarks...", self)
-        manage_action.triggered.connect(self.show_bookmark_manager)
-        self.bookmark_menu.addAction(manage_action)
-
-    def _build_bookmark_menu(self, menu, items):
-        """递归构建书签菜单，包含文件夹子菜单"""
-        for item in items:
-            if item.get("type") == "folder":
-                submenu = menu.addMenu(item["name"])
-                self._build_bookmark_menu(submenu, item.get("children", []))
-            elif item.get("type") == "bookmark":
-                action = QAction(item.get("title", item.get("url", "")), self)
-                url = item.get("url", "")
+        """
+        书签变化后调用。菜单按文件夹版本号自动判断是否过期，这里只让顶层菜单
+        在下次显示时重新填充；未变化的子文件夹菜单继续沿用。
+        """
+        self.bookmark_menu.bookmark_version = None
+
+    def _fill_bookmark_menu(self, menu):
+        """
+        aboutToShow 时填充一级书签菜单：子文件夹只创建空的子菜单，展开时再填充。
+        文件夹内容没有变化时沿用上次创建的菜单项，菜单项按节点 id 在触发时查找书签。
+        """
+        tree = BookmarkManager.get_tree()
+        folder_id = menu.bookmark_folder_id
+        version = tree.version(folder_id)
+        if menu.bookmark_version == version:
+            return
+        menu.bookmark_version = version
+
+        direct = Qt.FindChildOption.FindDirectChildrenOnly
+        for submenu in menu.findChildren(QMenu, options=direct):
+            submenu.deleteLater()
+        menu.clear()
+        for node in tree.children(folder_id):
+            if node["type"] == "folder":
+                submenu = QMenu(node["name"], menu)
+                submenu.bookmark_folder_id = node["id"]
+                submenu.bookmark_version = None
+                submenu.aboutToShow.connect(lambda m=submenu: self._fill_bookmark_menu(m))
+                menu.addMenu(submenu)
+            else:
+                action = menu.addAction(node["title"] or node["url"])
                 action.triggered.connect(
-                    lambda checked, u=url: self.load_in_current_tab(u)
+                    lambda checked, node_id=node["id"]: self._open_bookmark(node_id)
                 )
-                menu.addAction(action)
+
+        if menu is self.bookmark_menu:
+            if len(tree):
+                menu.addSeparator()
+            manage_action = menu.addAction("Manage Bookmarks...")
+            manage_action.triggered.connect(self.show_bookmark_manager)
+
+    def _open_bookmark(self, node_id):
+        node = BookmarkManager.get_tree().get(node_id)
+        if node is not None:
+            self.load_in_current_tab(node["url"])
 
     def load_in_current_tab(self, url):
         if self.tabs.currentWidget():
@@ -3209,7 +4083,14 @@ class MainWindow(QMainWindow):
         if ok:
             url = browser.url().toString()
             title = browser.title()
-            HistoryManager.add_history(url, title)
+            # 放入后台写入队列，不阻塞 GUI 线程；由重定向发起的加载会替换上一跳
+            redirected = isinstance(browser.page(), BrowserPage) and browser.page().redirected
+            HistoryManager.record_visit(url, title, source=id(browser), redirected=redirected)
+            # 重定向窗口结束后这次访问才进入搜索索引与地址栏建议
+            QTimer.singleShot(
+                int(DEFAULT_REDIRECT_WINDOW * 1000) + 100,
+                HistoryManager.index_deferred_visits,
+            )
             # 自动填充密码（如果有主密码且有保存的密码）
             self._try_auto_fill(browser, url)
             # 注入表单提交监听脚本
@@ -3282,6 +4163,7 @@ class MainWindow(QMainWindow):
             )
         self.tabs.removeTab(i)
         self._tab_zoom_factors.pop(id(widget), None)
+        HistoryManager.forget_visit_source(id(widget))
         widget.deleteLater()
 
     def show_tab_context_menu(self, point):
@@ -3399,10 +4281,18 @@ class MainWindow(QMainWindow):
         if not text:
             return
 
-        # 简单判断是否是网址格式
-        is_url = re.match(r"^(http://|https://|file://)", text) or (
-            "." in text and " " not in text
+        # 书签关键字（如 "w python"）展开为书签 URL，URL 中的 %s 替换为其余输入
+        keyword_url = self._keyword_url(text)
+        if keyword_url:
+            text = keyword_url
+
+        # 简单判断是否是网址格式；内联补全出的域名（如 localhost:8000/）总是直接导航
+        is_url = (
+            text == self._inline_completion
+            or re.match(r"^(http://|https://|file://)", text)
+            or ("." in text and " " not in text)
         )
+        self._inline_completion = None
 
         if is_url:
             if not re.match(r"^[a-zA-Z]+://", text):
@@ -3416,9 +4306,18 @@ class MainWindow(QMainWindow):
         else:
             self.add_new_tab(QUrl(url), "Loading...")
 
+    def _keyword_url(self, text):
+        """输入的第一个词是书签关键字时返回展开后的 URL，否则返回 None"""
+        keyword, _, rest = text.strip().partition(" ")
+        node = BookmarkManager.find_keyword(keyword)
+        if node is None:
+            return None
+        return node["url"].replace("%s", quote_plus(rest.strip()))
+
     def update_url_bar(self, qurl, browser=None):
         if browser == self.tabs.currentWidget():
             url_str = qurl.toString()
+            self._url_typed = ""
             if url_str != "about:blank":
                 self.url_bar.setText(url_str)
                 self.url_bar.setCursorPosition(0)
@@ -3641,8 +4540,20 @@ class MainWindow(QMainWindow):
             QWebEngineSettings.WebAttribute.JavascriptEnabled, js_enabled
         )
 
+        # 历史记录保留策略
+        self._apply_history_retention(new_settings)
+
         self.statusBar().showMessage("Settings saved.", 2000)
 
+    def _apply_history_retention(self, settings):
+        """按设置配置历史记录保留策略（0 表示不限制）与重复访问合并窗口"""
+        HistoryManager.set_coalesce_window(settings.get("history_coalesce_seconds", 30))
+        HistoryManager.set_retention_policy(
+            max_age_days=settings.get("history_max_age_days", 0),
+            max_entries=settings.get("history_max_entries", 0),
+            max_bytes=settings.get("history_max_bytes", 0),
+        )
+
     def apply_theme(self, theme_name: str):
         """动态切换主题"""
         css = ThemeManager.get_stylesheet(theme_name)
@@ -3857,10 +4768,19 @@ class MainWindow(QMainWindow):
 
     # ---- 密码管理器 ----
 
-    def _request_master_password(self, title: str = "Master Password") -> str | None:
-        """请求输入主密码。已缓存则直接返回，否则弹窗。返回 None 表示取消。"""
-        if self._master_password_cache:
-            return self._master_password_cache
+    def _request_master_password(self, title: str = "Master Password", callback=None):
+        """
+        解锁密码库后以会话密钥调用 callback(key)；已解锁时立即调用，取消或密码错误时不调用。
+
+        PBKDF2 在后台线程中运行（界面显示忙碌状态），因此可以提高迭代次数而不会卡住界面。
+        """
+        if self._vault_worker is not None:
+            # 密码库正忙（解锁、重新加密或导入中），完成后用当时的会话密钥一起回调
+            self._vault_waiters.append(callback)
+            return
+        if self._vault_key:
+            callback(self._vault_key)
+            return
 
         if not PasswordManager.is_master_password_set():
             # 首次使用，设置主密码
@@ -3871,7 +4791,7 @@ class MainWindow(QMainWindow):
                 QLineEdit.EchoMode.Password,
             )
             if not ok or not pw.strip():
-                return None
+                return
             # 确认
             pw2, ok2 = QInputDialog.getText(
                 self,
@@ -3881,10 +4801,12 @@ class MainWindow(QMainWindow):
             )
             if not ok2 or pw2 != pw:
                 QMessageBox.warning(self, "Error", "Passwords do not match.")
-                return None
-            PasswordManager.set_master_password(pw)
-            self._master_password_cache = pw
-            return pw
+                return
+            label = "Creating password vault..."
+
+            def task(progress):
+                return PasswordManager.set_master_password(pw)
+
         else:
             # 验证主密码
             pw, ok = QInputDialog.getText(
@@ -3894,30 +4816,84 @@ class MainWindow(QMainWindow):
                 QLineEdit.EchoMode.Password,
             )
             if not ok or not pw.strip():
-                return None
-            if not PasswordManager.verify_master_password(pw):
-                QMessageBox.warning(self, "Error", "Incorrect master password.")
-                return None
-            self._master_password_cache = pw
-            return pw
+                return
+            # 旧格式的密码库在第一次解锁时迁移
+            label = "Unlocking password vault..."
+
+            def task(progress):
+                return PasswordManager.unlock(pw)
+
+        self._vault_waiters = [callback]
+        self._run_vault_task(label, task, self._on_vault_unlocked)
+
+    def _on_vault_unlocked(self, key):
+        if key is None:
+            self._vault_waiters = []
+            QMessageBox.warning(self, "Error", "Incorrect master password.")
+            return
+        self._vault_key = key
+
+    def _flush_vault_waiters(self):
+        """后台任务结束后，以当前的会话密钥调用排队的回调（仍未解锁时丢弃）"""
+        waiters, self._vault_waiters = self._vault_waiters, []
+        for callback in waiters:
+            if self._vault_key:
+                callback(self._vault_key)
+
+    def _run_vault_task(self, label, task, on_finished, on_error=None):
+        """
+        在 VaultWorker 中运行 task(progress)，期间显示进度（未报告进度时为忙碌状态）。
+
+        同一时间只运行一个密码库任务；已有任务在运行时提示用户并返回 False。
+        """
+        if self._vault_worker is not None:
+            QMessageBox.information(
+                self, "Password Vault", "Another password vault operation is still running."
+            )
+            return False
+        busy = QProgressDialog(label, None, 0, 0, self)
+        busy.setWindowModality(Qt.WindowModality.WindowModal)
+        busy.setMinimumDuration(200)
+        worker = VaultWorker(task, self)
+
+        def report(done, total):
+            busy.setMaximum(max(total, 1))
+            busy.setValue(done)
+
+        def finish(result):
+            self._vault_worker = None
+            busy.close()
+            on_finished(result)
+            self._flush_vault_waiters()
+
+        def fail(message):
+            self._vault_worker = None
+            busy.close()
+            QMessageBox.warning(self, "Password Vault", message)
+            if on_error is not None:
+                on_error()
+            self._flush_vault_waiters()
+
+        worker.progress.connect(report)
+        worker.finished.connect(finish)
+        worker.error.connect(fail)
+        self._vault_worker = worker
+        worker.start()
+        return True
 
     def show_password_manager(self):
         """显示密码管理器对话框"""
-        master_pw = self._request_master_password("Password Manager")
-        if master_pw is None:
-            return
-        dialog = PasswordManagerDialog(master_pw, self)
-        dialog.exec()
+        self._request_master_password(
+            "Password Manager", lambda key: PasswordManagerDialog(key, self).exec()
+        )
 
     def _try_auto_fill(self, browser, url: str):
         """尝试自动填充已保存的密码"""
-        if not self._master_password_cache:
+        if not self._vault_key:
             return
         if not url or url in ("about:blank", ""):
             return
-        passwords = PasswordManager.get_passwords_for_url(
-            url, self._master_password_cache
-        )
+        passwords = PasswordManager.get_passwords_for_url(url, self._vault_key)
         if not passwords:
             return
         # 使用第一个匹配的密码进行自动填充
@@ -4003,10 +4979,14 @@ class MainWindow(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
         if reply == QMessageBox.StandardButton.Yes:
-            master_pw = self._request_master_password("Save Password")
-            if master_pw:
-                PasswordManager.save_password(url, username, password, master_pw)
-                self.statusBar().showMessage("Password saved.", 3000)
+
+            def save(vault_key):
+                if PasswordManager.save_password(url, username, password, vault_key):
+                    self.statusBar().showMessage("Password saved.", 3000)
+                else:
+                    self.statusBar().showMessage("Password could not be saved.", 3000)
+
+            self._request_master_password("Save Password", save)
 
     # ---- 扩展系统 ----
 
@@ -4063,74 +5043,153 @@ class MainWindow(QMainWindow):
 
     # ---- 地址栏自动完成 ----
 
-    def _collect_suggestions(self):
-        """从历史记录和书签中收集建议列表，返回去重的字符串列表。
-        每条格式: "URL  |  Title  |  source" 方便用户辨别来源。
-        """
-        seen = set()
-        suggestions = []
-
-        # 历史记录（最近 500 条，倒序优先显示最近的）
-        history = HistoryManager.load_history()
-        for item in reversed(history[-500:]):
-            url = item.get("url", "")
-            title = item.get("title", "")
-            if url and url not in seen:
-                seen.add(url)
-                label = (
-                    f"{url}  |  {title}  |  History" if title else f"{url}  |  History"
-                )
-                suggestions.append(label)
-
-        # 书签（递归展开文件夹）
-        bookmarks = BookmarkManager.load_bookmarks()
-        self._collect_bookmark_suggestions(bookmarks, suggestions, seen)
-
-        return suggestions
-
-    def _collect_bookmark_suggestions(self, items, suggestions, seen):
-        """递归收集书签建议"""
-        for item in items:
-            if item.get("type") == "folder":
-                self._collect_bookmark_suggestions(
-                    item.get("children", []), suggestions, seen
-                )
+    def _suggestion_index(self):
+        """返回地址栏建议索引，首次使用或历史整体变化后从历史记录和书签重建"""
+        if self._suggestions is None or self._suggestions_dirty:
+            self._suggestions_dirty = False
+            self._bookmarks_dirty = False
+            sites = HistoryManager.get_top_sites(SUGGESTION_HISTORY_LIMIT)
+            tree = BookmarkManager.get_tree()
+            with tree.lock:
+                self._bookmark_seq = tree.change_seq
+                bookmarks = tree.flat_bookmarks()
+            index = SuggestionIndex()
+            index.build(sites, bookmarks)
+            self._host_index.build(sites, bookmarks)
+            self._suggestions = index
+        elif self._bookmarks_dirty:
+            self._bookmarks_dirty = False
+            self._sync_bookmark_changes()
+        return self._suggestions
+
+    def _on_history_changed(self, record):
+        """新访问就地更新建议索引；批量变化（可能来自后台线程）只做标记，下次输入时重建"""
+        if record is None or self._suggestions is None:
+            self._suggestions_dirty = True
+        else:
+            self._suggestions.add_visit(record.get("url", ""), record.get("title", ""))
+            self._host_index.add_visit(record.get("url", ""))
+
+    def _on_bookmarks_changed(self, tree):
+        """书签变化（可能来自后台线程）只做标记，下次输入时只同步变化的书签"""
+        self._bookmarks_dirty = True
+
+    def _sync_bookmark_changes(self):
+        tree = BookmarkManager.get_tree()
+        with tree.lock:
+            self._bookmark_seq, urls = tree.changes_since(self._bookmark_seq)
+            if urls is None:
+                flat = tree.flat_bookmarks()
             else:
-                url = item.get("url", "")
-                title = item.get("title", "")
-                if url and url not in seen:
-                    seen.add(url)
-                    label = (
-                        f"{url}  |  {title}  |  Bookmark"
-                        if title
-                        else f"{url}  |  Bookmark"
-                    )
-                    suggestions.append(label)
+                # 复制节点，离开锁后其他线程的修改不会影响本次同步
+                changes = [(url, tree.find_url(url)) for url in urls]
+                changes = [(url, None if node is None else dict(node)) for url, node in changes]
+        if urls is None:
+            self._suggestions.sync_bookmarks(flat)
+            self._host_index.sync_bookmarks(flat)
+            return
+        for url, node in changes:
+            if node is None:
+                self._suggestions.set_bookmark(url, bookmarked=False)
+                self._host_index.set_bookmark(url, False)
+            else:
+                self._suggestions.set_bookmark(node["url"], node.get("title", ""))
+                self._host_index.set_bookmark(node["url"])
+
+    def _inline_complete(self, text):
+        """输入字符且光标在末尾时，把地址栏内联补全为最常访问的匹配域名"""
+        previous = self._url_typed
+        self._url_typed = text
+        self._inline_completion = None
+        # 删除字符（新文本是上次输入的前缀）时不补全，否则退格无法删掉补全的部分
+        if previous.startswith(text) or self.url_bar.cursorPosition() != len(text):
+            return
+        self._suggestion_index()
+        completion = self._host_index.complete(text)
+        if completion:
+            self.url_bar.setText(completion)
+            # 选中补全部分，继续输入会直接替换它
+            self.url_bar.setSelection(len(completion), len(text) - len(completion))
+            self._inline_completion = completion
 
     def _refresh_completer_model(self, text):
-        """当用户在地址栏输入时刷新自动完成数据"""
-        if len(text) < 1:
+        """当用户在地址栏输入时，从内存索引中取排名前 10 的建议（不读文件）"""
+        self._suggest_query = text.strip()
+        if not self._suggest_query:
+            self._search_suggester.cancel()
+            self._local_suggestions = []
+            self._completer_model.setStringList([])
             return
-        # 仅在首次输入或模型为空时重建完整列表（避免每次按键都读文件）
-        if not hasattr(self, "_completer_cache") or self._completer_cache is None:
-            self._completer_cache = self._collect_suggestions()
-            self._completer_model.setStringList(self._completer_cache)
-        # 清除缓存的定时器（2秒后自动失效，下次输入会重新加载）
-        if hasattr(self, "_completer_timer") and self._completer_timer is not None:
-            self._completer_timer.stop()
-        self._completer_timer = QTimer()
-        self._completer_timer.setSingleShot(True)
-        self._completer_timer.timeout.connect(self._invalidate_completer_cache)
-        self._completer_timer.start(2000)
-
-    def _invalidate_completer_cache(self):
-        """使缓存失效，下次输入时重新加载"""
-        self._completer_cache = None
+        labels = []
+        keyword_url = self._keyword_url(text)
+        if keyword_url:
+            node = BookmarkManager.find_keyword(text.split()[0])
+            labels.append(f"{keyword_url}  |  {node['title']}  |  Keyword")
+        labels.extend(f"{url}  |  {title}  |  Tab" for url, title in self._matching_tabs(text))
+        seen = set()
+        for item in self._suggestion_index().query(text, 10 - len(labels)):
+            seen.add(item["url"])
+            source = "History" if item["history"] is not None else "Bookmark"
+            if item["title"]:
+                labels.append(f"{item['url']}  |  {item['title']}  |  {source}")
+            else:
+                labels.append(f"{item['url']}  |  {source}")
+        # 标签与书签标题中的单词由书签树的倒排索引补充
+        if len(labels) < 10:
+            for node in BookmarkManager.search_bookmarks(text, 10):
+                if len(labels) >= 10:
+                    break
+                if node["url"] not in seen:
+                    seen.add(node["url"])
+                    labels.append(f"{node['url']}  |  {node['title']}  |  Bookmark")
+        self._local_suggestions = labels
+        self._show_suggestions(labels)
+        # 搜索建议：命中缓存时会立即回调，否则防抖后在后台请求
+        if self.settings.get("search_suggestions", True) and "://" not in text:
+            engine = self.settings.get("search_engine", "Bing")
+            self._search_suggester.request(SEARCH_SUGGEST_URLS.get(engine), text)
+        else:
+            self._search_suggester.cancel()
+
+    def _on_search_suggestions(self, query, suggestions):
+        """把搜索引擎的建议追加在本地建议之后（只处理当前输入的结果）"""
+        if query != self._suggest_query:
+            return
+        labels = list(self._local_suggestions)
+        labels.extend(f"{s}  |  Search" for s in suggestions if s.lower() != query.lower())
+        self._show_suggestions(labels)
+
+    def _show_suggestions(self, labels):
+        self._completer_model.setStringList(labels)
+        if labels:
+            self._url_completer.complete()
+
+    def _matching_tabs(self, text, limit=3):
+        """模糊匹配其他已打开的标签页，返回 [(url, title)]，最佳匹配在前"""
+        matches = []
+        current = self.tabs.currentIndex()
+        for i in range(self.tabs.count()):
+            browser = self.tabs.widget(i)
+            if i == current or not isinstance(browser, QWebEngineView):
+                continue
+            url = browser.url().toString()
+            title = browser.page().title()
+            value = fuzzy_match.score(text, fuzzy_match.match_text(url, title))
+            if value is not None and url != "about:blank":
+                matches.append((value, url, title))
+        matches.sort(key=lambda m: m[0], reverse=True)
+        return [(url, title) for _, url, title in matches[:limit]]
 
     def _on_completer_activated(self, text):
-        """当用户从自动完成下拉列表中选择一项时，提取 URL 并导航"""
+        """当用户从自动完成下拉列表中选择一项时，提取 URL 并导航（标签页则直接切换）"""
         # 格式: "URL  |  Title  |  source"
         url = text.split("  |  ")[0].strip()
+        if text.endswith("  |  Tab"):
+            for i in range(self.tabs.count()):
+                browser = self.tabs.widget(i)
+                if isinstance(browser, QWebEngineView) and browser.url().toString() == url:
+                    self.tabs.setCurrentIndex(i)
+                    return
         self.url_bar.setText(url)
         self.navigate_to_url()
 
@@ -4309,8 +5368,11 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage(f"Restored: {title}", 2000)
 
     def closeEvent(self, event):
-        """关闭窗口时保存会话"""
+        """关闭窗口时保存会话，并写出尚未落盘的历史记录和书签"""
+        self._search_suggester.cancel()
         self._save_session()
+        HistoryManager.shutdown()
+        BookmarkManager.flush()
         event.accept()
 
 
@@ -1,30 +1,88 @@
-"""Password Manager Module - Secure password storage and auto-fill."""
+"""Password Manager Module - Secure password storage and auto-fill.
+
+密码库（vault v2）：主密码只在解锁时经 PBKDF2 派生一次主密钥（VaultKey），会话期间保存在内存中；
+每个条目用随机 nonce 经 HKDF 从主密钥派生加密/校验子密钥，加解密只需几次 HMAC。
+旧格式（每个条目各自运行 PBKDF2）在第一次解锁时一次性迁移。
+"""
 
 import base64
+import csv
+import datetime
 import hashlib
 import hmac
 import json
+import multiprocessing
 import os
 import secrets
+import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Any
 
+from url_canon import canonicalize, host_key, site_key
+
 # 使用项目根目录（src 的上级目录）作为数据文件存储路径
 _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PASSWORDS_FILE = os.path.join(_PROJECT_ROOT, "passwords.json")
 
+VAULT_VERSION = 2
+KDF_ITERATIONS = 600000  # 新建密码库时 PBKDF2 的迭代次数（保存在文件中；解锁在后台线程运行）
+LEGACY_ITERATIONS = 100000
+CRYPTO_BATCH = 500  # 批量加密（修改主密码、CSV 导入）时每个进程池任务处理的条目数
+# 条目少于这个数量时在当前线程中处理。spawn 的每个子进程都会重新导入 __main__
+# （main.py 连同 PyQt6 / QtWebEngine），启动需要约一秒；而单线程重新加密约 65 µs/条，
+# 5 万条（约 3 秒）以下进程池不会更快
+CRYPTO_POOL_MIN = 50000
+CRYPTO_MAX_WORKERS = 4  # 进程池的最大进程数（每个进程都要付出上述启动开销）
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# CSV 导入时识别的列名（Chrome: name,url,username,password,note；
+# Firefox: url,username,password,httpRealm,formActionOrigin,guid,timeCreated,...）
+CSV_URL_COLUMNS = ("url", "origin", "login_uri", "website")
+CSV_USERNAME_COLUMNS = ("username", "login", "login_username", "user")
+CSV_PASSWORD_COLUMNS = ("password", "login_password")
+CSV_EXPORT_HEADER = ("name", "url", "username", "password")
+
 # Type aliases
 PasswordRecord = dict[str, Any]
 EncryptedData = dict[str, str]
+ProgressCallback = Callable[[int, int], Any]  # (已完成, 总数)
+
+
+# 串行化对 passwords.json 的“读取-修改-写入”：后台的重新加密 / CSV 导入与界面线程的
+# 保存、删除同时进行时，后写入的一方会覆盖前者（甚至写回旧的 kdf）
+_vault_lock = threading.RLock()
 
 
 class PasswordCrypto:
-    """Simple password encryption/decryption using master password derived key + XOR."""
+    """
+    Key derivation helpers, plus the legacy (v1) per-entry scheme.
+
+    v1 的 encrypt/decrypt 为每个条目单独运行 PBKDF2，只用于迁移旧文件；新条目由 VaultKey 加密。
+    """
+
+    @staticmethod
+    def hkdf(key: bytes, info: bytes, length: int = 32, salt: bytes = b"") -> bytes:
+        """HKDF-SHA256 (RFC 5869): derive a subkey from key for the purpose named by info."""
+        prk = hmac.new(salt or bytes(32), key, hashlib.sha256).digest()
+        okm = b""
+        block = b""
+        counter = 1
+        while len(okm) < length:
+            block = hmac.new(prk, block + info + bytes([counter]), hashlib.sha256).digest()
+            okm += block
+            counter += 1
+        return okm[:length]
 
     @staticmethod
-    def derive_key(master_password: str, salt: bytes) -> bytes:
+    def derive_key(
+        master_password: str, salt: bytes, iterations: int = LEGACY_ITERATIONS
+    ) -> bytes:
         """Derive encryption key from master password."""
         return hashlib.pbkdf2_hmac(
-            "sha256", master_password.encode("utf-8"), salt, 100000
+            "sha256", master_password.encode("utf-8"), salt, iterations
         )
 
     @staticmethod
@@ -91,6 +149,156 @@ class PasswordCrypto:
             return False
 
 
+class VaultKey:
+    """
+    Master key of an unlocked vault, derived once per session.
+
+    条目格式：{"nonce": ..., "data": ..., "tag": ...}。子密钥 = HKDF(主密钥, salt=nonce)，
+    data 与 HMAC-SHA256(加密子密钥, 计数器) 生成的密钥流异或，tag 校验 nonce + data。
+    """
+
+    _CHECK_INFO = b"nanobrowser vault check"
+    _ENTRY_INFO = b"nanobrowser vault entry"
+
+    def __init__(self, key: bytes) -> None:
+        self._key = key
+
+    @classmethod
+    def derive(cls, master_password: str, kdf: dict[str, Any]) -> "VaultKey":
+        """Run PBKDF2 with the vault's salt and iteration count (the only slow step)."""
+        salt = base64.b64decode(kdf["salt"])
+        return cls(PasswordCrypto.derive_key(master_password, salt, int(kdf["iterations"])))
+
+    @staticmethod
+    def new_kdf(iterations: int | None = None) -> dict[str, Any]:
+        """Fresh KDF parameters for a new vault (the check value is added by the caller)."""
+        return {
+            "salt": base64.b64encode(secrets.token_bytes(16)).decode("ascii"),
+            "iterations": iterations or KDF_ITERATIONS,
+        }
+
+    def check_value(self) -> str:
+        """Value stored in the vault to recognise the right master password."""
+        check_key = PasswordCrypto.hkdf(self._key, self._CHECK_INFO)
+        return hmac.new(check_key, b"", hashlib.sha256).hexdigest()
+
+    def matches(self, kdf: dict[str, Any]) -> bool:
+        return hmac.compare_digest(self.check_value(), str(kdf.get("check", "")))
+
+    def _subkeys(self, nonce: bytes) -> tuple[bytes, bytes]:
+        okm = PasswordCrypto.hkdf(self._key, self._ENTRY_INFO, 64, nonce)
+        return okm[:32], okm[32:]
+
+    @staticmethod
+    def _xor_stream(enc_key: bytes, data: bytes) -> bytes:
+        stream = b"".join(
+            hmac.new(enc_key, i.to_bytes(8, "big"), hashlib.sha256).digest()
+            for i in range((len(data) + 31) // 32)
+        )[: len(data)]
+        return (int.from_bytes(data, "big") ^ int.from_bytes(stream, "big")).to_bytes(
+            len(data), "big"
+        )
+
+    def encrypt(self, plaintext: str) -> EncryptedData:
+        nonce = secrets.token_bytes(16)
+        enc_key, mac_key = self._subkeys(nonce)
+        data = self._xor_stream(enc_key, plaintext.encode("utf-8"))
+        return {
+            "nonce": base64.b64encode(nonce).decode("ascii"),
+            "data": base64.b64encode(data).decode("ascii"),
+            "tag": hmac.new(mac_key, nonce + data, hashlib.sha256).hexdigest(),
+        }
+
+    def decrypt(self, encrypted_obj: EncryptedData) -> str | None:
+        """Return None for tampered data, another vault's entries or legacy (v1) entries."""
+        try:
+            nonce = base64.b64decode(encrypted_obj["nonce"])
+            data = base64.b64decode(encrypted_obj["data"])
+            enc_key, mac_key = self._subkeys(nonce)
+            expected_tag = hmac.new(mac_key, nonce + data, hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(encrypted_obj["tag"], expected_tag):
+                return None
+            return self._xor_stream(enc_key, data).decode("utf-8")
+        except (KeyError, TypeError, ValueError, UnicodeDecodeError):
+            return None
+
+
+def _rekey_batch(
+    old_key: bytes, new_key: bytes, blobs: list[EncryptedData]
+) -> list[EncryptedData | None]:
+    """进程池任务：用旧密钥解密一批条目并用新密钥重新加密（无法解密的返回 None）"""
+    old, new = VaultKey(old_key), VaultKey(new_key)
+    result: list[EncryptedData | None] = []
+    for blob in blobs:
+        password = old.decrypt(blob)
+        result.append(None if password is None else new.encrypt(password))
+    return result
+
+
+def _encrypt_batch(key: bytes, passwords: list[str]) -> list[EncryptedData]:
+    """进程池任务：加密一批明文密码"""
+    vault_key = VaultKey(key)
+    return [vault_key.encrypt(password) for password in passwords]
+
+
+def _map_batches(
+    func: Callable[..., list],
+    args: tuple,
+    items: list,
+    progress: ProgressCallback | None = None,
+    workers: int | None = None,
+) -> list:
+    """
+    Run func(*args, batch) over items in CRYPTO_BATCH chunks and return the joined results.
+
+    条目达到 CRYPTO_POOL_MIN 且有多个 CPU 时交给 ProcessPoolExecutor（spawn：GUI 进程中
+    有多个线程，fork 不安全），绕开 GIL；进程数不超过 CRYPTO_MAX_WORKERS。
+    进程池无法启动时退回到当前线程。
+    """
+    batches = [items[i : i + CRYPTO_BATCH] for i in range(0, len(items), CRYPTO_BATCH)]
+    total = len(items)
+    results: list = []
+    if progress:
+        progress(0, total)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, CRYPTO_MAX_WORKERS, len(batches))
+    if total >= CRYPTO_POOL_MIN and workers > 1:
+        context = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(workers, mp_context=context) as executor:
+                futures = [executor.submit(func, *args, batch) for batch in batches]
+                for future in futures:
+                    results.extend(future.result())
+                    if progress:
+                        progress(len(results), total)
+            return results
+        except (BrokenProcessPool, OSError) as e:
+            print("Password crypto pool error:", e)
+            results = []
+    for batch in batches:
+        results.extend(func(*args, batch))
+        if progress:
+            progress(len(results), total)
+    return results
+
+
+def _csv_column(fieldnames: list[str], candidates: tuple[str, ...]) -> str | None:
+    lowered = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def _csv_created_at(row: dict[str, str]) -> str:
+    """Firefox 导出的 timeCreated（毫秒时间戳），没有时使用当前时间"""
+    try:
+        stamp = int(row.get("timeCreated") or "") / 1000
+        return datetime.datetime.fromtimestamp(stamp).strftime(TIME_FORMAT)
+    except (ValueError, OverflowError, OSError):
+        return datetime.datetime.now().strftime(TIME_FORMAT)
+
+
 class PasswordManager:
     """Password Manager: Save, load, delete website passwords with master password protection."""
 
@@ -98,23 +306,33 @@ class PasswordManager:
     PasswordData = dict[str, Any]
     PasswordEntry = dict[str, Any]
 
+    # 站点索引：可注册域名 (eTLD+1) -> 条目下标。只在 passwords.json 变化
+    # （文件的 inode / 修改时间 / 大小不同）时重新读取和建立，自动填充查找为 O(1)
+    _index_stamp: tuple | None = None
+    _index_data: PasswordData = {"entries": []}
+    _by_site: dict[str, list[int]] = {}
+
     @staticmethod
     def load_data() -> PasswordData:
         """
         Load password data file.
 
-        Format:
+        Format (v2):
         {
-            "master_password_hash": {"salt": "...", "hash": "..."},
+            "version": 2,
+            "kdf": {"salt": "...", "iterations": 600000, "check": "..."},
             "entries": [
                 {
                     "url": "https://example.com",
                     "username": "user@example.com",
-                    "password_encrypted": {"salt": "...", "data": "...", "tag": "..."},
+                    "password_encrypted": {"nonce": "...", "data": "...", "tag": "..."},
                     "created_at": "2026-..."
                 }, ...
             ]
         }
+
+        v1 文件用 "master_password_hash" 代替 "kdf"，条目的 password_encrypted 带 "salt"；
+        unlock() 第一次成功时迁移为 v2。
         """
         if not os.path.exists(PASSWORDS_FILE):
             return {"master_password_hash": None, "entries": []}
@@ -125,99 +343,202 @@ class PasswordManager:
             return {"master_password_hash": None, "entries": []}
 
     @staticmethod
-    def save_data(data: PasswordData) -> None:
-        """Save password data to file."""
+    def save_data(data: PasswordData) -> bool:
+        """Save password data to file (atomically, via a temporary file); return success."""
+        tmp_path = PASSWORDS_FILE + ".tmp"
         try:
-            with open(PASSWORDS_FILE, "w", encoding="utf-8") as f:
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, PASSWORDS_FILE)
         except OSError as e:
             print("Password save error:", e)
+            return False
+        return True
 
     @staticmethod
     def is_master_password_set() -> bool:
         """Check if master password has been set."""
         data = PasswordManager.load_data()
-        return data.get("master_password_hash") is not None
+        return bool(data.get("kdf")) or data.get("master_password_hash") is not None
 
     @staticmethod
-    def set_master_password(master_password: str) -> None:
-        """Set master password (first time use)."""
+    def set_master_password(master_password: str) -> VaultKey:
+        """Set master password (first time use) and return the session key."""
+        kdf = VaultKey.new_kdf()
+        key = VaultKey.derive(master_password, kdf)
+        kdf["check"] = key.check_value()
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            data.pop("master_password_hash", None)
+            data["version"] = VAULT_VERSION
+            data["kdf"] = kdf
+            data.setdefault("entries", [])
+            PasswordManager.save_data(data)
+        return key
+
+    @staticmethod
+    def unlock(master_password: str) -> VaultKey | None:
+        """
+        Derive the session key from the master password; None if it is wrong.
+
+        只运行一次 PBKDF2；返回的 VaultKey 应在会话中保留，之后的加解密都不再需要主密码。
+        """
         data = PasswordManager.load_data()
-        data["master_password_hash"] = PasswordCrypto.hash_master_password(
-            master_password
-        )
+        kdf = data.get("kdf")
+        if kdf:
+            try:
+                key = VaultKey.derive(master_password, kdf)
+            except (KeyError, TypeError, ValueError):
+                return None
+            return key if key.matches(kdf) else None
+        stored = data.get("master_password_hash")
+        if stored is None or not PasswordCrypto.verify_master_password(master_password, stored):
+            return None
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            if data.get("kdf"):
+                # 另一个线程已经完成了迁移
+                return PasswordManager.unlock(master_password)
+            return PasswordManager._migrate(data, master_password)
+
+    @staticmethod
+    def _migrate(data: PasswordData, master_password: str) -> VaultKey:
+        """一次性把 v1 条目解密后用新的会话密钥重新加密（无法解密的条目保持原样）"""
+        kdf = VaultKey.new_kdf()
+        key = VaultKey.derive(master_password, kdf)
+        kdf["check"] = key.check_value()
+        for entry in data.get("entries", []):
+            encrypted = entry.get("password_encrypted", {})
+            if "salt" not in encrypted:
+                continue
+            password = PasswordCrypto.decrypt(encrypted, master_password)
+            if password is not None:
+                entry["password_encrypted"] = key.encrypt(password)
+        data.pop("master_password_hash", None)
+        data["version"] = VAULT_VERSION
+        data["kdf"] = kdf
         PasswordManager.save_data(data)
+        return key
+
+    @staticmethod
+    def _session_key(key: "VaultKey | str") -> VaultKey | None:
+        """兼容旧调用：传入主密码字符串时临时解锁（每次调用都会运行 PBKDF2）"""
+        if isinstance(key, VaultKey):
+            return key
+        return PasswordManager.unlock(key)
 
     @staticmethod
     def verify_master_password(master_password: str) -> bool:
         """Verify master password."""
-        data = PasswordManager.load_data()
-        stored = data.get("master_password_hash")
-        if stored is None:
-            return False
-        return PasswordCrypto.verify_master_password(master_password, stored)
+        return PasswordManager.unlock(master_password) is not None
 
     @staticmethod
-    def save_password(url: str, username: str, password: str, master_password: str) -> None:
-        """Save a website password (encrypted with master password)."""
-        import datetime
+    def decrypt_entry(entry: PasswordEntry, key: VaultKey) -> str | None:
+        """Decrypt the password of one raw entry from load_data()."""
+        return key.decrypt(entry.get("password_encrypted", {}))
 
-        data = PasswordManager.load_data()
-        entries = data.get("entries", [])
-        # 检查是否已有该网站+用户名的记录，有则更新
-        encrypted = PasswordCrypto.encrypt(password, master_password)
-        for entry in entries:
-            if entry["url"] == url and entry["username"] == username:
-                entry["password_encrypted"] = encrypted
-                entry["updated_at"] = datetime.datetime.now().strftime(
-                    "%Y-%m-%d %H:%M:%S"
+    @staticmethod
+    def _check_key(key: VaultKey, data: PasswordData | None = None) -> None:
+        """
+        Raise ValueError unless the vault (data, or the file) is still keyed by key.
+
+        在 _vault_lock 中、写入之前调用：主密码在此期间被修改（如另一个浏览器进程）时，
+        用旧密钥加密的条目不能写进新的密码库。
+        """
+        if data is None:
+            data = PasswordManager.load_data()
+        kdf = data.get("kdf")
+        if not kdf or not key.matches(kdf):
+            raise ValueError("The vault is locked with a different master password.")
+
+    @staticmethod
+    def save_password(url: str, username: str, password: str, key: "VaultKey | str") -> bool:
+        """
+        Save a website password (encrypted with the session key); return success.
+
+        会话密钥已不是密码库当前的密钥（主密码已被修改）时不保存，返回 False。
+        """
+        key = PasswordManager._session_key(key)
+        if key is None:
+            return False
+        encrypted = key.encrypt(password)
+        canonical_url = canonicalize(url)
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            try:
+                PasswordManager._check_key(key, data)
+            except ValueError:
+                return False
+            entries = data.setdefault("entries", [])
+            # 检查是否已有该网站+用户名的记录，有则更新
+            for entry in entries:
+                if canonicalize(entry["url"]) == canonical_url and entry["username"] == username:
+                    entry["password_encrypted"] = encrypted
+                    entry["updated_at"] = datetime.datetime.now().strftime(TIME_FORMAT)
+                    break
+            else:
+                # 新增
+                entries.append(
+                    {
+                        "url": url,
+                        "username": username,
+                        "password_encrypted": encrypted,
+                        "created_at": datetime.datetime.now().strftime(TIME_FORMAT),
+                    }
                 )
-                PasswordManager.save_data(data)
-                return
-        # 新增
-        entries.append(
-            {
-                "url": url,
-                "username": username,
-                "password_encrypted": encrypted,
-                "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            }
-        )
-        data["entries"] = entries
-        PasswordManager.save_data(data)
+            return PasswordManager.save_data(data)
 
     @staticmethod
-    def get_passwords_for_url(url: str, master_password: str) -> list:
+    def get_passwords_for_url(url: str, key: "VaultKey | str") -> list:
         """获取某个 URL 的所有保存密码（解密后返回）"""
-        from urllib.parse import urlparse
-
-        data = PasswordManager.load_data()
+        key = PasswordManager._session_key(key)
+        if key is None:
+            return []
+        data, by_site = PasswordManager._site_index()
         entries = data.get("entries", [])
-        # 用域名匹配
-        try:
-            target_domain = urlparse(url).netloc.lower()
-        except Exception:
-            target_domain = url.lower()
+        # 同一可注册域名的条目共享（login.example.com 与 www.example.com），主机名完全相同的排在前面
+        target_host = host_key(url)
+        ids = sorted(
+            by_site.get(site_key(url), ()),
+            key=lambda i: host_key(entries[i]["url"]) != target_host,
+        )
         results = []
-        for entry in entries:
-            try:
-                entry_domain = urlparse(entry["url"]).netloc.lower()
-            except Exception:
-                entry_domain = entry["url"].lower()
-            if entry_domain == target_domain:
-                decrypted = PasswordCrypto.decrypt(
-                    entry["password_encrypted"], master_password
+        for i in ids:
+            entry = entries[i]
+            decrypted = PasswordManager.decrypt_entry(entry, key)
+            if decrypted is not None:
+                results.append(
+                    {
+                        "url": entry["url"],
+                        "username": entry["username"],
+                        "password": decrypted,
+                    }
                 )
-                if decrypted is not None:
-                    results.append(
-                        {
-                            "url": entry["url"],
-                            "username": entry["username"],
-                            "password": decrypted,
-                        }
-                    )
         return results
 
+    @staticmethod
+    def _file_stamp() -> tuple:
+        try:
+            st = os.stat(PASSWORDS_FILE)
+        except OSError:
+            return (PASSWORDS_FILE, None)
+        # save_data 通过 os.replace 写入，每次保存都会得到新的 inode
+        return (PASSWORDS_FILE, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _site_index() -> tuple[PasswordData, dict[str, list[int]]]:
+        """返回 (数据, 站点索引)；文件没有变化时直接使用内存中的结果（调用方不能修改）"""
+        stamp = PasswordManager._file_stamp()
+        if stamp != PasswordManager._index_stamp:
+            data = PasswordManager.load_data()
+            by_site: dict[str, list[int]] = {}
+            for i, entry in enumerate(data.get("entries", [])):
+                by_site.setdefault(site_key(entry.get("url", "")), []).append(i)
+            PasswordManager._index_data = data
+            PasswordManager._by_site = by_site
+            PasswordManager._index_stamp = stamp
+        return PasswordManager._index_data, PasswordManager._by_site
+
     @staticmethod
     def get_all_entries() -> list:
         """获取所有条目（不含解密密码，只有元数据）"""
@@ -235,16 +556,165 @@ class PasswordManager:
     @staticmethod
     def delete_password(url: str, username: str):
         """删除一个保存的密码"""
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            entries = data.get("entries", [])
+            data["entries"] = [
+                e for e in entries if not (e["url"] == url and e["username"] == username)
+            ]
+            PasswordManager.save_data(data)
+
+    @staticmethod
+    def change_master_password(
+        key: VaultKey,
+        new_master_password: str,
+        progress: ProgressCallback | None = None,
+        workers: int | None = None,
+    ) -> VaultKey:
+        """
+        Re-encrypt the whole vault under a new master password and return the new session key.
+
+        新主密码只运行一次 PBKDF2（使用当前的 KDF_ITERATIONS）；条目较多时分批在
+        进程池中重新加密（_map_batches）。全部完成后才原子地写入新文件，
+        中途失败时旧文件保持不变。无法用旧密钥解密的条目原样保留。
+        整个过程持有 _vault_lock，期间其他写入（保存、导入、删除）等待完成后再读取新文件。
+        """
+        new_kdf = VaultKey.new_kdf()
+        new_key = VaultKey.derive(new_master_password, new_kdf)
+        new_kdf["check"] = new_key.check_value()
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            PasswordManager._check_key(key, data)
+            entries = data.get("entries", [])
+            blobs = [entry.get("password_encrypted", {}) for entry in entries]
+            results = _map_batches(
+                _rekey_batch, (key._key, new_key._key), blobs, progress, workers
+            )
+            for entry, encrypted in zip(entries, results, strict=True):
+                if encrypted is not None:
+                    entry["password_encrypted"] = encrypted
+            data["version"] = VAULT_VERSION
+            data["kdf"] = new_kdf
+            PasswordManager._check_key(key)
+            if not PasswordManager.save_data(data):
+                raise OSError("Could not write the re-encrypted vault.")
+        return new_key
+
+    @staticmethod
+    def import_csv(
+        filepath: str,
+        key: VaultKey,
+        progress: ProgressCallback | None = None,
+        workers: int | None = None,
+    ) -> int:
+        """
+        Import logins from a Chrome/Firefox password CSV export; return the number imported.
+
+        逐行读取 CSV，按 (可注册域名, 用户名) 的哈希索引去重（CSV 中后出现的行、
+        已保存的同一账号都以新密码为准），在进程池中批量加密后只写一次文件。
+        progress 报告加密进度。缺少 URL 或密码列、或 CSV 格式错误时抛出 ValueError。
+        """
+        PasswordManager._check_key(key)
+        rows: dict[tuple[str, str], tuple[str, str, str, str]] = {}
+        try:
+            with open(filepath, encoding="utf-8-sig", newline="") as f:
+                reader = csv.DictReader(f)
+                fieldnames = reader.fieldnames or []
+                url_col = _csv_column(fieldnames, CSV_URL_COLUMNS)
+                user_col = _csv_column(fieldnames, CSV_USERNAME_COLUMNS)
+                password_col = _csv_column(fieldnames, CSV_PASSWORD_COLUMNS)
+                if url_col is None or password_col is None:
+                    raise ValueError("Not a password CSV file (missing url or password column).")
+                for row in reader:
+                    url = (row.get(url_col) or "").strip()
+                    password = row.get(password_col) or ""
+                    if not url or not password:
+                        continue
+                    username = (row.get(user_col) or "") if user_col else ""
+                    dedupe_key = (site_key(url), username)
+                    rows.pop(dedupe_key, None)  # 后出现的行排在最后
+                    rows[dedupe_key] = (url, username, password, _csv_created_at(row))
+        except csv.Error as e:
+            # 如字段超过 csv.field_size_limit()
+            raise ValueError(f"Not a valid password CSV file: {e}") from e
+
+        imported = list(rows.items())
+        encrypted = _map_batches(
+            _encrypt_batch, (key._key,), [row[2] for _, row in imported], progress, workers
+        )
+        if not imported:
+            return 0
+        now = datetime.datetime.now().strftime(TIME_FORMAT)
+        # 加密期间主密码可能已被修改：在锁中重新读取文件并确认 kdf 没有变化再合并
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            PasswordManager._check_key(key, data)
+            entries = data.setdefault("entries", [])
+            index = {
+                (site_key(entry.get("url", "")), entry.get("username", "")): i
+                for i, entry in enumerate(entries)
+            }
+            for (dedupe_key, (url, username, _, created_at)), blob in zip(
+                imported, encrypted, strict=True
+            ):
+                i = index.get(dedupe_key)
+                if i is not None:
+                    entries[i]["password_encrypted"] = blob
+                    entries[i]["updated_at"] = now
+                else:
+                    index[dedupe_key] = len(entries)
+                    entries.append(
+                        {
+                            "url": url,
+                            "username": username,
+                            "password_encrypted": blob,
+                            "created_at": created_at,
+                        }
+                    )
+            if not PasswordManager.save_data(data):
+                raise OSError("Could not write the password vault.")
+        return len(imported)
+
+    @staticmethod
+    def export_csv(filepath: str, key: VaultKey) -> int:
+        """
+        Export all decryptable logins as a Chrome-style CSV (name,url,username,password).
+
+        逐条解密并写入临时文件，完成后原子地替换目标文件；返回导出的条目数。
+        注意导出的文件是明文：临时文件由 mkstemp 在目标目录中以唯一的名称、0o600 权限创建，
+        失败时删除。
+        """
         data = PasswordManager.load_data()
-        entries = data.get("entries", [])
-        data["entries"] = [
-            e for e in entries if not (e["url"] == url and e["username"] == username)
-        ]
-        PasswordManager.save_data(data)
+        count = 0
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(filepath) or ".",
+            prefix=os.path.basename(filepath) + ".",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_EXPORT_HEADER)
+                for entry in data.get("entries", []):
+                    password = PasswordManager.decrypt_entry(entry, key)
+                    if password is None:
+                        continue
+                    url = entry.get("url", "")
+                    writer.writerow((host_key(url), url, entry.get("username", ""), password))
+                    count += 1
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return count
 
     @staticmethod
     def delete_all():
         """删除所有保存的密码（保留主密码哈希）"""
-        data = PasswordManager.load_data()
-        data["entries"] = []
-        PasswordManager.save_data(data)
+        with _vault_lock:
+            data = PasswordManager.load_data()
+            data["entries"] = []
+            PasswordManager.save_data(data)
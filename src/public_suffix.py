@@ -0,0 +1,123 @@
+"""Public Suffix Module - Registrable domains (eTLD+1) for matching sites.
+
+login.example.com 与 www.example.com 属于同一个可注册域名 example.com，
+而 alice.github.io 与 bob.github.io 是不同的站点（github.io 是公共后缀）。
+
+规则采用 Public Suffix List 的格式（普通规则、"*." 通配规则、"!" 例外规则）：
+- 项目根目录下有 public_suffix_list.dat（从 publicsuffix.org 下载的完整列表）时使用它
+- 否则使用内置的常见多级后缀；未列出的顶级域名按默认规则 "*" 处理
+规则第一次使用时编译为按反序标签存储的集合，查找只需对主机名的每一级做一次集合查询，
+结果用 lru_cache 缓存。
+"""
+
+import os
+from functools import lru_cache
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUBLIC_SUFFIX_FILE = os.path.join(_PROJECT_ROOT, "public_suffix_list.dat")
+
+CACHE_SIZE = 8192
+
+# 内置的常见多级公共后缀（Public Suffix List 的子集，包括常见的托管平台）
+BUILTIN_RULES = """
+// 英国、澳大利亚、新西兰、南非
+ac.uk co.uk gov.uk ltd.uk me.uk net.uk nhs.uk org.uk plc.uk sch.uk
+asn.au com.au edu.au gov.au id.au net.au org.au
+ac.nz co.nz geek.nz govt.nz net.nz org.nz school.nz
+ac.za co.za gov.za net.za org.za
+// 东亚
+ac.jp ad.jp co.jp ed.jp go.jp gr.jp lg.jp ne.jp or.jp
+ac.cn com.cn edu.cn gov.cn net.cn org.cn
+com.hk edu.hk gov.hk net.hk org.hk
+com.tw edu.tw gov.tw idv.tw net.tw org.tw
+ac.kr co.kr go.kr ne.kr or.kr re.kr
+// 东南亚、南亚
+com.sg edu.sg gov.sg net.sg org.sg
+com.my edu.my gov.my net.my org.my
+ac.th co.th go.th in.th or.th
+ac.id co.id go.id or.id web.id
+com.ph com.vn com.pk
+ac.in co.in edu.in firm.in gen.in gov.in ind.in net.in org.in
+// 美洲、欧洲、中东
+com.ar com.br edu.br gov.br net.br org.br com.co com.mx edu.mx gob.mx org.mx com.pe
+com.tr edu.tr gov.tr org.tr com.ua ac.il co.il org.il com.sa com.eg
+*.bd *.ck *.er *.fk *.jm *.kh *.mm *.np *.pg
+!www.ck
+// 托管平台：每个子域名是不同的站点
+github.io gitlab.io blogspot.com appspot.com herokuapp.com firebaseapp.com web.app
+netlify.app vercel.app pages.dev workers.dev azurewebsites.net cloudfront.net
+"""
+
+# 编译后的规则：反序标签元组的集合
+Rules = tuple[frozenset[tuple[str, ...]], frozenset[tuple[str, ...]], frozenset[tuple[str, ...]]]
+_rules: Rules | None = None
+
+
+def compile_rules(text: str) -> Rules:
+    """Compile PSL-formatted text into (suffixes, wildcards, exceptions)."""
+    suffixes = set()
+    wildcards = set()
+    exceptions = set()
+    for line in text.splitlines():
+        line = line.split("//", 1)[0]
+        for rule in line.split():
+            rule = rule.lower()
+            if rule.startswith("!"):
+                exceptions.add(tuple(reversed(rule[1:].split("."))))
+            elif rule.startswith("*."):
+                wildcards.add(tuple(reversed(rule[2:].split("."))))
+            else:
+                suffixes.add(tuple(reversed(rule.split("."))))
+    return frozenset(suffixes), frozenset(wildcards), frozenset(exceptions)
+
+
+def _get_rules() -> Rules:
+    global _rules
+    if _rules is None:
+        text = BUILTIN_RULES
+        if os.path.exists(PUBLIC_SUFFIX_FILE):
+            try:
+                with open(PUBLIC_SUFFIX_FILE, encoding="utf-8") as f:
+                    text = f.read()
+            except OSError as e:
+                print("Public suffix list error:", e)
+        _rules = compile_rules(text)
+    return _rules
+
+
+def set_rules(text: str | None) -> None:
+    """Replace the rules (None: reload them on next use) and clear the lookup cache."""
+    global _rules
+    _rules = None if text is None else compile_rules(text)
+    registrable_domain.cache_clear()
+
+
+def _suffix_length(labels: tuple[str, ...]) -> int:
+    """Number of labels in the public suffix of the reversed host labels."""
+    suffixes, wildcards, exceptions = _get_rules()
+    length = 1  # 默认规则 "*"
+    for i in range(1, len(labels) + 1):
+        key = labels[:i]
+        if key in exceptions:
+            return i - 1
+        if key in suffixes:
+            length = max(length, i)
+        if key in wildcards and i < len(labels):
+            length = max(length, i + 1)
+    return length
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def registrable_domain(host: str) -> str:
+    """
+    Return the registrable domain (eTLD+1) of a canonical host name.
+
+    IP 地址、单级主机名（localhost）以及本身就是公共后缀的主机名原样返回。
+    """
+    if not host or ":" in host or "." not in host or host.replace(".", "").isdigit():
+        return host
+    labels = tuple(reversed(host.split(".")))
+    length = _suffix_length(labels)
+    if length >= len(labels):
+        return host
+    return ".".join(reversed(labels[: length + 1]))
@@ -0,0 +1,208 @@
+"""Search Suggest Module - Query suggestions from the selected search engine.
+
+地址栏输入时向搜索引擎的 OpenSearch 建议接口请求补全词：
+- 防抖：最后一次按键 SUGGEST_DELAY 秒后才发出请求
+- 取消：新输入会取消尚未返回的旧请求（直接关闭其连接），过期结果不会回调
+- 缓存：(接口, 输入) -> 建议列表的 LRU，条目 CACHE_TTL 秒后过期；
+  退格后重新输入相同内容时直接命中缓存，不再发请求
+
+请求在后台线程中执行，回调也在后台线程中调用，GUI 需要自行切回主线程
+（例如通过 Qt 信号）。
+"""
+
+import http.client
+import json
+import socket
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import quote, urlsplit
+
+# Type aliases
+SuggestCallback = Callable[[str, list[str]], Any]  # (输入, 建议列表)
+
+SUGGEST_DELAY = 0.15
+FETCH_TIMEOUT = 3.0
+CACHE_SIZE = 256
+CACHE_TTL = 300.0
+MAX_SUGGESTIONS = 8
+USER_AGENT = "NanoBrowser"
+
+
+def parse_opensearch(body: bytes, charset: str = "utf-8") -> list[str]:
+    """Parse an OpenSearch suggestions response: ["query", ["s1", "s2", ...], ...]."""
+    try:
+        data = json.loads(body.decode(charset, errors="replace"))
+    except (LookupError, ValueError):
+        return []
+    if not isinstance(data, list) or len(data) < 2 or not isinstance(data[1], list):
+        return []
+    return [s for s in data[1] if isinstance(s, str) and s][:MAX_SUGGESTIONS]
+
+
+class SuggestionCache:
+    """LRU of suggestion lists whose entries expire after ttl seconds."""
+
+    def __init__(
+        self,
+        max_size: int = CACHE_SIZE,
+        ttl: float = CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Any, tuple[float, list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any) -> list[str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Any, suggestions: list[str]) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self._ttl, suggestions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SuggestRequest:
+    """One suggestion fetch whose connection can be closed from another thread."""
+
+    def __init__(self, url: str, timeout: float = FETCH_TIMEOUT) -> None:
+        self.url = url
+        self.timeout = timeout
+        self._conn: http.client.HTTPConnection | None = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            conn = self._conn
+        sock = conn.sock if conn is not None else None
+        if sock is not None:
+            # shutdown 会唤醒阻塞在 recv 上的后台线程（仅 close 不会）
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def fetch(self) -> list[str] | None:
+        """Return the suggestions, or None if the request failed or was cancelled."""
+        parts = urlsplit(self.url)
+        conn_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        with self._lock:
+            if self._cancelled:
+                return None
+            self._conn = conn_class(parts.netloc, timeout=self.timeout)
+        try:
+            self._conn.request("GET", path, headers={"User-Agent": USER_AGENT})
+            resp = self._conn.getresponse()
+            body = resp.read()
+            if resp.status != 200:
+                return None
+            charset = resp.headers.get_content_charset() or "utf-8"
+        except (OSError, http.client.HTTPException, AttributeError) as e:
+            # 取消时连接被关闭，这里的异常是预期的
+            if not self._cancelled:
+                print("Search suggest error:", e)
+            return None
+        finally:
+            self._conn.close()
+        return None if self._cancelled else parse_opensearch(body, charset)
+
+
+class SearchSuggester:
+    """
+    Debounced, cancellable suggestion fetching with a TTL-bounded LRU cache.
+
+    request() 可以在每次按键时调用；只有最后一次输入的结果会通过 callback 返回。
+    """
+
+    def __init__(
+        self,
+        callback: SuggestCallback,
+        delay: float = SUGGEST_DELAY,
+        cache: SuggestionCache | None = None,
+        timeout: float = FETCH_TIMEOUT,
+    ) -> None:
+        self._callback = callback
+        self._delay = delay
+        self._timeout = timeout
+        self.cache = cache if cache is not None else SuggestionCache()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._timer: threading.Timer | None = None
+        self._active: SuggestRequest | None = None
+
+    def request(self, template: str | None, text: str) -> None:
+        """
+        Ask for suggestions for text from the endpoint template (URL with "{}").
+
+        命中缓存时立即在当前线程回调；否则等待防抖延时后在后台线程请求。
+        """
+        text = text.strip()
+        self.cancel()
+        if not template or not text:
+            return
+        cached = self.cache.get((template, text))
+        if cached is not None:
+            self._callback(text, cached)
+            return
+        with self._lock:
+            timer = threading.Timer(self._delay, self._fetch, (self._generation, template, text))
+            timer.daemon = True
+            self._timer = timer
+        timer.start()
+
+    def cancel(self) -> None:
+        """Drop the pending request and close the one in flight."""
+        with self._lock:
+            self._generation += 1
+            timer, self._timer = self._timer, None
+            active, self._active = self._active, None
+        if timer is not None:
+            timer.cancel()
+        if active is not None:
+            active.cancel()
+
+    def _fetch(self, generation: int, template: str, text: str) -> None:
+        request = SuggestRequest(template.format(quote(text)), self._timeout)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._active = request
+        suggestions = request.fetch()
+        if suggestions is None:
+            return
+        # 恰好在新输入之前完成的结果同样放入缓存，退格回到这个输入时可以直接使用
+        self.cache.put((template, text), suggestions)
+        with self._lock:
+            if self._active is request:
+                self._active = None
+            if generation != self._generation:
+                return
+        self._callback(text, suggestions)
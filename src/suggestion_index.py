@@ -0,0 +1,340 @@
+"""Suggestion Index Module - In-memory ranked index for address bar completion.
+
+历史记录与书签中的每个 URL 是一个条目，按以下键 (key) 索引，查询词按前缀匹配：
+- 去掉 scheme 的 URL，以及从每一级域名开始的后缀（mail.google.com/x 也能用 "google" 匹配）
+- 路径中的各段
+- 标题的词元（与历史全文索引相同的切分规则）
+
+排序分数是 frecency（对数形式，见 frecency 模块），书签额外加上 BOOKMARK_BONUS 次访问。
+键保存在有序列表中，一个前缀对应其中连续的一段（二分查找定位）。
+查询过的前缀会缓存排名前 TOP_CACHE 的条目；新访问只会让分数增加，
+因此这些缓存可以就地更新，连续输入、退格时的重复前缀无需重新扫描。
+前缀匹配不足 k 条时，用 fuzzy_match 的模糊匹配（缩写、相邻字符写反）补足。
+每次按键都只访问内存，不读文件。
+"""
+
+import bisect
+import heapq
+import math
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import frecency
+from fuzzy_match import FuzzyIndex, match_text
+from history_index import tokenize
+from url_canon import canonicalize
+
+# Type aliases
+Suggestion = dict[str, Any]
+
+# 构建时从历史中取 frecency 最高的 URL 数量
+SUGGESTION_HISTORY_LIMIT = 5000
+TOP_CACHE = 32
+MAX_CACHED_PREFIXES = 4096
+MAX_ESTIMATE_KEYS = 256
+BOOKMARK_BONUS = 5  # 书签相当于额外的访问次数
+
+
+def url_keys(url: str, title: str) -> set[str]:
+    """Index keys for a URL and its title."""
+    keys = tokenize(title)
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return keys | {url.lower()}
+    host = (parts.hostname or "").lower()
+    rest = parts.path + ("?" + parts.query if parts.query else "")
+    labels = host.split(".")
+    # 只有一级（如 localhost）时也要保留主机名本身
+    for i in range(max(len(labels) - 1, 1)):
+        keys.add(".".join(labels[i:]) + rest.lower())
+    keys.update(segment.lower() for segment in parts.path.split("/") if segment)
+    if not host:
+        keys.add(url.lower())
+    return keys
+
+
+def query_terms(text: str) -> list[str]:
+    """Split address bar input into prefix terms (non-ASCII words per character)."""
+    terms = []
+    for word in text.lower().split():
+        if word.isascii():
+            terms.append(word)
+        else:
+            terms.extend(sorted(tokenize(word)))
+    return terms
+
+
+class SuggestionIndex:
+    """Ranked prefix index over visited and bookmarked URLs."""
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def _reset(self) -> None:
+        self._docs: list[Suggestion | None] = []
+        self._doc_keys: list[set[str]] = []
+        self._doc_ids: dict[str, int] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._sorted_keys: list[str] = []
+        # 查询过的前缀 -> 按分数降序的条目 id（最多 TOP_CACHE 个）
+        self._prefix_top: dict[str, list[int]] = {}
+        self._bulk = False
+        self._now_weight = frecency.visit_weight(time.time())
+        self._bookmark_weight = self._now_weight + math.log(BOOKMARK_BONUS)
+        self._fuzzy = FuzzyIndex()
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def build(self, sites: list[dict[str, Any]], bookmarks: list[dict[str, Any]]) -> None:
+        """
+        Rebuild from history aggregates and a flat bookmark list.
+
+        Args:
+            sites: HistoryManager.get_top_sites() 的结果（frecency 为当前时刻的分数）
+            bookmarks: BookmarkManager.get_all_bookmarks_flat() 的结果
+        """
+        self._reset()
+        # 批量构建时先收集键，最后统一排序
+        self._bulk = True
+        now = time.time()
+        for site in sites:
+            current = site.get("frecency") or 0.0
+            score = frecency.visit_weight(now) + math.log(max(current, 1e-300))
+            self._update(site.get("url", ""), site.get("title", ""), history=score)
+        self.sync_bookmarks(bookmarks)
+        self._bulk = False
+        self._sorted_keys = sorted(self._postings)
+
+    def add_visit(self, url: str, title: str = "", timestamp: float | None = None) -> None:
+        """Account for one new visit in place."""
+        doc_id = self._doc_ids.get(canonicalize(url))
+        previous = self._docs[doc_id]["history"] if doc_id is not None else None
+        score = frecency.add_visit(previous, time.time() if timestamp is None else timestamp)
+        self._update(url, title, history=score)
+
+    def sync_bookmarks(self, bookmarks: list[dict[str, Any]]) -> None:
+        """Make the bookmark flags match bookmarks (a flat list), changing only the differences."""
+        wanted = {}
+        for item in bookmarks:
+            if item.get("url"):
+                wanted[canonicalize(item["url"])] = item
+        for url, doc_id in list(self._doc_ids.items()):
+            if self._docs[doc_id]["bookmark"] and url not in wanted:
+                self._unbookmark(url)
+        for url, item in wanted.items():
+            doc_id = self._doc_ids.get(url)
+            if doc_id is None or not self._docs[doc_id]["bookmark"]:
+                self._update(item["url"], item.get("title", ""), bookmark=True)
+
+    def set_bookmark(self, url: str, title: str = "", bookmarked: bool = True) -> None:
+        """Set or clear the bookmark flag of one URL (a bookmark added, edited or removed)."""
+        canonical = canonicalize(url)
+        doc_id = self._doc_ids.get(canonical)
+        if bookmarked:
+            doc = self._docs[doc_id] if doc_id is not None else None
+            if doc is None or not doc["bookmark"] or (title and title != doc["title"]):
+                self._update(url, title, bookmark=True)
+        elif doc_id is not None and self._docs[doc_id]["bookmark"]:
+            self._unbookmark(canonical)
+
+    def clear_history(self) -> None:
+        """Forget all visit data, keeping bookmarks."""
+        bookmarks = [doc for doc in self._docs if doc is not None and doc["bookmark"]]
+        self.build([], bookmarks)
+
+    def query(self, text: str, k: int = 10) -> list[Suggestion]:
+        """Return up to k entries: prefix matches of every term first, then fuzzy matches."""
+        terms = query_terms(text)
+        if not terms:
+            return []
+        # 从匹配条目最少的词开始，其余词只用来过滤
+        primary = terms[0]
+        if len(terms) > 1:
+            best = math.inf
+            for term in terms:
+                size = self._estimate(term, best)
+                if size < best:
+                    primary, best = term, size
+        others = [t for t in terms if t is not primary]
+
+        top = self._top_for_prefix(primary)
+        result = [d for d in top if self._matches_all(d, others)][:k]
+        if len(result) < k and len(top) == TOP_CACHE:
+            # 其余查询词过滤掉了太多缓存条目，退回对各词的匹配集合求交集
+            candidates = self._prefix_docs(primary)
+            for term in others:
+                candidates &= self._prefix_docs(term)
+            result = heapq.nlargest(k, candidates, key=self._rank)
+        if len(result) < k:
+            for _, doc_id in self._fuzzy.search(text, k):
+                if doc_id not in result:
+                    result.append(doc_id)
+                    if len(result) == k:
+                        break
+        return [dict(self._docs[d]) for d in result]
+
+    # ---- 内部辅助方法 ----
+
+    def _update(
+        self,
+        url: str,
+        title: str,
+        history: float | None = None,
+        bookmark: bool = False,
+    ) -> None:
+        canonical = canonicalize(url)
+        if not canonical:
+            return
+        doc_id = self._doc_ids.get(canonical)
+        if doc_id is None:
+            doc_id = len(self._docs)
+            self._doc_ids[canonical] = doc_id
+            self._docs.append(
+                {
+                    "url": canonical,
+                    "title": "",
+                    "history": None,
+                    "bookmark": False,
+                    "score": -math.inf,
+                }
+            )
+            self._doc_keys.append(set())
+        doc = self._docs[doc_id]
+        if history is not None:
+            doc["history"] = history
+        doc["bookmark"] = doc["bookmark"] or bookmark
+        if title and title != doc["title"]:
+            doc["title"] = title
+            self._set_keys(doc_id, url_keys(canonical, title))
+        elif not self._doc_keys[doc_id]:
+            self._set_keys(doc_id, url_keys(canonical, doc["title"]))
+        self._rescore(doc_id)
+        self._fuzzy.add(
+            canonical, match_text(canonical, doc["title"]), self._fuzzy_weight(doc), doc_id
+        )
+
+    def _rescore(self, doc_id: int) -> None:
+        doc = self._docs[doc_id]
+        old = doc["score"]
+        score = doc["history"]
+        if doc["bookmark"]:
+            score = frecency.log_add(score, self._bookmark_weight)
+        doc["score"] = -math.inf if score is None else score
+        self._fuzzy.set_weight(doc["url"], self._fuzzy_weight(doc))
+        if self._bulk:
+            return
+        if doc["score"] >= old:
+            self._promote(doc_id)
+        else:
+            self._invalidate_prefixes(self._doc_keys[doc_id])
+
+    def _set_keys(self, doc_id: int, keys: set[str]) -> None:
+        old_keys = self._doc_keys[doc_id]
+        removed = old_keys - keys
+        for key in removed:
+            self._postings[key].discard(doc_id)
+        self._invalidate_prefixes(removed)
+        for key in keys - old_keys:
+            posting = self._postings.get(key)
+            if posting is None:
+                posting = self._postings[key] = set()
+                if not self._bulk:
+                    bisect.insort(self._sorted_keys, key)
+            posting.add(doc_id)
+        self._doc_keys[doc_id] = keys
+        # 新增的键可能让条目进入某些前缀的排名
+        if not self._bulk:
+            self._promote(doc_id)
+
+    def _unbookmark(self, url: str) -> None:
+        doc_id = self._doc_ids[url]
+        doc = self._docs[doc_id]
+        if doc["history"] is None:
+            self._remove(url)
+        else:
+            doc["bookmark"] = False
+            self._rescore(doc_id)
+
+    def _remove(self, url: str) -> None:
+        doc_id = self._doc_ids.pop(url)
+        for key in self._doc_keys[doc_id]:
+            self._postings[key].discard(doc_id)
+        self._invalidate_prefixes(self._doc_keys[doc_id])
+        self._doc_keys[doc_id] = set()
+        self._docs[doc_id] = None
+        self._fuzzy.remove(url)
+
+    def _promote(self, doc_id: int) -> None:
+        """Insert or move doc_id in every cached prefix ranking it belongs to."""
+        rank = self._docs[doc_id]["score"]
+        for prefix in self._cached_prefixes(self._doc_keys[doc_id]):
+            top = self._prefix_top[prefix]
+            if doc_id in top:
+                top.remove(doc_id)
+            elif len(top) >= TOP_CACHE and rank <= self._rank(top[-1]):
+                continue
+            bisect.insort(top, doc_id, key=lambda d: -self._rank(d))
+            del top[TOP_CACHE:]
+
+    def _invalidate_prefixes(self, keys: set[str]) -> None:
+        for prefix in self._cached_prefixes(keys):
+            del self._prefix_top[prefix]
+
+    def _top_for_prefix(self, prefix: str) -> list[int]:
+        top = self._prefix_top.get(prefix)
+        if top is None:
+            top = heapq.nlargest(TOP_CACHE, self._prefix_docs(prefix), key=self._rank)
+            if len(self._prefix_top) >= MAX_CACHED_PREFIXES:
+                self._prefix_top.clear()
+            self._prefix_top[prefix] = top
+        return top
+
+    def _prefix_docs(self, prefix: str) -> set[int]:
+        """Entries with at least one key starting with prefix."""
+        result = set()
+        i = bisect.bisect_left(self._sorted_keys, prefix)
+        while i < len(self._sorted_keys) and self._sorted_keys[i].startswith(prefix):
+            result |= self._postings[self._sorted_keys[i]]
+            i += 1
+        return result
+
+    def _estimate(self, prefix: str, limit: float) -> float:
+        """
+        Upper bound on the entries matching prefix.
+
+        超过 limit 或需要扫描的键超过 MAX_ESTIMATE_KEYS 个时直接返回 limit，估算本身保持廉价。
+        """
+        size = 0
+        i = bisect.bisect_left(self._sorted_keys, prefix)
+        end = min(i + MAX_ESTIMATE_KEYS, len(self._sorted_keys))
+        while i < len(self._sorted_keys) and self._sorted_keys[i].startswith(prefix):
+            size += len(self._postings[self._sorted_keys[i]])
+            i += 1
+            if size >= limit or i >= end:
+                return limit
+        return size
+
+    def _matches_all(self, doc_id: int, terms: list[str]) -> bool:
+        keys = self._doc_keys[doc_id]
+        return all(any(key.startswith(term) for key in keys) for term in terms)
+
+    def _fuzzy_weight(self, doc: Suggestion) -> float:
+        """log(1 + current frecency), comparable to the fuzzy match score."""
+        return math.log1p(math.exp(min(doc["score"] - self._now_weight, 50.0)))
+
+    def _rank(self, doc_id: int) -> float:
+        return self._docs[doc_id]["score"]
+
+    def _cached_prefixes(self, keys: set[str]) -> set[str]:
+        """Prefixes of keys that currently have a cached ranking."""
+        if not self._prefix_top:
+            return set()
+        return {
+            key[:n]
+            for key in keys
+            for n in range(1, len(key) + 1)
+            if key[:n] in self._prefix_top
+        }
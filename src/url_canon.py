@@ -0,0 +1,127 @@
+"""URL Canonicalization Module - One normalized form for URLs shared by all stores.
+
+历史、书签、密码与 Cookie 都用 canonicalize() / host_key() 的结果做比较，
+同一页面的不同写法不会再被当作不同条目，也不必每次比较都重新解析 URL：
+- scheme 与主机名转小写，国际化域名转为 IDNA (xn--) 形式
+- 去掉默认端口 (http:80, https:443 ...)
+- 去掉已知的跟踪参数 (utm_*, fbclid, gclid ...)，其余参数保持原样与顺序
+- 空路径补全为 "/"（/a 与 /a/ 在服务器上可能是不同资源，因此不做修改）
+
+解析结果用 lru_cache 缓存，主机名用 sys.intern 驻留，重复出现的 URL 只解析一次。
+"""
+
+import sys
+from functools import lru_cache
+from urllib.parse import SplitResult, urlsplit, urlunsplit
+
+from public_suffix import registrable_domain
+
+CACHE_SIZE = 8192
+
+DEFAULT_PORTS = {"http": 80, "https": 443, "ws": 80, "wss": 443, "ftp": 21}
+
+TRACKING_PARAMS = frozenset(
+    {
+        "fbclid",
+        "gclid",
+        "dclid",
+        "msclkid",
+        "yclid",
+        "igshid",
+        "mc_cid",
+        "mc_eid",
+        "_ga",
+        "_gl",
+        "spm",
+        "ref_src",
+    }
+)
+TRACKING_PREFIXES = ("utm_",)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonicalize(url: str) -> str:
+    """Return the canonical form of url (unchanged if it is not a network URL)."""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.netloc:
+        # about:blank、file:///... 等只统一 scheme 大小写
+        return urlunsplit(parts._replace(scheme=parts.scheme.lower())) if parts.scheme else url
+
+    scheme = parts.scheme.lower()
+    netloc = _canonical_netloc(parts, scheme)
+    path = parts.path or "/"
+    query = _strip_tracking(parts.query)
+    return urlunsplit((scheme, netloc, path, query, parts.fragment))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_host(host: str) -> str:
+    """Lowercase, IDNA-encode and intern a bare host name (a leading "." is dropped)."""
+    host = host.strip().rstrip(".").lstrip(".").lower()
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+    return sys.intern(host)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def host_key(url: str) -> str:
+    """Canonical "host[:port]" of url, used to match saved passwords to sites."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return canonical_host(url)
+    if not parts.netloc:
+        return canonical_host(url)
+    netloc = _canonical_netloc(parts, parts.scheme.lower())
+    return sys.intern(netloc.rpartition("@")[2])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def site_key(url: str) -> str:
+    """
+    Registrable domain of url plus any non-default port ("example.com", "localhost:8000").
+
+    同一站点的子域名（login.example.com、www.example.com）得到相同的结果，用于共享保存的密码。
+    """
+    host = host_key(url)
+    if host.startswith("["):
+        return host  # IPv6
+    name, sep, port = host.partition(":")
+    return sys.intern(registrable_domain(name) + sep + port)
+
+
+def same_url(a: str, b: str) -> bool:
+    return canonicalize(a) == canonicalize(b)
+
+
+def _canonical_netloc(parts: SplitResult, scheme: str) -> str:
+    try:
+        port = parts.port
+    except ValueError:
+        return parts.netloc.lower()
+    host = canonical_host(parts.hostname or "")
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    return f"{userinfo}@{host}" if userinfo else host
+
+
+def _strip_tracking(query: str) -> str:
+    if not query:
+        return query
+    kept = []
+    for pair in query.split("&"):
+        key = pair.split("=", 1)[0].lower()
+        if key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES):
+            continue
+        kept.append(pair)
+    return "&".join(kept)
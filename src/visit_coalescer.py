@@ -0,0 +1,106 @@
+"""Visit Coalescer Module - Merge repeated visits before they reach the history writer.
+
+每次 loadFinished 都会产生一条访问，刷新、单页应用的 #hash 变化以及重定向链
+会造成大量几乎相同的记录。写入队列之前先经过这里：
+- 同一 URL（忽略 #fragment）在 window 秒内再次访问时合并为一次
+- 由重定向发起（调用方根据导航类型判断，如 JS / meta refresh 跳转）、且距同一标签页
+  上一次加载不超过 redirect_window 秒的加载视为重定向链的下一跳，只保留链的最终地址；
+  快速点击链接、从缓存后退等普通导航即使间隔很短也是独立的访问
+"""
+
+import time
+from typing import Any
+
+from url_canon import canonicalize
+
+# Type aliases
+HistoryRecord = dict[str, str]
+
+DEFAULT_COALESCE_WINDOW = 30.0  # 秒
+DEFAULT_REDIRECT_WINDOW = 2.0  # 秒
+
+# offer() 的返回动作
+VISIT_NEW = "new"
+VISIT_MERGED = "merged"
+VISIT_REDIRECT = "redirect"
+
+
+def visit_key(url: str) -> str:
+    """URL used to decide whether two visits are the same page (fragment removed)."""
+    return canonicalize(url).split("#", 1)[0]
+
+
+class VisitCoalescer:
+    """Decides whether a finished page load is a new visit, a repeat, or a redirect hop."""
+
+    def __init__(
+        self,
+        window: float = DEFAULT_COALESCE_WINDOW,
+        redirect_window: float = DEFAULT_REDIRECT_WINDOW,
+    ) -> None:
+        self.window = window
+        self.redirect_window = redirect_window
+        # visit_key -> 最近一次访问的 monotonic 时间
+        self._recent: dict[str, float] = {}
+        # source -> (该来源最后一条记录, 其加载完成时间)
+        self._last_by_source: dict[Any, tuple[HistoryRecord, float]] = {}
+        self._merged = 0
+        self._redirects = 0
+
+    def offer(
+        self,
+        record: HistoryRecord,
+        source: Any = None,
+        now: float | None = None,
+        redirected: bool = False,
+    ) -> tuple[str, HistoryRecord | None]:
+        """
+        Classify a visit.
+
+        Args:
+            record: The visit to record
+            source: Identifies the tab (or other origin) the load happened in
+            now: monotonic timestamp, defaults to time.monotonic()
+            redirected: The load was started by a redirect rather than by the user
+
+        Returns:
+            (VISIT_NEW, None)        应写入的新访问
+            (VISIT_MERGED, None)     与最近的访问重复，应丢弃
+            (VISIT_REDIRECT, prev)   prev 是同一重定向链的上一跳，应被 record 替换
+        """
+        if now is None:
+            now = time.monotonic()
+        self._prune(now)
+        key = visit_key(record["url"])
+
+        previous = self._last_by_source.get(source) if source is not None else None
+        last_seen = self._recent.get(key)
+        if last_seen is not None and now - last_seen < self.window:
+            # 窗口从记录下来的那次访问开始计算，合并的访问不会延长它
+            self._merged += 1
+            return VISIT_MERGED, None
+        self._recent[key] = now
+
+        if source is not None:
+            self._last_by_source[source] = (record, now)
+        if redirected and previous is not None and now - previous[1] < self.redirect_window:
+            self._redirects += 1
+            return VISIT_REDIRECT, previous[0]
+        return VISIT_NEW, None
+
+    def forget_source(self, source: Any) -> None:
+        """Drop per-source state (e.g. when a tab is closed)."""
+        self._last_by_source.pop(source, None)
+
+    def reset(self) -> None:
+        """Forget all recent visits (after history has been cleared)."""
+        self._recent.clear()
+        self._last_by_source.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"merged_visits": self._merged, "collapsed_redirects": self._redirects}
+
+    def _prune(self, now: float) -> None:
+        horizon = max(self.window, self.redirect_window)
+        if len(self._recent) > 256:
+            self._recent = {k: t for k, t in self._recent.items() if now - t < horizon}
@@ -0,0 +1,154 @@
+"""测试书签链接检查：本地 HTTP 服务器上的失效链接、重定向、并发限制与缓存"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+import bookmark_checker
+import bookmark_manager
+from bookmark_checker import BookmarkChecker, LinkCheckCache, apply_redirects
+from bookmark_manager import BookmarkManager
+
+_ROUTES = {
+    "/ok": (200, None),
+    "/gone": (404, None),
+    "/old": (301, "/ok"),
+    "/chain": (308, "/old"),
+    "/temp": (302, "/ok"),
+    "/loop": (301, "/loop"),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _respond(self, head):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            path = self.path.split("?")[0]
+            if path == "/slow":
+                time.sleep(0.05)
+            if path == "/nohead" and head:
+                status, location = 405, None
+            else:
+                status, location = _ROUTES.get(path, (200, None))
+            body = b"" if head else b"body"
+            self.send_response(status)
+            if location:
+                self.send_header("Location", location)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def do_HEAD(self):
+        self._respond(True)
+
+    def do_GET(self):
+        self._respond(False)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.connections = httpd.active = httpd.max_active = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _bookmarks(base, paths):
+    return [
+        {"id": i, "type": "bookmark", "url": base + p, "title": p} for i, p in enumerate(paths, 1)
+    ]
+
+
+def test_report_classifies_links(server):
+    httpd, base = server
+    paths = ["/ok", "/gone", "/old", "/chain", "/temp", "/nohead", "/loop"]
+    bookmarks = _bookmarks(base, paths) + [{"id": 9, "url": "javascript:void(0)"}]
+    report = BookmarkChecker(LinkCheckCache()).check(bookmarks)
+
+    assert [b["title"] for b, _ in report["dead"]] == ["/gone"]
+    # 只有整条链都是永久重定向时才可以改写；临时重定向保持原样
+    assert [(b["title"], r["location"]) for b, r in report["redirects"]] == [
+        ("/old", base + "/ok"),
+        ("/chain", base + "/ok"),
+    ]
+    assert [r["error"] for _, r in report["errors"]] == ["Too many redirects"]
+    assert ("GET", "/nohead") in httpd.requests
+    assert report["checked"] == len(paths)
+    host = report["hosts"]["127.0.0.1:" + base.rsplit(":", 1)[1]]
+    assert host["count"] == len(paths) and host["failed"] == 2
+    assert 0 <= host["latency"] <= host["max_latency"]
+
+
+def test_per_host_limit_and_connection_reuse(server):
+    httpd, base = server
+    bookmarks = _bookmarks(base, [f"/slow?{i}" for i in range(12)])
+    progress = []
+    checker = BookmarkChecker(LinkCheckCache(), workers=8, per_host=2)
+    report = checker.check(bookmarks, lambda done, total: progress.append((done, total)))
+    assert report["checked"] == 12 and not report["dead"]
+    assert httpd.max_active <= 2
+    assert httpd.connections < len(httpd.requests)
+    assert progress[0] == (0, 12) and progress[-1] == (12, 12)
+
+
+def test_cache_skips_fresh_entries(server, tmp_path):
+    httpd, base = server
+    now = [1000.0]
+    path = str(tmp_path / "link_check.json")
+    bookmarks = _bookmarks(base, ["/ok", "/gone"])
+    assert BookmarkChecker(LinkCheckCache(path, clock=lambda: now[0])).check(bookmarks)["checked"]
+
+    # 重新加载缓存文件：未过期的结果直接使用，不再发请求
+    count = len(httpd.requests)
+    report = BookmarkChecker(LinkCheckCache(path, clock=lambda: now[0])).check(bookmarks)
+    assert report["checked"] == 0 and len(httpd.requests) == count
+    assert [b["title"] for b, _ in report["dead"]] == ["/gone"]
+
+    now[0] += bookmark_checker.CACHE_TTL
+    report = BookmarkChecker(LinkCheckCache(path, clock=lambda: now[0])).check(bookmarks)
+    assert report["checked"] == 2
+
+
+def test_apply_redirects_rewrites_bookmarks(server, tmp_path, monkeypatch):
+    httpd, base = server
+    monkeypatch.setattr(bookmark_manager, "BOOKMARKS_FILE", str(tmp_path / "bookmarks.json"))
+    monkeypatch.setattr(bookmark_manager, "SAVE_DELAY", 60)
+    monkeypatch.setattr(BookmarkManager, "_listeners", [])
+    BookmarkManager.add_bookmark(base + "/old", "Old")
+    BookmarkManager.add_bookmark(base + "/chain", "Chain")
+
+    report = BookmarkChecker(LinkCheckCache()).check()
+    # 两个书签重定向到同一地址，第二个改写会与第一个重复而被跳过
+    assert apply_redirects(report["redirects"]) == 1
+    assert [b["url"] for b in BookmarkManager.get_all_bookmarks_flat()] == [
+        base + "/ok",
+        base + "/chain",
+    ]
@@ -0,0 +1,228 @@
+"""测试常驻内存的书签树：稳定 id、索引查找、移动删除与延迟保存"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+import bookmark_manager
+from bookmark_manager import ROOT_ID, BookmarkManager, BookmarkTree
+
+
+@pytest.fixture
+def bookmarks_file(tmp_path, monkeypatch):
+    path = tmp_path / "bookmarks.json"
+    monkeypatch.setattr(bookmark_manager, "BOOKMARKS_FILE", str(path))
+    monkeypatch.setattr(bookmark_manager, "SAVE_DELAY", 60)
+    monkeypatch.setattr(BookmarkManager, "_listeners", [])
+    return path
+
+
+def test_tree_indexes_and_mutations():
+    tree = BookmarkTree()
+    work = tree.add_folder("Work")
+    docs = tree.add_folder("Docs", work)
+    page = tree.add_bookmark("https://Example.com/a", "A", docs)
+    other = tree.add_bookmark("https://example.org/", "B")
+
+    assert tree.find_url("https://example.com/a")["id"] == page
+    assert tree.add_bookmark("https://example.com/a", "dup") is None
+    assert tree.folders() == [(work, "Work"), (docs, "Work / Docs")]
+
+    # 移动保持 id 不变；文件夹不能移到自己的子文件夹中
+    assert tree.move(other, docs, 0)
+    assert tree.child_ids(docs) == [other, page]
+    assert not tree.move(work, docs)
+
+    assert not tree.update(other, url="https://example.com/a")
+    assert tree.update(other, url="https://example.net/", title="C")
+    assert tree.find_url("https://example.org/") is None
+    assert tree.find_url("https://example.net/")["title"] == "C"
+
+    assert tree.remove(work)
+    assert len(tree) == 0
+    assert tree.find_url("https://example.net/") is None
+    assert tree.child_ids(ROOT_ID) == []
+
+
+def test_ids_survive_reload_and_legacy_files_are_migrated(bookmarks_file):
+    bookmarks_file.write_text(
+        json.dumps(
+            [
+                {"url": "https://old.example/", "title": "Old"},
+                {
+                    "type": "folder",
+                    "name": "F",
+                    "children": [
+                        {"type": "bookmark", "url": "https://new.example/", "title": "New"}
+                    ],
+                },
+            ]
+        ),
+        encoding="utf-8",
+    )
+    tree = BookmarkManager.get_tree()
+    assert tree.migrated
+    assert BookmarkManager.flush()
+    saved = json.loads(bookmarks_file.read_text(encoding="utf-8"))
+    assert saved[0]["type"] == "bookmark" and isinstance(saved[0]["id"], int)
+    folder_id = saved[1]["id"]
+    child_id = saved[1]["children"][0]["id"]
+
+    BookmarkManager._tree = None
+    tree = BookmarkManager.get_tree()
+    assert not tree.migrated
+    assert tree.find_url("https://new.example/")["id"] == child_id
+    assert tree.get(child_id)["parent"] == folder_id
+    assert tree.add_folder("G") > child_id
+
+
+def test_changes_are_written_once_after_delay(bookmarks_file):
+    calls = []
+    BookmarkManager.add_listener(calls.append)
+    BookmarkManager.add_bookmark("https://a.example/", "A", "Folder")
+    BookmarkManager.add_bookmark("https://b.example/", "B", "Folder")
+    assert BookmarkManager.move_bookmark("https://a.example/")
+    assert len(calls) == 3
+    # 写盘被推迟，修改只存在于内存中
+    assert not bookmarks_file.exists()
+    flat = BookmarkManager.get_all_bookmarks_flat()
+    assert [b["title"] for b in flat] == ["B", "A"]
+    # 返回副本，后台线程（链接检查）读取时不受树的修改影响
+    flat[0]["title"] = "changed"
+    assert BookmarkManager.get_tree().find_url("https://b.example/")["title"] == "B"
+
+    assert BookmarkManager.flush()
+    saved = json.loads(bookmarks_file.read_text(encoding="utf-8"))
+    assert [item.get("name", item.get("title")) for item in saved] == ["Folder", "A"]
+    assert saved[0]["children"][0]["url"] == "https://b.example/"
+
+
+def test_streaming_html_import(bookmarks_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(bookmark_manager, "IMPORT_CHUNK_SIZE", 7)
+    BookmarkManager.add_bookmark("https://known.example/", "Known", "Bar")
+    export = tmp_path / "export.html"
+    # 多个 <DT> 在同一行、实体转义、重复 URL、已有的同名文件夹
+    export.write_text(
+        "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<H1>Bookmarks</H1>\n<DL><p>"
+        '<DT><H3 ADD_DATE="1">Bar</H3><DL><p><DT><A HREF="https://known.example">K</A>'
+        '<DT><A HREF="https://a.example/?x=1&amp;y=2" ADD_DATE="1700000000">A &amp; B</A>'
+        '<DT><H3>Sub</H3>\n<DL><p>\n<DT><A HREF="https://b.example/">B</A>\n</DL><p>'
+        '</DL><p><DT><A HREF="https://A.example/?x=1&y=2">dup</A>'
+        '<DT><A HREF="https://c.example/">C</A>\n</DL><p>\n',
+        encoding="utf-8",
+    )
+    reports = []
+    count = BookmarkManager.import_from_html(str(export), lambda *p: reports.append(p))
+    assert count == 3
+    assert reports[-1] == (export.stat().st_size, export.stat().st_size)
+
+    bookmarks = BookmarkManager.load_bookmarks()
+    assert [item.get("name", item.get("title")) for item in bookmarks] == ["Bar", "C"]
+    bar = bookmarks[0]["children"]
+    assert [item.get("name", item.get("title")) for item in bar] == ["Known", "A & B", "Sub"]
+    assert bar[1]["url"] == "https://a.example/?x=1&y=2"
+    assert bar[1]["added"].startswith("2023-11-1")
+    assert bar[2]["children"][0]["url"] == "https://b.example/"
+
+
+def test_folder_versions_change_only_with_their_children():
+    tree = BookmarkTree()
+    work = tree.add_folder("Work")
+    home = tree.add_folder("Home")
+    page = tree.add_bookmark("https://a.example/", "A", work)
+    root_version, work_version, home_version = (tree.version(f) for f in (ROOT_ID, work, home))
+
+    tree.update(page, title="A2")
+    assert tree.version(work) != work_version
+    assert tree.version(ROOT_ID) == root_version
+
+    work_version = tree.version(work)
+    tree.move(page, home)
+    assert tree.version(work) != work_version and tree.version(home) != home_version
+    assert tree.version(ROOT_ID) == root_version
+
+    tree.update(home, name="House")
+    assert tree.version(ROOT_ID) != root_version
+    # 整体重新加载后所有版本号都失效
+    home_version = tree.version(home)
+    tree.load_list(tree.to_list())
+    assert tree.version(home) != home_version
+
+
+def test_move_many_rebuilds_target_once():
+    tree = BookmarkTree()
+    ids = [tree.add_bookmark(f"https://{i}.example/", str(i)) for i in range(6)]
+    folder = tree.add_folder("F")
+    inner = tree.add_bookmark("https://inner.example/", "inner", folder)
+
+    # 插入点按移动前的位置计算：放到原第 1 个节点之前
+    assert tree.move_many([ids[4], ids[0], ids[2]], ROOT_ID, 1) == [ids[4], ids[0], ids[2]]
+    assert tree.child_ids() == [ids[4], ids[0], ids[2], ids[1], ids[3], ids[5], folder]
+
+    # 目标文件夹本身、随文件夹一起移动的子节点都被跳过
+    assert tree.move_many([folder, inner, ids[5]], folder) == [inner, ids[5]]
+    assert tree.move_many([inner, folder, ids[1]], ROOT_ID, 0) == [folder, ids[1]]
+    assert tree.child_ids()[:2] == [folder, ids[1]]
+    assert tree.child_ids(folder) == [inner, ids[5]]
+
+
+def test_tag_and_word_search():
+    tree = BookmarkTree()
+    docs = tree.add_bookmark("https://docs.python.org/3/", "Python Docs", tags="Python, Reference")
+    pep = tree.add_bookmark("https://peps.python.org/", "PEP Index", tags=["python"])
+    rust = tree.add_bookmark("https://doc.rust-lang.org/", "Rust Docs", keyword="rs")
+
+    assert tree.get(docs)["tags"] == ["python", "reference"]
+    assert [n["id"] for n in tree.search("#python")] == [pep, docs]
+    # 单词前缀匹配，多个词为 AND；整词命中多的排在前面
+    assert [n["id"] for n in tree.search("doc")] == [rust, docs]
+    assert [n["id"] for n in tree.search("docs")] == [rust, docs]
+    assert [n["id"] for n in tree.search("pyth doc")] == [docs]
+    assert [n["id"] for n in tree.search("tag:reference py")] == [docs]
+    assert tree.search("#missing") == [] and tree.search("  ") == []
+
+    # 关键字全局唯一；修改后重新建立索引
+    assert tree.find_keyword("RS")["id"] == rust
+    assert tree.add_bookmark("https://crates.io/", "Crates", keyword="rs") is None
+    assert not tree.update(docs, keyword="rs")
+    assert tree.update(rust, title="Rust Book", tags="rust", keyword="")
+    assert tree.find_keyword("rs") is None and "keyword" not in tree.get(rust)
+    assert [n["id"] for n in tree.search("book #rust")] == [rust]
+    assert tree.search("docs #rust") == []
+
+    tree.remove(pep)
+    assert tree.tags() == [("python", 1), ("reference", 1), ("rust", 1)]
+    assert [n["id"] for n in tree.search("pep")] == []
+
+
+def test_changes_since_lists_touched_urls(monkeypatch):
+    tree = BookmarkTree()
+    seq = tree.change_seq
+    a = tree.add_bookmark("https://a.example/", "A")
+    folder = tree.add_folder("F")
+    b = tree.add_bookmark("https://b.example/", "B", folder)
+    tree.move(a, folder)
+    seq, urls = tree.changes_since(seq)
+    assert urls == ["https://a.example/", "https://b.example/"]
+
+    tree.update(a, url="https://c.example/")
+    tree.update(b, tags="x")
+    tree.remove(folder)
+    seq, urls = tree.changes_since(seq)
+    assert urls == ["https://a.example/", "https://c.example/", "https://b.example/"]
+    assert tree.changes_since(seq) == (seq, [])
+
+    # 重新加载或日志被截断后需要整体同步
+    tree.load_list([{"type": "bookmark", "url": "https://d.example/", "title": "D"}])
+    assert tree.changes_since(seq)[1] is None
+    monkeypatch.setattr(bookmark_manager, "CHANGE_LOG_SIZE", 2)
+    tree = BookmarkTree()
+    seq = tree.change_seq
+    for i in range(3):
+        tree.add_bookmark(f"https://{i}.example/", str(i))
+    assert tree.changes_since(seq)[1] is None
+    assert tree.changes_since(seq + 1)[1] == ["https://1.example/", "https://2.example/"]
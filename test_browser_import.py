@@ -0,0 +1,142 @@
+"""测试从 Chrome / Firefox 配置数据库导入历史与书签"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+import bookmark_manager
+import browser_import
+import history_manager
+from bookmark_manager import BookmarkManager
+from history_manager import HistoryManager, SqliteHistoryStore
+
+CHAIN_START_END = 0x10000000 | 0x20000000
+
+
+@pytest.fixture(autouse=True)
+def data_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_manager, "HISTORY_FILE", str(tmp_path / "history.json"))
+    monkeypatch.setattr(
+        history_manager, "HISTORY_JOURNAL_FILE", str(tmp_path / "history.jsonl")
+    )
+    monkeypatch.setattr(history_manager, "HISTORY_DB_FILE", str(tmp_path / "history.db"))
+    monkeypatch.setattr(
+        history_manager, "HISTORY_SEGMENTS_DIR", str(tmp_path / "history_segments")
+    )
+    monkeypatch.setattr(bookmark_manager, "BOOKMARKS_FILE", str(tmp_path / "bookmarks.json"))
+    monkeypatch.setattr(HistoryManager, "_writer", None)
+    HistoryManager.set_store(SqliteHistoryStore())
+    yield tmp_path
+    HistoryManager.get_store().close()
+    monkeypatch.setattr(HistoryManager, "_store", None)
+
+
+def _chrome_history(path, visits):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT);"
+        "CREATE TABLE visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER, transition INTEGER);"
+    )
+    for i, (url, title, unix_time, transition) in enumerate(visits, 1):
+        conn.execute("INSERT INTO urls VALUES (?, ?, ?)", (i, url, title))
+        chrome_time = (unix_time + 11644473600) * 1_000_000
+        conn.execute(
+            "INSERT INTO visits (url, visit_time, transition) VALUES (?, ?, ?)",
+            (i, chrome_time, transition),
+        )
+    conn.commit()
+    conn.close()
+
+
+def _firefox_places(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT);
+        CREATE TABLE moz_historyvisits (id INTEGER PRIMARY KEY, place_id INTEGER,
+                                        visit_date INTEGER, visit_type INTEGER);
+        CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER,
+                                    parent INTEGER, position INTEGER, title TEXT,
+                                    guid TEXT, dateAdded INTEGER);
+        INSERT INTO moz_places VALUES (1, 'https://mozilla.org/', 'Mozilla'),
+                                      (2, 'https://example.com/', 'Example'),
+                                      (3, 'https://cdn.example.com/frame', NULL);
+        INSERT INTO moz_historyvisits (place_id, visit_date, visit_type) VALUES
+            (2, 1767261600000000, 1), (1, 1767258000000000, 2), (3, 1767261700000000, 8);
+        INSERT INTO moz_bookmarks VALUES
+            (1, 2, NULL, 0, 0, '', 'root________', 0),
+            (2, 2, NULL, 1, 0, 'toolbar', 'toolbar_____', 0),
+            (3, 2, NULL, 1, 1, 'tags', 'tags________', 0),
+            (4, 1, 1, 2, 0, 'Mozilla', 'aaaaaaaaaaaa', 1767258000000000),
+            (5, 2, NULL, 2, 1, 'Work', 'bbbbbbbbbbbb', 0),
+            (6, 1, 2, 5, 0, 'Example', 'cccccccccccc', 0),
+            (7, 2, NULL, 3, 0, 'some-tag', 'dddddddddddd', 0),
+            (8, 1, 1, 7, 0, NULL, 'eeeeeeeeeeee', 0);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_chrome_history_is_imported_in_batches(data_files):
+    path = str(data_files / "History")
+    _chrome_history(
+        path,
+        [
+            (f"https://site{i}.com/", f"Site {i}", 1767225600 + i * 60, CHAIN_START_END)
+            for i in range(5)
+        ]
+        + [("https://ads.com/frame", "", 1767225600, 3 | CHAIN_START_END)]  # 子框架
+        + [("https://short.link/", "", 1767225600, 0x10000000)],  # 重定向链中间跳
+    )
+    assert browser_import.detect_format(path) == "chrome"
+
+    progress = []
+    count = browser_import.import_history(
+        path, lambda done, total: progress.append((done, total)), batch_size=2
+    )
+    assert count == 5
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    history = HistoryManager.load_history()
+    assert [h["url"] for h in history] == [f"https://site{i}.com/" for i in range(5)]
+    assert HistoryManager.get_store().last_url() == "https://site4.com/"
+
+    # 取消后不再提交后续批次，已提交的保留
+    HistoryManager.clear_history()
+    count = browser_import.import_history(
+        path, lambda done, total: progress.append((done, total)), 2, lambda: len(progress) > 3
+    )
+    assert count == 2 and len(HistoryManager.load_history()) == 2
+
+
+def test_firefox_history_and_bookmarks(data_files):
+    path = str(data_files / "places.sqlite")
+    _firefox_places(path)
+    assert browser_import.detect_format(path) == "firefox"
+
+    assert browser_import.import_history(path) == 2
+    assert [h["url"] for h in HistoryManager.load_history()] == [
+        "https://mozilla.org/",
+        "https://example.com/",
+    ]
+
+    assert BookmarkManager.import_from_browser(path) == 2
+    (toolbar,) = BookmarkManager.load_bookmarks()
+    assert toolbar["name"] == "Bookmarks Toolbar"
+    assert [c.get("url") or c.get("name") for c in toolbar["children"]] == [
+        "https://mozilla.org/",
+        "Work",
+    ]
+    # 再次导入时跳过已有 URL
+    assert BookmarkManager.import_from_browser(path) == 0
+
+
+def test_not_a_browser_database(data_files):
+    path = data_files / "random.db"
+    path.write_bytes(b"not sqlite")
+    with pytest.raises(ValueError):
+        browser_import.import_history(str(path))
@@ -0,0 +1,53 @@
+"""测试模糊匹配打分与三元组 / 字符位图预筛选"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import fuzzy_match
+from fuzzy_match import FuzzyIndex, match_text, score
+
+ISSUES = match_text("https://github.com/python/cpython/issues?q=is%3Aopen", "Issues · GitHub")
+
+
+def test_match_text_drops_scheme_www_and_query():
+    assert ISSUES == "github.com/python/cpython/issues issues · github"
+    assert match_text("https://www.python.org/", "Python") == "python.org/ python"
+
+
+def test_abbreviations_transpositions_and_ranking():
+    assert score("gthb iss", ISSUES) is not None
+    assert score("gihtub", ISSUES) is not None  # 相邻字符写反
+    assert score("cpyhton isues", ISSUES) is not None  # 漏掉的字母按子序列匹配
+    assert score("gitjub", ISSUES) is None  # 替换错误不在容忍范围内
+    assert score("xyz", ISSUES) is None
+    # 子串优于子序列，单词边界优于单词中间
+    assert score("github", ISSUES) > score("gthb", ISSUES)
+    assert score("iss", ISSUES) > score("sue", ISSUES)
+    assert score("github", ISSUES) - score("gihtub", ISSUES) >= fuzzy_match.TRANSPOSE_PENALTY
+    # 过于分散的子序列不算匹配
+    assert score("goo", match_text("https://github.com/python/cpython", "Python source")) is None
+
+
+def test_index_search_uses_prefilters(monkeypatch):
+    index = FuzzyIndex()
+    index.add("issues", ISSUES, weight=1.0)
+    index.add("pulls", match_text("https://github.com/python/cpython/pulls", "Pull requests"))
+    for i in range(300):
+        url = f"https://example{i}.com/page/{i}"
+        index.add(url, match_text(url, f"Example page {i}"), weight=2.0)
+
+    assert [item for _, item in index.search("gthb iss")] == ["issues"]
+    assert [item for _, item in index.search("gihtub pul")] == ["pulls"]
+    assert index.search("exmaple 17", 3)[0][1] == "https://example17.com/page/17"
+
+    # 没有 numpy 时走纯 Python 的位图扫描，结果相同
+    monkeypatch.setattr(fuzzy_match, "np", None)
+    assert [item for _, item in index.search("gthb iss")] == ["issues"]
+
+    index.remove("issues")
+    assert index.search("gthb iss") == []
+    index.add("issues", ISSUES, item={"url": "x"})
+    assert index.get("issues") == {"url": "x"}
+    assert len(index) == 302
@@ -0,0 +1,87 @@
+"""测试历史记录统计（按天 / 按小时 / 按站点）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from history_analytics import MAX_DWELL_SECONDS, HistoryAnalytics
+
+
+def _analytics():
+    analytics = HistoryAnalytics()
+    analytics.build(
+        [
+            {"time": "2026-01-01 09:00:00", "url": "https://www.github.com/a", "title": ""},
+            {"time": "2026-01-01 09:10:00", "url": "https://news.com/", "title": ""},
+            {"time": "2026-01-01 09:15:00", "url": "https://github.com/b", "title": ""},
+            {"time": "2026-01-02 22:00:00", "url": "https://news.com/x", "title": ""},
+        ]
+    )
+    return analytics
+
+
+def test_local_urls_are_not_counted_as_a_site():
+    analytics = HistoryAnalytics()
+    analytics.build(
+        [
+            {"time": "2026-01-01 09:00:00", "url": "file:///tmp/a.html", "title": ""},
+            {"time": "2026-01-01 09:01:00", "url": "about:blank", "title": ""},
+            {"time": "2026-01-01 09:02:00", "url": "https://news.com/", "title": ""},
+            {"time": "2026-01-02 09:00:00", "url": "file:///tmp/b.html", "title": ""},
+        ]
+    )
+    assert [s["domain"] for s in analytics.top_domains()] == ["news.com"]
+    assert analytics.daily_summary() == [
+        {"day": "2026-01-02", "visits": 1, "top_domain": ""},
+        {"day": "2026-01-01", "visits": 3, "top_domain": "news.com"},
+    ]
+
+
+def test_day_hour_and_domain_aggregates():
+    analytics = _analytics()
+    assert analytics.visits_per_day() == [("2026-01-01", 3), ("2026-01-02", 1)]
+    hours = analytics.visits_per_hour()
+    assert hours[9] == 3 and hours[22] == 1 and sum(hours) == 4
+
+    top = analytics.top_domains(5)
+    assert [(s["domain"], s["visits"]) for s in top] == [("github.com", 2), ("news.com", 2)]
+    # github: 10 分钟 + 封顶的 30 分钟；news: 5 分钟
+    assert top[0]["dwell_seconds"] == 600 + MAX_DWELL_SECONDS
+    assert top[1]["dwell_seconds"] == 300
+    assert top[1]["last_visit"] == "2026-01-02 22:00:00"
+
+    assert analytics.daily_summary() == [
+        {"day": "2026-01-02", "visits": 1, "top_domain": "news.com"},
+        {"day": "2026-01-01", "visits": 3, "top_domain": "github.com"},
+    ]
+
+
+def test_incremental_add_matches_rebuild():
+    analytics = _analytics()
+    analytics.top_domains()  # 先构建缓存，之后的访问走增量更新
+    new_visits = [
+        {"time": "2026-01-02 22:05:00", "url": "https://example.org/", "title": ""},
+        {"time": "2026-01-03 08:00:00", "url": "https://example.org/", "title": ""},
+    ]
+    for record in new_visits:
+        analytics.add(record)
+
+    rebuilt = HistoryAnalytics()
+    rebuilt.build(
+        [
+            {"time": "2026-01-01 09:00:00", "url": "https://www.github.com/a", "title": ""},
+            {"time": "2026-01-01 09:10:00", "url": "https://news.com/", "title": ""},
+            {"time": "2026-01-01 09:15:00", "url": "https://github.com/b", "title": ""},
+            {"time": "2026-01-02 22:00:00", "url": "https://news.com/x", "title": ""},
+        ]
+        + new_visits
+    )
+    assert analytics.top_domains() == rebuilt.top_domains()
+    assert analytics.visits_per_day() == rebuilt.visits_per_day()
+    assert analytics.visits_per_hour() == rebuilt.visits_per_hour()
+    assert analytics.daily_summary() == rebuilt.daily_summary()
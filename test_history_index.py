@@ -0,0 +1,55 @@
+"""测试历史记录全文索引"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from history_index import HistorySearchIndex
+
+
+def _index():
+    index = HistorySearchIndex()
+    index.build(
+        [
+            {"time": "2026-01-01 10:00:00", "url": "https://github.com/issues", "title": "Issues"},
+            {"time": "2026-01-01 11:00:00", "url": "https://gitlab.com/", "title": "GitLab"},
+            {"time": "2026-01-01 12:00:00", "url": "https://news.example.com/", "title": "你好 世界"},
+            {"time": "2026-01-01 13:00:00", "url": "https://github.com/issues", "title": "My Issues"},
+        ]
+    )
+    return index
+
+
+def test_prefix_and_multi_term_queries():
+    index = _index()
+    results, total = index.search("git")
+    assert total == 2
+    # 最近访问在前，同一 URL 只出现一次并使用最新标题
+    assert [r["url"] for r in results] == ["https://github.com/issues", "https://gitlab.com/"]
+    assert results[0]["title"] == "My Issues"
+
+    results, total = index.search("git iss")
+    assert total == 1 and results[0]["url"] == "https://github.com/issues"
+    assert index.search("好世")[1] == 1
+    assert index.search("nothing")[1] == 0
+
+
+def test_paging_and_incremental_updates():
+    index = _index()
+    index.add({"time": "2026-01-02 09:00:00", "url": "https://gitee.com/", "title": "Gitee"})
+    first, total = index.search("git", page=0, page_size=2)
+    second, _ = index.search("git", page=1, page_size=2)
+    assert total == 3
+    assert [r["url"] for r in first + second] == [
+        "https://gitee.com/",
+        "https://github.com/issues",
+        "https://gitlab.com/",
+    ]
+
+    index.add({"time": "2026-01-02 10:00:00", "url": "https://gitlab.com/", "title": "Renamed"})
+    assert index.search("gitlab")[1] == 1
+    assert index.search("renamed")[1] == 1
+
+    index.remove("https://gitee.com/")
+    assert index.search("gitee")[1] == 0
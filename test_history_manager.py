@@ -0,0 +1,316 @@
+"""测试 HistoryManager 的存储后端（JSON 按天分段 / SQLite）"""
+
+import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+import history_manager
+from history_manager import HistoryManager, JsonHistoryStore, SqliteHistoryStore
+from visit_coalescer import VISIT_MERGED, VISIT_NEW, VISIT_REDIRECT, VisitCoalescer
+
+
+@pytest.fixture(autouse=True)
+def history_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_manager, "HISTORY_FILE", str(tmp_path / "history.json"))
+    monkeypatch.setattr(
+        history_manager, "HISTORY_JOURNAL_FILE", str(tmp_path / "history.jsonl")
+    )
+    monkeypatch.setattr(history_manager, "HISTORY_DB_FILE", str(tmp_path / "history.db"))
+    monkeypatch.setattr(
+        history_manager, "HISTORY_SEGMENTS_DIR", str(tmp_path / "history_segments")
+    )
+    monkeypatch.setattr(HistoryManager, "_store", None)
+    monkeypatch.setattr(HistoryManager, "_writer", None)
+    monkeypatch.setattr(HistoryManager, "_coalescer", VisitCoalescer())
+    monkeypatch.setattr(HistoryManager, "_unindexed", {})
+    yield tmp_path
+    HistoryManager.shutdown()
+    if HistoryManager._store is not None:
+        HistoryManager._store.close()
+
+
+def _write_snapshot(path, records):
+    path.write_text(json.dumps(records), encoding="utf-8")
+
+
+def _visits(*times):
+    return [{"time": t, "url": f"https://site{i}.com/", "title": str(i)} for i, t in enumerate(times)]
+
+
+def test_json_store_appends_to_day_segments(history_files):
+    HistoryManager.set_store(JsonHistoryStore())
+    HistoryManager.add_history("https://a.com/", "A")
+    HistoryManager.add_history("https://b.com/", "B")
+    HistoryManager.add_history("https://b.com/", "B")  # 连续重复被忽略
+
+    segment_files = list((history_files / "history_segments").iterdir())
+    assert len(segment_files) == 1
+    lines = segment_files[0].read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["url"] for line in lines] == ["https://a.com/", "https://b.com/"]
+    assert [h["url"] for h in HistoryManager.load_history()] == [
+        "https://a.com/",
+        "https://b.com/",
+    ]
+
+
+def test_json_store_migrates_legacy_files(history_files):
+    _write_snapshot(
+        history_files / "history.json",
+        [{"time": "2026-01-01 10:00:00", "url": "https://a.com/", "title": "A"}],
+    )
+    (history_files / "history.jsonl").write_text(
+        json.dumps({"time": "2026-01-02 10:00:00", "url": "https://b.com/", "title": "B"}) + "\n",
+        encoding="utf-8",
+    )
+    store = JsonHistoryStore()
+    assert [s[:2] for s in store.segments()] == [("2026-01-01", 1), ("2026-01-02", 1)]
+    assert not (history_files / "history.json").exists()
+    assert not (history_files / "history.jsonl").exists()
+
+
+@pytest.mark.parametrize("store_cls", [JsonHistoryStore, SqliteHistoryStore])
+def test_retention_drops_whole_old_segments(history_files, store_cls):
+    HistoryManager.set_store(store_cls())
+    store = HistoryManager.get_store()
+    store.add_records(
+        _visits(
+            "2026-01-01 10:00:00",
+            "2026-01-01 11:00:00",
+            "2026-01-02 10:00:00",
+            "2026-01-03 10:00:00",
+            "2026-01-03 11:00:00",
+        )
+    )
+    assert [s[:2] for s in store.segments()] == [
+        ("2026-01-01", 2),
+        ("2026-01-02", 1),
+        ("2026-01-03", 2),
+    ]
+
+    # 超过条数上限时按整天丢弃最旧的记录
+    assert store.apply_retention({"max_entries": 4}) == 2
+    assert [s[0] for s in store.segments()] == ["2026-01-02", "2026-01-03"]
+
+    now = datetime.datetime(2026, 1, 4, 12, 0, 0)
+    assert store.apply_retention({"max_age_days": 1}, now=now) == 1
+    # 最新的一天即使超期也保留
+    assert store.apply_retention({"max_age_days": 1, "max_bytes": 1}, now=now) == 0
+    assert [h["time"] for h in store.load_all()] == [
+        "2026-01-03 10:00:00",
+        "2026-01-03 11:00:00",
+    ]
+    assert store.last_url() == "https://site4.com/"
+    assert [s["url"] for s in store.top_sites(5)] == ["https://site4.com/", "https://site3.com/"]
+
+
+def test_manager_retention_policy(history_files):
+    HistoryManager.set_store(SqliteHistoryStore())
+    HistoryManager.get_store().add_records(
+        _visits("2020-01-01 10:00:00", "2020-01-02 10:00:00")
+    )
+    HistoryManager.add_history("https://today.com/", "Today")
+    assert HistoryManager.apply_retention() == 0  # 未配置策略
+
+    HistoryManager.set_retention_policy(max_age_days=90)
+    try:
+        assert HistoryManager.apply_retention() == 2
+    finally:
+        HistoryManager.set_retention_policy()
+    assert [h["url"] for h in HistoryManager.load_history()] == ["https://today.com/"]
+
+
+@pytest.mark.parametrize("store_cls", [JsonHistoryStore, SqliteHistoryStore])
+def test_clear_history_since_keeps_older_records(history_files, store_cls):
+    _write_snapshot(
+        history_files / "history.json",
+        [{"time": "2026-01-01 10:00:00", "url": "https://old.com/", "title": "Old"}],
+    )
+    HistoryManager.set_store(store_cls())
+    HistoryManager.add_history("https://new.com/", "New")
+
+    assert HistoryManager.clear_history_since("2026-01-02 00:00:00")
+    assert [h["url"] for h in HistoryManager.load_history()] == ["https://old.com/"]
+
+    assert HistoryManager.clear_history()
+    assert HistoryManager.load_history() == []
+
+
+def test_sqlite_store_migrates_json_once(history_files):
+    _write_snapshot(
+        history_files / "history.json",
+        [
+            {"time": "2026-01-01 10:00:00", "url": "https://a.com/", "title": "A"},
+            {"time": "2026-01-01 11:00:00", "url": "https://b.com/", "title": "B"},
+            {"time": "2026-01-01 12:00:00", "url": "https://a.com/", "title": "A2"},
+        ],
+    )
+    store = SqliteHistoryStore()
+    HistoryManager.set_store(store)
+
+    assert len(HistoryManager.load_history()) == 3
+    # 旧文件直接导入数据库，不会先转存为 JSON 分段
+    assert not (history_files / "history_segments").exists()
+    assert not (history_files / "history.json").exists()
+    assert [h["url"] for h in HistoryManager.get_recent_urls(10)] == [
+        "https://a.com/",
+        "https://b.com/",
+    ]
+    assert HistoryManager.get_recent_history(1)[0]["title"] == "A2"
+    assert [h["url"] for h in HistoryManager.get_recent_history(10, "b.c")] == [
+        "https://b.com/"
+    ]
+
+    # 已有数据库时不再重复导入
+    store.close()
+    HistoryManager.set_store(SqliteHistoryStore())
+    assert len(HistoryManager.load_history()) == 3
+
+
+def test_clear_history_removes_migrated_copies(history_files):
+    _write_snapshot(history_files / "history.json", _visits("2026-01-01 10:00:00", "2026-01-02 10:00:00"))
+    HistoryManager.set_store(SqliteHistoryStore())
+    assert (history_files / "history.json.migrated").exists()
+    # 较早版本的迁移留下的分段副本
+    JsonHistoryStore(migrate=False).add_records(
+        _visits("2026-01-01 10:00:00", "2026-01-02 10:00:00")
+    )
+
+    assert HistoryManager.clear_history_since("2026-01-02 00:00:00")
+    assert [h["url"] for h in HistoryManager.load_history()] == ["https://site0.com/"]
+    assert [s[:2] for s in JsonHistoryStore(migrate=False).segments()] == [("2026-01-01", 1)]
+    assert not (history_files / "history.json.migrated").exists()
+
+    assert HistoryManager.clear_history()
+    assert HistoryManager.load_history() == []
+    assert not list((history_files / "history_segments").iterdir())
+
+
+def test_record_visit_is_written_behind(history_files):
+    HistoryManager.set_store(SqliteHistoryStore())
+    HistoryManager.record_visit("https://a.com/", "A")
+    HistoryManager.record_visit("https://a.com/", "A")  # 与队列中最后一条相同，被忽略
+    HistoryManager.record_visit("https://b.com/", "B")
+
+    # 未落盘的记录也能被读到
+    assert [h["url"] for h in HistoryManager.load_history()] == [
+        "https://a.com/",
+        "https://b.com/",
+    ]
+    assert HistoryManager.flush(timeout=5)
+    stats = HistoryManager.get_write_stats()
+    assert stats["queue_depth"] == 0
+    assert stats["records_written"] == 2
+
+    HistoryManager.record_visit("https://c.com/", "C")
+    HistoryManager.shutdown()
+    assert len(HistoryManager.get_store().load_all()) == 3
+
+
+@pytest.mark.parametrize("store_cls", [JsonHistoryStore, SqliteHistoryStore])
+def test_top_sites_rank_by_frecency(history_files, store_cls):
+    HistoryManager.set_store(store_cls())
+    store = HistoryManager.get_store()
+    # 频繁访问的旧站点 vs 刚刚访问一次的站点
+    store.add_records(
+        [{"time": f"2026-01-0{d} 10:00:00", "url": "https://often.com/", "title": "Often"} for d in range(1, 8)]
+        + [{"time": "2026-01-08 10:00:00", "url": "https://once.com/", "title": "Once"}]
+    )
+    top = HistoryManager.get_top_sites(2)
+    assert [s["url"] for s in top] == ["https://often.com/", "https://once.com/"]
+    assert top[0]["visit_count"] == 7
+    assert top[0]["last_visit"] == "2026-01-07 10:00:00"
+    assert top[0]["frecency"] > top[1]["frecency"] > 0
+
+    HistoryManager.clear_history_since("2026-01-03 00:00:00")
+    top = HistoryManager.get_top_sites(5)
+    assert [(s["url"], s["visit_count"]) for s in top] == [("https://often.com/", 2)]
+
+
+def test_coalescer_merges_repeats_and_collapses_redirects():
+    coalescer = VisitCoalescer(window=30, redirect_window=2)
+
+    def visit(url, source, now, redirected=False):
+        return coalescer.offer({"time": "", "url": url, "title": ""}, source, now, redirected)
+
+    assert visit("https://app.com/#inbox", 1, 0.0) == (VISIT_NEW, None)
+    assert visit("https://app.com/#sent", 1, 10.0)[0] == VISIT_MERGED  # 仅 hash 变化
+    assert visit("https://app.com/", 2, 20.0)[0] == VISIT_MERGED  # 其他标签页刷新
+    assert visit("https://app.com/", 2, 35.0)[0] == VISIT_NEW  # 窗口不因合并的访问而延长
+
+    assert visit("https://login.com/", 3, 100.0)[0] == VISIT_NEW
+    action, previous = visit("https://sso.com/", 3, 101.0, redirected=True)
+    assert action == VISIT_REDIRECT and previous["url"] == "https://login.com/"
+    assert visit("https://home.com/", 3, 110.0, redirected=True)[0] == VISIT_NEW
+    # 用户很快点击的链接不是重定向
+    assert visit("https://home.com/next", 3, 110.5)[0] == VISIT_NEW
+    assert coalescer.stats() == {"merged_visits": 2, "collapsed_redirects": 1}
+
+
+def test_record_visit_collapses_redirect_chain(history_files):
+    HistoryManager.set_store(SqliteHistoryStore())
+    HistoryManager.get_search_index()
+    notified = []
+    HistoryManager.add_listener(notified.append)
+    HistoryManager.record_visit("https://a.com/login", "Login", source=1)
+    HistoryManager.record_visit("https://sso.com/auth", "", source=1, redirected=True)
+    HistoryManager.record_visit("https://a.com/home", "Home", source=1, redirected=True)
+    HistoryManager.record_visit("https://a.com/home#top", "Home", source=2)
+    HistoryManager.flush(timeout=5)
+
+    assert [h["url"] for h in HistoryManager.load_history()] == ["https://a.com/home"]
+    # 重定向窗口结束（或标签页关闭）前，最终地址也暂不进入索引；被替换的上一跳从未进入
+    assert HistoryManager.search_history("home") == ([], 0)
+    HistoryManager.forget_visit_source(1)
+    assert HistoryManager.search_history("home")[1] == 1
+    assert HistoryManager.search_history("login") == ([], 0)
+    assert [r["url"] for r in notified] == ["https://a.com/home"]
+    HistoryManager.remove_listener(notified.append)
+    stats = HistoryManager.get_write_stats()
+    assert stats["collapsed_redirects"] == 2
+    assert stats["merged_visits"] == 1
+
+
+def test_fast_navigation_is_not_a_redirect(history_files):
+    HistoryManager.set_store(SqliteHistoryStore())
+    HistoryManager.get_search_index()
+    HistoryManager._coalescer.redirect_window = 0.05
+    HistoryManager.record_visit("https://a.com/list", "List", source=1)
+    HistoryManager.record_visit("https://a.com/item", "Item", source=1)  # 立即点击链接
+    HistoryManager.flush(timeout=5)
+
+    assert [h["url"] for h in HistoryManager.load_history()] == [
+        "https://a.com/list",
+        "https://a.com/item",
+    ]
+    # 同一标签页的下一次访问放行上一次，窗口结束后放行最后一次
+    assert HistoryManager.search_history("list")[1] == 1
+    assert HistoryManager.search_history("item")[1] == 0
+    time.sleep(0.06)
+    HistoryManager.index_deferred_visits()
+    assert HistoryManager.search_history("item")[1] == 1
+
+
+def test_fuzzy_search_tolerates_abbreviations_and_typos(history_files):
+    HistoryManager.set_store(SqliteHistoryStore())
+    HistoryManager.get_store().add_records(
+        [
+            {"time": "2026-01-01 10:00:00", "url": "https://github.com/org/repo/issues", "title": "Issues"},
+            {"time": "2026-01-01 11:00:00", "url": "https://gitlab.com/", "title": "GitLab"},
+        ]
+    )
+    assert HistoryManager.search_history("gthb iss") == ([], 0)
+    (match,) = HistoryManager.fuzzy_search_history("gthb iss")
+    assert match["url"] == "https://github.com/org/repo/issues"
+    assert match["visits"] == 1
+
+    # 新访问增量更新已构建的模糊索引
+    HistoryManager.record_visit("https://github.com/org/repo/issues", "Issues")
+    HistoryManager.record_visit("https://docs.python.org/3/", "Python docs")
+    assert HistoryManager.fuzzy_search_history("gihtub")[0]["visits"] == 2
+    assert HistoryManager.fuzzy_search_history("pyhton dcs")[0]["url"] == "https://docs.python.org/3/"
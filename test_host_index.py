@@ -0,0 +1,91 @@
+"""测试地址栏内联域名补全"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from host_index import HostIndex
+
+
+def _site(url, visits):
+    return {"url": url, "title": "", "visit_count": visits}
+
+
+def _index():
+    index = HostIndex()
+    index.build(
+        [
+            _site("https://gist.github.com/someone", 3),
+            _site("https://www.google.com/search?q=x", 10),
+            _site("https://www.bbc.co.uk/news", 2),
+            _site("http://localhost:8000/admin", 1),
+        ],
+        [{"url": "https://gitlab.com/", "title": "GitLab"}],
+    )
+    return index
+
+
+def test_completes_to_most_visited_host():
+    index = _index()
+    assert index.complete("g") == "google.com/"
+    # 书签计为 BOOKMARK_VISITS 次访问
+    assert index.complete("gi") == "gitlab.com/"
+    # 子域名的访问也计入上级域名，但不会越过 co.uk 这样的公共后缀
+    assert index.complete("github") == "github.com/"
+    assert index.complete("gis") == "gist.github.com/"
+    assert index.complete("b") == "bbc.co.uk/"
+    assert index.complete("co") is None
+    assert index.complete("loc") == "localhost:8000/"
+
+
+def test_keeps_typed_prefix_and_case():
+    index = _index()
+    assert index.complete("GitH") == "GitHub.com/"
+    assert index.complete("https://www.goo") == "https://www.google.com/"
+    assert index.complete("github.com/") is None
+    assert index.complete("git hub") is None
+    assert index.complete("") is None
+
+
+def test_visits_and_bookmark_removal_update_completions():
+    index = _index()
+    for _ in range(5):
+        index.add_visit("https://github.com/")
+    assert index.complete("gi") == "github.com/"
+
+    index.sync_bookmarks([])
+    assert index.complete("gitl") is None
+
+
+def test_set_bookmark_updates_one_url():
+    index = _index()
+    index.set_bookmark("https://docs.rs/serde")
+    index.set_bookmark("https://docs.rs/serde")
+    assert index.complete("d") == "docs.rs/"
+
+    # 同一主机上的其他书签仍保留加分
+    index.set_bookmark("https://docs.rs/tokio")
+    index.set_bookmark("https://docs.rs/serde", False)
+    assert index.complete("d") == "docs.rs/"
+    index.set_bookmark("https://docs.rs/tokio", False)
+    assert index.complete("d") is None
+    index.set_bookmark("https://gitlab.com/", False)
+    assert index.complete("gi") == "github.com/"
+
+
+def test_stops_at_public_suffix_rules():
+    index = HostIndex()
+    index.build(
+        [
+            _site("https://alice.github.io/blog", 3),
+            _site("https://bob.github.io/", 1),
+            _site("https://shop.example.ck/", 2),
+        ],
+        [],
+    )
+    # github.io 与 *.ck 是公共后缀，各个子站点分别计数
+    assert index.complete("a") == "alice.github.io/"
+    assert index.complete("github") is None
+    assert index.complete("ex") is None
+    assert index.complete("sh") == "shop.example.ck/"
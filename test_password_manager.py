@@ -0,0 +1,291 @@
+"""测试密码库 v2：会话密钥、HKDF 条目子密钥与旧格式迁移"""
+
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+import password_manager
+from password_manager import PasswordCrypto, PasswordManager, VaultKey
+
+
+@pytest.fixture
+def passwords_file(tmp_path, monkeypatch):
+    path = tmp_path / "passwords.json"
+    monkeypatch.setattr(password_manager, "PASSWORDS_FILE", str(path))
+    monkeypatch.setattr(password_manager, "KDF_ITERATIONS", 1000)
+    return path
+
+
+@pytest.fixture
+def derive_calls(monkeypatch):
+    calls = []
+    derive = PasswordCrypto.derive_key
+
+    def counting(*args):
+        calls.append(args)
+        return derive(*args)
+
+    monkeypatch.setattr(PasswordCrypto, "derive_key", staticmethod(counting))
+    return calls
+
+
+def test_hkdf_matches_rfc5869():
+    # RFC 5869 测试用例 1
+    okm = PasswordCrypto.hkdf(
+        bytes.fromhex("0b" * 22), bytes.fromhex("f0f1f2f3f4f5f6f7f8f9"), 42, bytes(range(13))
+    )
+    assert okm.hex() == (
+        "3cb25f25faacd57a90434f64d0362f2a2d2d0a90cf1a5a4c5db02d56ecc4c5bf34007208d5b887185865"
+    )
+
+
+def test_session_key_derives_once(passwords_file, derive_calls):
+    key = PasswordManager.set_master_password("master")
+    assert len(derive_calls) == 1
+    for i in range(5):
+        PasswordManager.save_password("https://example.com/login", f"user{i}", f"pw{i}", key)
+    found = PasswordManager.get_passwords_for_url("https://example.com/", key)
+    assert sorted(p["password"] for p in found) == [f"pw{i}" for i in range(5)]
+    # 条目加解密只用 HKDF 子密钥，不再运行 PBKDF2
+    assert len(derive_calls) == 1
+
+    data = json.loads(passwords_file.read_text(encoding="utf-8"))
+    assert data["version"] == 2 and data["kdf"]["iterations"] == 1000
+    blobs = [e["password_encrypted"] for e in data["entries"]]
+    assert len({b["nonce"] for b in blobs}) == 5 and "pw0" not in passwords_file.read_text()
+
+    assert PasswordManager.unlock("wrong") is None
+    other = PasswordManager.unlock("master")
+    assert other is not None and other.decrypt(blobs[0]) == "pw0"
+    tampered = dict(blobs[0], data=blobs[1]["data"])
+    assert other.decrypt(tampered) is None
+    assert VaultKey(bytes(32)).decrypt(blobs[0]) is None
+
+
+def test_legacy_vault_is_migrated_on_unlock(passwords_file):
+    passwords_file.write_text(
+        json.dumps(
+            {
+                "master_password_hash": PasswordCrypto.hash_master_password("master"),
+                "entries": [
+                    {
+                        "url": "https://example.com",
+                        "username": "alice",
+                        "password_encrypted": PasswordCrypto.encrypt("secret", "master"),
+                        "created_at": "2026-01-01 00:00:00",
+                    }
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    assert PasswordManager.is_master_password_set()
+    assert PasswordManager.unlock("wrong") is None
+    assert "kdf" not in json.loads(passwords_file.read_text(encoding="utf-8"))
+
+    key = PasswordManager.unlock("master")
+    data = json.loads(passwords_file.read_text(encoding="utf-8"))
+    assert "master_password_hash" not in data and data["version"] == 2
+    assert set(data["entries"][0]["password_encrypted"]) == {"nonce", "data", "tag"}
+    assert data["entries"][0]["created_at"] == "2026-01-01 00:00:00"
+    found = PasswordManager.get_passwords_for_url("https://example.com/x", key)
+    assert [p["password"] for p in found] == ["secret"]
+    assert PasswordManager.verify_master_password("master")
+
+
+def test_site_index_shares_subdomains_and_reloads_on_change(passwords_file, monkeypatch):
+    key = PasswordManager.set_master_password("master")
+    PasswordManager.save_password("https://login.example.com/", "alice", "a", key)
+    PasswordManager.save_password("https://www.example.com/", "bob", "b", key)
+    PasswordManager.save_password("https://alice.github.io/", "carol", "c", key)
+
+    loads = []
+    load_data = PasswordManager.load_data
+    monkeypatch.setattr(
+        PasswordManager, "load_data", staticmethod(lambda: loads.append(1) or load_data())
+    )
+    found = PasswordManager.get_passwords_for_url("https://www.example.com/account", key)
+    assert [p["username"] for p in found] == ["bob", "alice"]
+    assert PasswordManager.get_passwords_for_url("https://bob.github.io/", key) == []
+    assert len(loads) == 1
+
+    # 文件变化后重新建立索引
+    PasswordManager.save_password("https://bob.github.io/", "dave", "d", key)
+    found = PasswordManager.get_passwords_for_url("https://bob.github.io/", key)
+    assert [p["username"] for p in found] == ["dave"]
+
+
+@pytest.mark.parametrize("pool_min", [10**6, 0])
+def test_change_master_password_reencrypts_vault(passwords_file, monkeypatch, pool_min):
+    monkeypatch.setattr(password_manager, "CRYPTO_POOL_MIN", pool_min)
+    monkeypatch.setattr(password_manager, "CRYPTO_BATCH", 16)
+    key = PasswordManager.set_master_password("old")
+    data = json.loads(passwords_file.read_text(encoding="utf-8"))
+    data["entries"] = [
+        {
+            "url": f"https://site{i}.example/",
+            "username": "u",
+            "password_encrypted": key.encrypt(str(i)),
+        }
+        for i in range(50)
+    ]
+    data["entries"].append(
+        {"url": "https://lost.example/", "username": "u", "password_encrypted": {}}
+    )
+    PasswordManager.save_data(data)
+
+    with pytest.raises(ValueError):
+        PasswordManager.change_master_password(VaultKey(bytes(32)), "new")
+    progress = []
+    new_key = PasswordManager.change_master_password(
+        key, "new", lambda done, total: progress.append((done, total)), workers=2
+    )
+    assert progress[0] == (0, 51) and progress[-1] == (51, 51)
+    assert PasswordManager.unlock("old") is None
+    assert PasswordManager.unlock("new").check_value() == new_key.check_value()
+    entries = PasswordManager.load_data()["entries"]
+    assert [new_key.decrypt(e["password_encrypted"]) for e in entries[:50]] == [
+        str(i) for i in range(50)
+    ]
+    assert key.decrypt(entries[0]["password_encrypted"]) is None
+    assert entries[50]["password_encrypted"] == {}
+
+
+@pytest.mark.parametrize("pool_min", [10**6, 0])
+def test_csv_import_dedupes_and_export_round_trips(passwords_file, tmp_path, monkeypatch, pool_min):
+    monkeypatch.setattr(password_manager, "CRYPTO_POOL_MIN", pool_min)
+    monkeypatch.setattr(password_manager, "CRYPTO_BATCH", 2)
+    key = PasswordManager.set_master_password("master")
+    PasswordManager.save_password("https://www.example.com/", "alice", "old", key)
+
+    chrome = tmp_path / "chrome.csv"
+    chrome.write_text(
+        "﻿name,url,username,password,note\n"
+        "example.com,https://login.example.com/,alice,new,\n"
+        'other.org,https://other.org/,"bob, jr",p"w,\n'
+        "example.com,https://example.com/,carol,c1,\n"
+        "example.com,https://example.com/,carol,c2,\n"
+        "empty,https://empty.example/,dave,,\n",
+        encoding="utf-8",
+    )
+    assert PasswordManager.import_csv(str(chrome), key) == 3
+    firefox = tmp_path / "firefox.csv"
+    firefox.write_text(
+        '"url","username","password","httpRealm","formActionOrigin","guid","timeCreated"\n'
+        '"https://ff.example","erin","e","","","{1}","1700000000000"\n',
+        encoding="utf-8",
+    )
+    assert PasswordManager.import_csv(str(firefox), key) == 1
+
+    entries = PasswordManager.load_data()["entries"]
+    assert [(e["url"], e["username"]) for e in entries] == [
+        ("https://www.example.com/", "alice"),
+        ("https://other.org/", "bob, jr"),
+        ("https://example.com/", "carol"),
+        ("https://ff.example", "erin"),
+    ]
+    assert entries[3]["created_at"].startswith("2023-11-1")
+    assert [PasswordManager.decrypt_entry(e, key) for e in entries] == ["new", 'p"w', "c2", "e"]
+
+    out = tmp_path / "export.csv"
+    assert PasswordManager.export_csv(str(out), key) == 4
+    if os.name == "posix":
+        assert out.stat().st_mode & 0o777 == 0o600
+    assert out.read_text(encoding="utf-8").splitlines()[:3] == [
+        "name,url,username,password",
+        "www.example.com,https://www.example.com/,alice,new",
+        'other.org,https://other.org/,"bob, jr","p""w"',
+    ]
+    # 导出的文件可以再次导入，不产生重复条目
+    assert PasswordManager.import_csv(str(out), key) == 4
+    assert len(PasswordManager.load_data()["entries"]) == 4
+
+    (tmp_path / "bad.csv").write_text("a,b\n1,2\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        PasswordManager.import_csv(str(tmp_path / "bad.csv"), key)
+    # csv 模块自身的错误（字段超长）同样报告为 ValueError
+    (tmp_path / "huge.csv").write_text(
+        "url,username,password\nhttps://a.example/,u," + "x" * 200000 + "\n", encoding="utf-8"
+    )
+    with pytest.raises(ValueError, match="Not a valid password CSV file"):
+        PasswordManager.import_csv(str(tmp_path / "huge.csv"), key)
+
+
+def test_failed_csv_export_leaves_no_plaintext(passwords_file, tmp_path, monkeypatch):
+    key = PasswordManager.set_master_password("master")
+    PasswordManager.save_password("https://example.com/", "alice", "secret", key)
+
+    def fail(entry, key):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(PasswordManager, "decrypt_entry", staticmethod(fail))
+    out = tmp_path / "export.csv"
+    # 同名的 .tmp 文件属于别人，不能被删除或覆盖
+    (tmp_path / "export.csv.tmp").write_text("keep", encoding="utf-8")
+    before = sorted(os.listdir(tmp_path))
+    with pytest.raises(OSError):
+        PasswordManager.export_csv(str(out), key)
+    assert sorted(os.listdir(tmp_path)) == before
+    assert (tmp_path / "export.csv.tmp").read_text(encoding="utf-8") == "keep"
+
+
+def test_vault_writes_are_serialized_with_rekey(passwords_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(password_manager, "CRYPTO_POOL_MIN", 10**6)
+    key = PasswordManager.set_master_password("old")
+    for i in range(20):
+        PasswordManager.save_password(f"https://site{i}.example/", "u", str(i), key)
+
+    # 与重新加密同时保存：要么在其之前写入并被重新加密，要么因密钥过期被拒绝
+    results = []
+    savers = [
+        threading.Thread(
+            target=lambda i=i: results.append(
+                PasswordManager.save_password(f"https://new{i}.example/", "u", "x", key)
+            )
+        )
+        for i in range(8)
+    ]
+    for thread in savers:
+        thread.start()
+    new_key = PasswordManager.change_master_password(key, "new")
+    for thread in savers:
+        thread.join()
+    entries = PasswordManager.load_data()["entries"]
+    assert len(entries) == 20 + results.count(True)
+    assert all(new_key.decrypt(e["password_encrypted"]) is not None for e in entries)
+    assert not PasswordManager.save_password("https://late.example/", "u", "x", key)
+
+    # CSV 加密期间主密码被修改：导入不能写回旧的 kdf
+    csv_file = tmp_path / "import.csv"
+    csv_file.write_text("url,username,password\nhttps://csv.example/,u,p\n", encoding="utf-8")
+    holder = {}
+
+    def rekey(done, total):
+        if done == total and "key" not in holder:
+            holder["key"] = PasswordManager.change_master_password(new_key, "newer")
+
+    with pytest.raises(ValueError):
+        PasswordManager.import_csv(str(csv_file), new_key, rekey)
+    assert holder["key"].matches(PasswordManager.load_data()["kdf"])
+    assert len(PasswordManager.load_data()["entries"]) == len(entries)
+
+
+def test_crypto_pool_needs_several_cpus(monkeypatch):
+    monkeypatch.setattr(password_manager, "CRYPTO_POOL_MIN", 0)
+    monkeypatch.setattr(password_manager, "CRYPTO_BATCH", 2)
+    monkeypatch.setattr(password_manager.os, "cpu_count", lambda: 1)
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool started")
+
+    monkeypatch.setattr(password_manager, "ProcessPoolExecutor", no_pool)
+    key = VaultKey(bytes(32))
+    blobs = password_manager._map_batches(
+        password_manager._encrypt_batch, (key._key,), ["a", "b", "c"]
+    )
+    assert [key.decrypt(blob) for blob in blobs] == ["a", "b", "c"]
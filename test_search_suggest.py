@@ -0,0 +1,122 @@
+"""测试搜索建议：本地桩 HTTP 服务器上的防抖、取消与缓存"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+from search_suggest import SearchSuggester, SuggestionCache, SuggestRequest, parse_opensearch
+
+
+class _SuggestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)["q"][0]
+        self.server.queries.append(query)
+        if query.startswith("slow"):
+            time.sleep(2)
+        body = json.dumps([query, [f"{query} one", f"{query} two"]]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _SuggestHandler)
+    httpd.daemon_threads = True
+    httpd.queries = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}/complete?q={{}}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class _Results:
+    def __init__(self):
+        self.items = []
+        self.event = threading.Event()
+
+    def __call__(self, query, suggestions):
+        self.items.append((query, suggestions))
+        self.event.set()
+
+    def wait(self):
+        assert self.event.wait(5)
+        self.event.clear()
+
+
+def test_parse_opensearch():
+    assert parse_opensearch(b'["py", ["python", "pypi", 3]]') == ["python", "pypi"]
+    assert parse_opensearch('["中", ["中文"]]'.encode("gbk"), "gbk") == ["中文"]
+    assert parse_opensearch(b"<html>") == []
+    assert parse_opensearch(b'{"a": 1}') == []
+
+
+def test_cache_expires_and_evicts_least_recently_used():
+    now = [0.0]
+    cache = SuggestionCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", ["a1"])
+    cache.put("b", ["b1"])
+    assert cache.get("a") == ["a1"]
+    cache.put("c", ["c1"])  # b 最久未使用
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_keystrokes_are_debounced_and_cached(server):
+    httpd, template = server
+    results = _Results()
+    suggester = SearchSuggester(results, delay=0.1)
+    for text in ("p", "py", "pyt", "pyth"):
+        suggester.request(template, text)
+    results.wait()
+    assert results.items == [("pyth", ["pyth one", "pyth two"])]
+    assert httpd.queries == ["pyth"]
+
+    # 退格再输入相同内容：直接命中缓存，同步回调，不发请求
+    suggester.request(template, "pyth ")
+    assert results.items[-1] == ("pyth", ["pyth one", "pyth two"])
+    assert httpd.queries == ["pyth"]
+
+
+def test_stale_requests_are_cancelled(server):
+    httpd, template = server
+    results = _Results()
+    suggester = SearchSuggester(results, delay=0)
+    suggester.request(template, "slow query")
+    deadline = time.monotonic() + 5
+    while not httpd.queries and time.monotonic() < deadline:
+        time.sleep(0.01)
+    started = time.monotonic()
+    suggester.request(template, "fast")
+    results.wait()
+    assert time.monotonic() - started < 1.5
+    time.sleep(0.1)
+    assert [query for query, _ in results.items] == ["fast"]
+
+
+def test_cancelled_request_returns_none(server):
+    _, template = server
+    request = SuggestRequest(template.format("slow"), timeout=5)
+    threading.Timer(0.2, request.cancel).start()
+    started = time.monotonic()
+    assert request.fetch() is None
+    assert time.monotonic() - started < 1.5
@@ -0,0 +1,109 @@
+"""测试地址栏建议索引的匹配、排序与增量更新"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import bookmark_manager
+from bookmark_manager import BookmarkManager
+from suggestion_index import SuggestionIndex, url_keys
+
+
+def _site(url, title, visits):
+    return {"url": url, "title": title, "frecency": float(visits)}
+
+
+def _urls(results):
+    return [r["url"] for r in results]
+
+
+def _index():
+    index = SuggestionIndex()
+    index.build(
+        [
+            _site("https://mail.google.com/mail/inbox", "Inbox - Gmail", 50),
+            _site("https://www.google.com/", "Google", 20),
+            _site("https://github.com/python/cpython", "Python source", 5),
+            _site("https://docs.python.org/3/library/bisect.html", "bisect", 2),
+        ],
+        [{"type": "bookmark", "url": "https://news.ycombinator.com/", "title": "Hacker News"}],
+    )
+    return index
+
+
+def test_url_keys_cover_host_suffixes_paths_and_titles():
+    keys = url_keys("https://mail.google.com/mail/inbox", "Inbox - Gmail")
+    assert {"mail.google.com/mail/inbox", "google.com/mail/inbox", "inbox", "gmail"} <= keys
+    assert "com/mail/inbox" not in keys
+
+
+def test_prefix_queries_are_ranked_by_frecency():
+    index = _index()
+    assert _urls(index.query("goo")) == [
+        "https://mail.google.com/mail/inbox",
+        "https://www.google.com/",
+    ]
+    assert _urls(index.query("PYTHON")) == [
+        "https://github.com/python/cpython",
+        "https://docs.python.org/3/library/bisect.html",
+    ]
+    # 多个查询词必须全部匹配
+    assert _urls(index.query("python bis")) == ["https://docs.python.org/3/library/bisect.html"]
+    assert index.query("hacker")[0]["bookmark"] is True
+    # 前缀匹配不足时用模糊匹配补足（缩写、相邻字符写反）
+    assert _urls(index.query("gthb cpy")) == ["https://github.com/python/cpython"]
+    assert _urls(index.query("hcaker"))[0] == "https://news.ycombinator.com/"
+    assert index.query("nothing-here") == []
+    assert index.query("   ") == []
+
+
+def test_new_visits_update_cached_rankings_in_place():
+    index = _index()
+    assert _urls(index.query("py"))[0] == "https://github.com/python/cpython"
+    for _ in range(20):
+        index.add_visit("https://docs.python.org/3/library/bisect.html", timestamp=time.time())
+    assert _urls(index.query("py"))[0] == "https://docs.python.org/3/library/bisect.html"
+
+    index.add_visit("https://pypi.org/", "PyPI")
+    assert "https://pypi.org/" in _urls(index.query("py"))
+    assert len(index) == 6
+
+
+def test_bookmark_sync_and_clear_history():
+    index = _index()
+    index.sync_bookmarks([{"url": "https://www.google.com", "title": "Google"}])
+    assert index.query("hacker") == []
+    google = index.query("www.google")[0]
+    assert google["bookmark"] is True and google["history"] is not None
+
+    index.clear_history()
+    assert _urls(index.query("goo")) == ["https://www.google.com/"]
+    assert index.query("goo")[0]["history"] is None
+    assert math.isfinite(index.query("goo")[0]["score"])
+
+
+def test_bookmark_changes_notify_listeners(tmp_path, monkeypatch):
+    monkeypatch.setattr(bookmark_manager, "BOOKMARKS_FILE", str(tmp_path / "bookmarks.json"))
+    monkeypatch.setattr(BookmarkManager, "_listeners", [])
+    index = _index()
+    BookmarkManager.add_listener(lambda tree: index.sync_bookmarks(tree.flat_bookmarks()))
+    BookmarkManager.add_bookmark("https://example.org/docs", "Example Docs")
+    assert _urls(index.query("example")) == ["https://example.org/docs"]
+
+
+def test_set_bookmark_updates_one_entry():
+    index = _index()
+    index.set_bookmark("https://example.org/docs", "Example Docs")
+    assert _urls(index.query("example")) == ["https://example.org/docs"]
+    index.set_bookmark("https://example.org/docs", "Renamed")
+    assert index.query("renamed")[0]["bookmark"] is True
+
+    index.set_bookmark("https://example.org/docs", bookmarked=False)
+    assert index.query("example") == []
+    index.set_bookmark("https://www.google.com/", "Google")
+    index.set_bookmark("https://www.google.com/", bookmarked=False)
+    google = index.query("www.google")[0]
+    assert google["bookmark"] is False and google["history"] is not None
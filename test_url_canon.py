@@ -0,0 +1,68 @@
+"""测试 URL 规范化以及书签 / 密码按规范化 URL 匹配"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import pytest
+
+import bookmark_manager
+import password_manager
+from bookmark_manager import BookmarkManager
+from password_manager import PasswordManager
+from url_canon import canonical_host, canonicalize, host_key, site_key
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("HTTPS://Www.Example.COM:443", "https://www.example.com/"),
+        ("http://example.com:8080/a/", "http://example.com:8080/a/"),
+        ("https://example.com/p?utm_source=x&id=1&fbclid=abc#top", "https://example.com/p?id=1#top"),
+        ("https://example.com/?utm_medium=email", "https://example.com/"),
+        ("http://bücher.de/", "http://xn--bcher-kva.de/"),
+        ("about:blank", "about:blank"),
+    ],
+)
+def test_canonicalize(url, expected):
+    assert canonicalize(url) == expected
+
+
+def test_hosts():
+    assert host_key("https://Login.Example.com:443/signin") == "login.example.com"
+    assert host_key("http://localhost:8000/") == "localhost:8000"
+    assert canonical_host(".Example.COM") == "example.com"
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://login.Example.com/signin", "example.com"),
+        ("https://a.b.example.co.uk:8443/", "example.co.uk:8443"),
+        ("https://alice.github.io/blog", "alice.github.io"),
+        ("https://github.io/", "github.io"),
+        ("https://shop.foo.bar.ck/", "foo.bar.ck"),
+        ("https://www.ck/", "www.ck"),
+        ("http://localhost:8000/", "localhost:8000"),
+        ("http://192.168.1.10/admin", "192.168.1.10"),
+    ],
+)
+def test_site_key(url, expected):
+    assert site_key(url) == expected
+
+
+def test_stores_match_canonical_urls(tmp_path, monkeypatch):
+    monkeypatch.setattr(bookmark_manager, "BOOKMARKS_FILE", str(tmp_path / "bookmarks.json"))
+    monkeypatch.setattr(password_manager, "PASSWORDS_FILE", str(tmp_path / "passwords.json"))
+
+    assert BookmarkManager.add_bookmark("https://example.com/?utm_source=feed", "Example")
+    assert not BookmarkManager.add_bookmark("HTTPS://EXAMPLE.COM", "Duplicate")
+    assert BookmarkManager.remove_bookmark("https://example.com:443/")
+    assert BookmarkManager.load_bookmarks() == []
+
+    PasswordManager.set_master_password("master")
+    PasswordManager.save_password("https://Example.com/login", "alice", "pw1", "master")
+    PasswordManager.save_password("https://example.com:443/login", "alice", "pw2", "master")
+    found = PasswordManager.get_passwords_for_url("https://EXAMPLE.com/other", "master")
+    assert [(p["username"], p["password"]) for p in found] == [("alice", "pw2")]